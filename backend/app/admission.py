@@ -0,0 +1,148 @@
+import asyncio, heapq, itertools, math, time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Literal
+from .config import get_settings
+from .deadline import DeadlineExceeded
+from .metrics import generation_metrics
+
+Ordering = Literal["fifo", "importance"]
+
+class Overloaded(Exception):
+    """Fila de geração cheia ou espera maior que o limite; vira 503 com Retry-After."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Plan generation is overloaded, retry later")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Limita quantas gerações rodam ao mesmo tempo neste worker.
+    Excedentes esperam numa fila limitada (FIFO ou por importance_level) por até `max_wait`
+    segundos; fila cheia ou espera estourada falham na hora em vez de atrasar todo mundo.
+    Trabalho em segundo plano (pré-geração) usa só as vagas fora da reserva interativa e
+    só entra quando não há requisição interativa esperando.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue: int,
+        max_wait: float,
+        ordering: Ordering = "fifo",
+        background_reserve: int = 0,
+        max_background_queue: int = 100,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.ordering = ordering
+        self.background_limit = max(1, max_in_flight - background_reserve)
+        self.max_background_queue = max_background_queue
+        self._in_flight = 0
+        self._waiting = 0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._background: deque[asyncio.Future] = deque()
+        self._seq = itertools.count()
+        self._avg_duration = 5.0  # média móvel do tempo de uma geração, em segundos
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def retry_after(self) -> int:
+        # tempo até a fila atual escoar, pelo tempo médio de uma geração
+        return max(1, math.ceil(self._avg_duration * (self._waiting + 1) / self.max_in_flight))
+
+    def _priority(self, importance: int) -> int:
+        return -importance if self.ordering == "importance" else 0
+
+    def _release(self) -> None:
+        while self._queue:
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.done():
+                # passa a vaga direto para o próximo da fila
+                self._waiting -= 1
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+        while self._background and self._in_flight < self.background_limit:
+            waiter = self._background.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+                return
+
+    async def _admit_background(self) -> None:
+        if self._in_flight < self.background_limit and not self._waiting and not self._background:
+            self._in_flight += 1
+            return
+        if len(self._background) >= self.max_background_queue:
+            raise Overloaded(self.retry_after())
+        waiter = asyncio.get_running_loop().create_future()
+        self._background.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            raise
+
+    async def _admit(self, importance: int, max_wait: float, deadline_bound: bool = False) -> None:
+        """`deadline_bound`: a espera foi encurtada pelo prazo, então esgotá-la é 504, não 503."""
+        if self._in_flight < self.max_in_flight and not self._waiting:
+            self._in_flight += 1
+            return
+        if self._waiting >= self.max_queue:
+            generation_metrics.shed_requests += 1
+            raise Overloaded(self.retry_after())
+        if deadline_bound and max_wait <= 0:
+            raise DeadlineExceeded("waiting for a generation slot")
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (self._priority(importance), next(self._seq), waiter))
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(waiter, max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # recebeu a vaga no mesmo instante em que desistiu
+            else:
+                self._waiting -= 1
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            if deadline_bound:
+                raise DeadlineExceeded("waiting for a generation slot") from None
+            generation_metrics.shed_requests += 1
+            raise Overloaded(self.retry_after()) from None
+
+    @asynccontextmanager
+    async def slot(self, importance: int = 3, background: bool = False, max_wait: float | None = None):
+        """`max_wait` encurta a espera na fila (ex.: prazo da requisição perto do fim)."""
+        if background:
+            await self._admit_background()
+        else:
+            bounded = max_wait is not None and max_wait < self.max_wait
+            await self._admit(importance, max_wait if bounded else self.max_wait, bounded)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * (time.monotonic() - started)
+            self._release()
+
+@lru_cache
+def get_admission_controller() -> AdmissionController:
+    settings = get_settings()
+    return AdmissionController(
+        settings.max_in_flight_generations,
+        settings.admission_max_queue,
+        settings.admission_max_wait,
+        settings.admission_ordering,
+        settings.admission_background_reserve,
+    )
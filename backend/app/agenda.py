@@ -0,0 +1,105 @@
+import base64, binascii, calendar, json, time, uuid
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any, Literal
+from anyio import to_thread
+from .config import get_settings
+from .plan_repository import PlanRepository
+from .shared_state import SharedState, get_shared_state
+
+Window = Literal["day", "week", "month"]
+
+def window_bounds(window: Window, day: date) -> tuple[date, date]:
+    """Primeiro e último dia da janela que contém `day` (semana de segunda a domingo)."""
+    if window == "day":
+        return day, day
+    if window == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    return day.replace(day=1), day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+def encode_cursor(task: dict[str, Any]) -> str:
+    raw = json.dumps([task["due_date"], task["id"]], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """(due_date, id) da última tarefa da página anterior; valida os dois antes de irem para o filtro."""
+    try:
+        due_date, task_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return date.fromisoformat(due_date).isoformat(), str(uuid.UUID(task_id))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Invalid agenda cursor") from None
+
+class AgendaCache:
+    """
+    Páginas recentes da agenda de cada usuário, numa única chave do estado compartilhado.
+    Só janelas quentes (que contêm o dia de hoje) entram; o TTL curto cobre as edições
+    feitas direto no Supabase pelo frontend, e planos gravados pelo backend invalidam na hora.
+    """
+
+    def __init__(self, state: SharedState | None = None):
+        self._state = state or get_shared_state()
+        self._settings = get_settings()
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"agenda:{user_id}"
+
+    async def get(self, user_id: str, page_key: str) -> dict[str, Any] | None:
+        if self._settings.agenda_cache_ttl <= 0:
+            return None
+        entries = await to_thread.run_sync(self._state.get, self._key(user_id)) or {}
+        entry = entries.get(page_key)
+        if entry is None or time.time() - entry["stored_at"] >= self._settings.agenda_cache_ttl:
+            return None
+        return entry["page"]
+
+    async def put(self, user_id: str, page_key: str, page: dict[str, Any]) -> None:
+        ttl, limit = self._settings.agenda_cache_ttl, self._settings.agenda_cache_pages
+        if ttl <= 0:
+            return
+
+        def _add(entries: dict | None) -> tuple[dict, None]:
+            now = time.time()
+            kept = {k: e for k, e in (entries or {}).items() if k != page_key and now - e["stored_at"] < ttl}
+            kept[page_key] = {"stored_at": now, "page": page}
+            return dict(list(kept.items())[-limit:]), None
+
+        await to_thread.run_sync(self._state.update, self._key(user_id), _add, ttl)
+
+    async def invalidate(self, user_id: str) -> None:
+        await to_thread.run_sync(self._state.delete, self._key(user_id))
+
+class Agenda:
+    """Tarefas de um usuário por janela de datas, paginadas por cursor em (due_date, id)."""
+
+    def __init__(self, repository: PlanRepository, cache: AgendaCache | None = None):
+        self._repository = repository
+        self._cache = cache or AgendaCache()
+
+    async def page(self, user_id: str, window: Window, day: date, cursor: str | None, limit: int) -> dict[str, Any]:
+        start, end = window_bounds(window, day)
+        after = decode_cursor(cursor) if cursor else None
+        hot = start <= date.today() <= end
+        page_key = f"{start}:{end}:{cursor or ''}:{limit}"
+        if hot and (cached := await self._cache.get(user_id, page_key)) is not None:
+            return cached
+
+        # um a mais que o limite diz se existe próxima página sem um count(*)
+        rows = await to_thread.run_sync(self._repository.fetch_agenda, user_id, start, end, after, limit + 1)
+        tasks = rows[:limit]
+        page = {
+            "window": window,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "tasks": tasks,
+            "nextCursor": encode_cursor(tasks[-1]) if len(rows) > limit else None,
+        }
+        if hot:
+            await self._cache.put(user_id, page_key, page)
+        return page
+
+@lru_cache
+def get_agenda() -> Agenda:
+    # um cliente do Supabase por processo: montar um por requisição custa mais que a consulta
+    return Agenda(PlanRepository())
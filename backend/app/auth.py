@@ -0,0 +1,36 @@
+import jwt
+from fastapi import Header, HTTPException
+from .config import get_settings
+
+def _decode(token: str, secret: str) -> str:
+    claims = jwt.decode(
+        token, secret, algorithms=["HS256"], audience="authenticated", options={"require": ["exp", "sub"]}
+    )
+    return claims["sub"]
+
+async def current_user_id(authorization: str | None = Header(default=None)) -> str:
+    """user_id (claim `sub`) do access token do Supabase enviado em `Authorization: Bearer`."""
+    secret = get_settings().supabase_jwt_secret
+    if not secret:
+        raise HTTPException(status_code=503, detail="SUPABASE_JWT_SECRET is not configured")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    try:
+        return _decode(token, secret)
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid access token")
+
+async def optional_user_id(authorization: str | None = Header(default=None)) -> str | None:
+    """
+    user_id do access token, se houver um válido; None caso contrário (sem segredo, chave anon,
+    token de serviço). Só serve para separar dados por usuário, não para autorizar.
+    """
+    secret = get_settings().supabase_jwt_secret
+    scheme, _, token = (authorization or "").partition(" ")
+    if not secret or scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return _decode(token, secret)
+    except jwt.InvalidTokenError:
+        return None
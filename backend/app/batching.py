@@ -0,0 +1,123 @@
+import asyncio, json
+from pydantic import ValidationError
+from collections.abc import Callable
+from functools import lru_cache
+from .config import get_settings
+from .gemini_client import GeminiClient
+from .metrics import generation_metrics
+from .prompt_builder import build_batch_prompt
+from .schemas import Plan, SupportedLanguage
+
+class _Batch:
+    def __init__(self, gemini: GeminiClient):
+        self.gemini = gemini  # do líder: o cliente HTTP dele vive até o lote terminar
+        self.prompts: dict[str, str] = {}
+        self.waiters: dict[str, asyncio.Future] = {}
+        self.full = asyncio.Event()
+
+class PlanBatcher:
+    """
+    Junta os pedidos de plano que chegam numa janela curta num único prompt ao Gemini.
+    O primeiro pedido do lote (líder) espera até `window` segundos ou até `max_size`
+    pedidos, faz a chamada com o seu cliente e entrega a cada um o plano da sua meta.
+    Lote com falha, sem o plano de uma meta ou com um plano inválido: só aquela meta volta à
+    geração individual.
+    """
+
+    def __init__(self, max_size: int, window: float):
+        self.max_size = max_size
+        self.window = window
+        self._open: dict[SupportedLanguage, _Batch] = {}  # um lote aberto por idioma
+
+    async def generate(
+        self,
+        gemini: GeminiClient,
+        key: str,
+        prompt: str,
+        language: SupportedLanguage,
+        continuation: Callable[[dict], str] | None = None,
+        max_wait: float | None = None,
+    ) -> str:
+        """
+        Plano (string JSON, ainda sem validação) para o prompt de uma meta identificada por `key`.
+        `max_wait` limita a espera pelo líder; esgotada, a meta segue sozinha com o que sobra do prazo.
+        """
+        if self.max_size <= 1:
+            return await gemini.generate_plan(prompt, continuation)
+
+        batch = self._open.get(language)
+        if batch is None:
+            batch = self._open[language] = _Batch(gemini)
+            batch.prompts[key] = prompt
+            raw = await self._lead(batch, key, language, continuation)
+        elif key in batch.prompts:
+            # a mesma meta já está no lote (ex.: pedido repetido): não dá para separar as respostas
+            return await gemini.generate_plan(prompt, continuation)
+        else:
+            waiter = batch.waiters[key] = asyncio.get_running_loop().create_future()
+            batch.prompts[key] = prompt
+            if len(batch.prompts) >= self.max_size:
+                self._close(batch, language)
+            try:
+                raw = await asyncio.wait_for(waiter, max_wait)
+            except asyncio.TimeoutError:
+                raw = None
+
+        if raw is None:
+            generation_metrics.batch_fallbacks += 1
+            return await gemini.generate_plan(prompt, continuation)
+        return raw
+
+    def _close(self, batch: _Batch, language: SupportedLanguage) -> None:
+        if self._open.get(language) is batch:
+            del self._open[language]
+        batch.full.set()
+
+    async def _lead(
+        self, batch: _Batch, key: str, language: SupportedLanguage, continuation: Callable[[dict], str] | None
+    ) -> str | None:
+        try:
+            try:
+                await asyncio.wait_for(batch.full.wait(), self.window)
+            except asyncio.TimeoutError:
+                pass
+            self._close(batch, language)
+            if len(batch.prompts) == 1:
+                # ninguém chegou na janela: segue sozinho, com continuação se a resposta vier cortada
+                return await batch.gemini.generate_plan(batch.prompts[key], continuation)
+
+            generation_metrics.batches += 1
+            keys = list(batch.prompts)
+            try:
+                plans = await batch.gemini.generate_batch(build_batch_prompt(batch.prompts, language), keys)
+            except RuntimeError:
+                plans = {}
+            results = {}
+            for name in keys:
+                plan = plans.get(name)
+                if not isinstance(plan, dict):
+                    continue
+                try:
+                    Plan.model_validate(plan)
+                except ValidationError:
+                    generation_metrics.validation_failures += 1
+                    continue
+                generation_metrics.batched_plans += 1
+                results[name] = json.dumps(plan)
+            for name, waiter in batch.waiters.items():
+                if not waiter.done():
+                    waiter.set_result(results.get(name))
+            return results.get(key)
+        finally:
+            # líder cancelado ou com erro: os demais não ficam esperando, voltam à geração individual
+            self._close(batch, language)
+            for waiter in batch.waiters.values():
+                if not waiter.done():
+                    waiter.set_result(None)
+
+@lru_cache
+def get_plan_batcher() -> PlanBatcher:
+    settings = get_settings()
+    # cada plano do lote precisa do orçamento de saída de um plano individual
+    fits = max(1, settings.gemini_model_max_output_tokens // settings.gemini_max_output_tokens)
+    return PlanBatcher(min(settings.plan_batch_max_size, fits), settings.plan_batch_window)
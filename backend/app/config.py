@@ -1,14 +1,55 @@
 from functools import lru_cache
+from typing import Literal
 from pydantic import HttpUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     supabase_url: HttpUrl
     supabase_service_key: str
+    supabase_jwt_secret: str | None = None  # valida o access token do usuário na agenda
     gemini_api_key: str
+    gemini_base_url: str = "https://generativelanguage.googleapis.com/v1beta"
     gemini_default_model: str = "gemini-1.5-flash"
+    gemini_structured_output: bool = True  # responseSchema derivado de Plan
     gemini_request_timeout: float = 20.0
+    gemini_max_output_tokens: int = 2048
+    gemini_model_max_output_tokens: int = 8192  # teto de saída do modelo; limita os lotes
+    gemini_max_continuations: int = 2  # pedidos extras quando a resposta vem truncada
+    gemini_rpm: int = 0  # limite de pedidos/min somando todos os workers (0 = sem limite)
+    plan_batch_max_size: int = 1  # metas por pedido ao Gemini; 1 = sem lotes
+    plan_batch_window: float = 0.2  # segundos que o primeiro pedido espera os demais
+    request_timeout: float = 60.0  # prazo total de uma geração (fila, Gemini e banco); 0 = sem prazo
+    request_timeout_max: float = 120.0  # teto para o header X-Request-Timeout
+    deadline_min_attempt: float = 1.0  # não começa uma chamada ao Gemini com menos tempo que isso
+    deadline_persist_reserve: float = 2.0  # parte do prazo guardada para gravar o plano
+    database_write_timeout: float = 30.0  # fixo: uma escrita já enviada não é cortada pelo prazo
+    prompt_max_input_tokens: int = 1200  # orçamento do prompt; descrições longas são cortadas
     model_cache_ttl: int = 300  # segundos
+    plan_cache_ttl: int = 3600  # segundos; 0 desliga o cache de planos
+    plan_templates: bool = True  # reaproveita planos de metas parecidas
+    template_min_similarity: float = 0.75  # Jaccard entre os tokens dos títulos
+    template_max_horizon_ratio: float = 2.0  # prazo novo até 2x maior/menor que o do template
+    template_bucket_size: int = 200  # templates por grupo (idioma/esforço, e usuário se há descrição)
+    template_ttl: int = 30 * 86400
+    shared_state_backend: Literal["memory", "sqlite"] = "memory"  # sqlite = compartilhado entre workers
+    shared_state_path: str = "/tmp/wise-quest-state.sqlite"
+    shared_state_purge_every: int = 500  # escritas entre limpezas das chaves expiradas; 0 desliga
+    max_in_flight_generations: int = 8  # por worker
+    admission_max_queue: int = 32
+    admission_max_wait: float = 10.0  # segundos na fila antes de desistir com 503
+    admission_ordering: Literal["fifo", "importance"] = "importance"
+    admission_background_reserve: int = 2  # vagas que a pré-geração nunca ocupa
+    speculative_generation: bool = True  # pré-gera o plano quando a meta é criada
+    speculative_language: Literal["pt", "en"] = "pt"  # quando o perfil do usuário não tem idioma
+    goal_webhook_secret: str | None = None  # exigido em X-Webhook-Secret; sem ele o webhook recusa
+    draft_ttl: int = 86400
+    draft_wait_timeout: float = 20.0  # espera por uma pré-geração em andamento
+    agenda_cache_ttl: int = 30  # segundos; 0 desliga o cache da agenda
+    agenda_cache_pages: int = 8  # páginas guardadas por usuário
+    idempotency_ttl: int = 86400  # segundos que a resposta fica guardada para replays
+    idempotency_lock_ttl: int = 180  # libera a chave se o worker morrer; nunca menos que o prazo máximo + fila
+    idempotency_wait_timeout: float = 60.0
+    idempotency_poll_interval: float = 0.2
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,36 @@
+import time
+from dataclasses import dataclass
+
+class DeadlineExceeded(RuntimeError):
+    """O orçamento de tempo da requisição acabou antes de uma etapa; vira 504."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded before {stage}")
+        self.stage = stage
+
+@dataclass(frozen=True)
+class Deadline:
+    """Instante-limite de uma requisição, repartido entre Gemini, fila e banco."""
+
+    expires_at: float  # time.monotonic()
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def budget(self, stage: str, cap: float | None = None, reserve: float = 0.0, minimum: float = 0.0) -> float:
+        """
+        Tempo para a próxima etapa: o que sobra menos `reserve` (guardado para etapas
+        seguintes), até `cap`. Se não chega a `minimum`, a etapa nem começa.
+        """
+        left = self.remaining() - reserve
+        if left <= minimum:
+            raise DeadlineExceeded(stage)
+        return left if cap is None else min(cap, left)
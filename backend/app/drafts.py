@@ -0,0 +1,68 @@
+import asyncio, hashlib, time
+from typing import Any
+from anyio import to_thread
+from .config import get_settings
+from .shared_state import SharedState, get_shared_state
+
+def draft_fingerprint(prompt: str) -> str:
+    # o prompt já reúne meta, prazo, dias restantes e idioma: mudou algo, o rascunho não vale
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+class DraftStore:
+    """
+    Rascunhos de plano pré-gerados por meta, no estado compartilhado entre workers.
+    Enquanto a pré-geração roda o registro fica `running`; pronto, vira `ready` com o plano.
+    """
+
+    def __init__(self, state: SharedState | None = None):
+        self._state = state or get_shared_state()
+        self._settings = get_settings()
+
+    @staticmethod
+    def _key(goal_id: str) -> str:
+        return f"draft:{goal_id}"
+
+    async def claim(self, goal_id: str, fingerprint: str) -> bool:
+        """Marca a pré-geração como em andamento; False se já existe rascunho para as mesmas entradas."""
+        running = {"state": "running", "fingerprint": fingerprint, "started_at": time.time()}
+
+        def _claim(current: dict | None) -> tuple[dict | None, bool]:
+            if current is not None and current["fingerprint"] == fingerprint:
+                return current, False
+            return running, True
+
+        return await to_thread.run_sync(
+            self._state.update, self._key(goal_id), _claim, self._settings.draft_wait_timeout * 3
+        )
+
+    async def store(self, goal_id: str, fingerprint: str, plan: dict[str, Any]) -> None:
+        record = {"state": "ready", "fingerprint": fingerprint, "plan": plan}
+        await to_thread.run_sync(self._state.set, self._key(goal_id), record, self._settings.draft_ttl)
+
+    async def discard(self, goal_id: str) -> None:
+        await to_thread.run_sync(self._state.delete, self._key(goal_id))
+
+    async def take(self, goal_id: str, fingerprint: str, max_wait: float | None = None) -> dict[str, Any] | None:
+        """
+        Consome o rascunho se as entradas ainda batem. Se a pré-geração ainda está rodando,
+        espera por ela até `draft_wait_timeout`: sai mais cedo do que gerar do zero.
+        """
+
+        def _take(current: dict | None) -> tuple[dict | None, dict | None]:
+            if current is None or current["fingerprint"] != fingerprint:
+                return current, None
+            if current["state"] == "ready":
+                return None, current  # None apaga a chave: o rascunho só é usado uma vez
+            return current, current
+
+        wait = self._settings.draft_wait_timeout if max_wait is None else min(max_wait, self._settings.draft_wait_timeout)
+        deadline = time.monotonic() + wait
+        while True:
+            record = await to_thread.run_sync(self._state.update, self._key(goal_id), _take)
+            if record is None:
+                return None
+            if record["state"] == "ready":
+                return record["plan"]
+            if time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(0.2)
@@ -1,61 +1,168 @@
-import asyncio, time, re, json
-from collections.abc import Sequence
+import asyncio, json
+from collections.abc import Callable, Sequence
+from typing import Any
 import httpx
+from anyio import to_thread
 from .config import get_settings
+from .plan_parser import extract_json, salvage_plan, merge_plans
+from .response_schema import batch_response_schema, plan_response_schema
+from .metrics import generation_metrics
+from .shared_state import SharedState, get_shared_state, take_token
+from .deadline import Deadline, DeadlineExceeded
 
 class GeminiClient:
-    def __init__(self, http: httpx.AsyncClient):
+    def __init__(self, http: httpx.AsyncClient, state: SharedState | None = None, deadline: Deadline | None = None):
         self._http = http
         self._settings = get_settings()
-        self._cached_models: tuple[list[str], float] | None = None
-        self._lock = asyncio.Lock()
+        self._state = state or get_shared_state()
+        self._deadline = deadline
+
+    def _timeout(self, stage: str, minimum: float = 0.0) -> float:
+        """Timeout da próxima chamada: o que sobra do prazo, sem invadir a reserva da gravação."""
+        if self._deadline is None:
+            return self._settings.gemini_request_timeout
+        return self._deadline.budget(
+            stage, self._settings.gemini_request_timeout, self._settings.deadline_persist_reserve, minimum
+        )
 
     async def _list_models(self) -> Sequence[str]:
-        async with self._lock:
-            if self._cached_models and time.monotonic() - self._cached_models[1] < self._settings.model_cache_ttl:
-                return list(self._cached_models[0])
-
-            resp = await self._http.get(
-                "https://generativelanguage.googleapis.com/v1/models",
-                params={"key": self._settings.gemini_api_key},
-                timeout=self._settings.gemini_request_timeout,
-            )
-            resp.raise_for_status()
-            models = [
-                m["name"].removeprefix("models/")
-                for m in resp.json().get("models", [])
-                if "generateContent" in m.get("supportedGenerationMethods", [])
-            ]
-            self._cached_models = (models, time.monotonic())
-            return models
-
-    async def generate_plan(self, prompt: str) -> str:
+        # lista compartilhada entre workers e requisições: a chamada só se repete a cada TTL
+        cached = await to_thread.run_sync(self._state.get, "gemini:models")
+        if cached is not None:
+            return list(cached)
+
+        resp = await self._http.get(
+            f"{self._settings.gemini_base_url}/models",
+            params={"key": self._settings.gemini_api_key},
+            timeout=self._timeout("listing Gemini models"),
+        )
+        resp.raise_for_status()
+        models = [
+            m["name"].removeprefix("models/")
+            for m in resp.json().get("models", [])
+            if "generateContent" in m.get("supportedGenerationMethods", [])
+        ]
+        await to_thread.run_sync(self._state.set, "gemini:models", models, self._settings.model_cache_ttl)
+        return models
+
+    def _generation_config(self, schema: dict | None = None, max_output_tokens: int | None = None) -> dict:
+        config = {
+            "temperature": 0.7, "topK": 40, "topP": 0.95,
+            "maxOutputTokens": max_output_tokens or self._settings.gemini_max_output_tokens,
+        }
+        if self._settings.gemini_structured_output:
+            config["responseMimeType"] = "application/json"
+            config["responseSchema"] = schema or plan_response_schema()
+        return config
+
+    async def _wait_for_quota(self) -> None:
+        if self._settings.gemini_rpm <= 0:
+            return
+        while wait := await to_thread.run_sync(take_token, self._state, "gemini", self._settings.gemini_rpm):
+            if self._deadline is not None:
+                # esperar a cota e não ter tempo de usar é pior que desistir agora
+                self._timeout("waiting for Gemini quota", wait + self._settings.deadline_min_attempt)
+            await asyncio.sleep(wait)
+
+    async def _generate(self, model: str, prompt: str, config: dict | None = None) -> tuple[str, str | None]:
+        await self._wait_for_quota()
+        timeout = self._timeout(f"calling {model}", self._settings.deadline_min_attempt)
+        generation_metrics.model_attempts += 1
+        resp = await self._http.post(
+            f"{self._settings.gemini_base_url}/models/{model}:generateContent",
+            params={"key": self._settings.gemini_api_key},
+            json={
+                "contents": [{"parts": [{"text": prompt}]}],
+                "generationConfig": config or self._generation_config(),
+            },
+            timeout=timeout,
+        )
+        resp.raise_for_status()
+        candidate = resp.json()["candidates"][0]
+        return candidate["content"]["parts"][0]["text"], candidate.get("finishReason")
+
+    async def _continue_plan(self, model: str, plan: dict, continuation: Callable[[dict], str]) -> dict:
+        """Pede apenas os itens que faltaram e junta ao que já foi aproveitado."""
+        for _ in range(self._settings.gemini_max_continuations):
+            generation_metrics.continuations += 1
+            try:
+                text, finish_reason = await self._generate(model, continuation(plan))
+            except DeadlineExceeded:
+                break  # sem tempo para continuar: fica com o que já foi aproveitado
+            except (httpx.TimeoutException, httpx.HTTPStatusError, KeyError, IndexError, TypeError):
+                break
+            tail, truncated = salvage_plan(self._clean(text))
+            merged = merge_plans(plan, tail)
+            if merged == plan:
+                break
+            plan = merged
+            if not truncated and finish_reason != "MAX_TOKENS":
+                break
+        return plan
+
+    def _clean(self, text: str) -> str:
+        # com responseSchema a resposta já é JSON puro: não há cercas para remover
+        return text if self._settings.gemini_structured_output else extract_json(text)
+
+    async def _candidates(self) -> list[str]:
         models = await self._list_models()
         candidates = [
             self._settings.gemini_default_model,
             *(models[:3] or ["gemini-1.5-flash-latest", "gemini-1.5-pro-latest", "gemini-pro"]),
         ]
+        return list(dict.fromkeys(candidates))
 
-        for model in dict.fromkeys(candidates):
+    async def generate_plan(self, prompt: str, continuation: Callable[[dict], str] | None = None) -> str:
+        generation_metrics.requests += 1
+        for attempt, model in enumerate(await self._candidates()):
+            if attempt == 1:
+                generation_metrics.fallbacks += 1
             try:
-                resp = await self._http.post(
-                    f"https://generativelanguage.googleapis.com/v1/models/{model}:generateContent",
-                    params={"key": self._settings.gemini_api_key},
-                    json={
-                        "contents": [{"parts": [{"text": prompt}]}],
-                        "generationConfig": {
-                            "temperature": 0.7, "topK": 40, "topP": 0.95, "maxOutputTokens": 2048
-                        },
-                    },
-                    timeout=self._settings.gemini_request_timeout,
-                )
-                resp.raise_for_status()
-                payload = resp.json()
-                text = payload["candidates"][0]["content"]["parts"][0]["text"]
-                # limpa cercas de código e extrai só o JSON
-                text = re.sub(r"^```(?:json)?|```$", "", text.strip(), flags=re.MULTILINE)
-                m = re.search(r"\{[\s\S]*\}", text)
-                return m.group(0) if m else text
+                text, finish_reason = await self._generate(model, prompt)
             except (httpx.TimeoutException, httpx.HTTPStatusError, KeyError, IndexError, TypeError):
                 continue
+            raw = self._clean(text)
+            plan, truncated = salvage_plan(raw)
+            if not truncated and finish_reason != "MAX_TOKENS":
+                return raw
+            generation_metrics.truncated_responses += 1
+            # resposta cortada: aproveita o que veio completo e pede só o restante
+            if not plan["tasks"] and not plan["milestones"]:
+                continue
+            if continuation is not None:
+                plan = await self._continue_plan(model, plan, continuation)
+            return json.dumps(plan)
+        generation_metrics.upstream_failures += 1
+        if self._deadline is not None and self._deadline.expired:
+            raise DeadlineExceeded("a Gemini response arrived")
         raise RuntimeError("Failed to generate plan with Gemini")
+
+    async def generate_batch(self, prompt: str, keys: Sequence[str]) -> dict[str, Any]:
+        """
+        Um pedido com os planos de várias metas; devolve o objeto JSON (chave → plano) sem validar.
+        Resposta cortada não é continuada: cada meta volta à geração individual.
+        """
+        generation_metrics.requests += 1
+        max_output_tokens = min(
+            self._settings.gemini_max_output_tokens * len(keys), self._settings.gemini_model_max_output_tokens
+        )
+        config = self._generation_config(batch_response_schema(tuple(keys)), max_output_tokens)
+        for attempt, model in enumerate(await self._candidates()):
+            if attempt == 1:
+                generation_metrics.fallbacks += 1
+            try:
+                text, finish_reason = await self._generate(model, prompt, config)
+            except (httpx.TimeoutException, httpx.HTTPStatusError, KeyError, IndexError, TypeError):
+                continue
+            if finish_reason == "MAX_TOKENS":
+                # outro modelo cortaria no mesmo ponto
+                generation_metrics.truncated_responses += 1
+                break
+            try:
+                plans = json.loads(self._clean(text))
+            except ValueError:
+                continue
+            if isinstance(plans, dict):
+                return plans
+        generation_metrics.upstream_failures += 1
+        raise RuntimeError("Failed to generate plan batch with Gemini")
@@ -0,0 +1,59 @@
+import asyncio, hashlib, time
+from typing import Any
+from anyio import to_thread
+from .config import get_settings
+from .shared_state import SharedState, get_shared_state
+
+class IdempotencyInProgress(Exception):
+    """Outra requisição com a mesma chave ainda não terminou dentro do tempo de espera."""
+
+def fingerprint(*parts: str) -> str:
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()
+
+class IdempotencyStore:
+    """
+    Guarda (status, corpo) da primeira execução de cada Idempotency-Key no estado compartilhado.
+    Enquanto ela roda a chave fica marcada como `running`; replays esperam o resultado.
+    As chaves valem dentro de um escopo (o usuário), então clientes diferentes não colidem.
+    """
+
+    def __init__(self, state: SharedState | None = None):
+        self._state = state or get_shared_state()
+        self._settings = get_settings()
+        # a trava não pode expirar com a primeira execução ainda viva (fila + prazo máximo)
+        self._lock_ttl = max(
+            self._settings.idempotency_lock_ttl,
+            self._settings.request_timeout_max + self._settings.admission_max_wait,
+        )
+
+    @staticmethod
+    def _key(scope: str, key: str) -> str:
+        return f"idem:{scope}:{key}"
+
+    async def begin(self, scope: str, key: str, request_fingerprint: str) -> dict[str, Any] | None:
+        """None se esta requisição deve executar; senão o registro concluído para devolver."""
+        claim = {"state": "running", "fingerprint": request_fingerprint}
+
+        def _claim(current: dict | None) -> tuple[dict, dict | None]:
+            return (claim, None) if current is None else (current, current)
+
+        deadline = time.monotonic() + self._settings.idempotency_wait_timeout
+        while True:
+            record = await to_thread.run_sync(self._state.update, self._key(scope, key), _claim, self._lock_ttl)
+            if record is None:
+                return None
+            if record["fingerprint"] != request_fingerprint:
+                raise ValueError("Idempotency-Key already used with a different request")
+            if record["state"] == "done":
+                return record
+            if time.monotonic() >= deadline:
+                raise IdempotencyInProgress(key)
+            await asyncio.sleep(self._settings.idempotency_poll_interval)
+
+    async def complete(self, scope: str, key: str, request_fingerprint: str, status: int, body: Any) -> None:
+        record = {"state": "done", "fingerprint": request_fingerprint, "status": status, "body": body}
+        await to_thread.run_sync(self._state.set, self._key(scope, key), record, self._settings.idempotency_ttl)
+
+    async def release(self, scope: str, key: str) -> None:
+        """Libera a chave para que um retry execute de novo (ex.: falha no Gemini)."""
+        await to_thread.run_sync(self._state.delete, self._key(scope, key))
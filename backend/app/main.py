@@ -1,36 +1,266 @@
-from fastapi import FastAPI, HTTPException, Depends
+import asyncio, hmac, logging
+from collections.abc import Awaitable, Callable
+from contextlib import asynccontextmanager
+from datetime import date
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
+from fastapi.responses import JSONResponse
 import httpx
-from .schemas import GenerateGoalPayload
+from .config import get_settings
+from .schemas import GenerateGoalPayload, GoalWebhookEvent
 from .service import GoalBreakdownService
 from .gemini_client import GeminiClient
-from .plan_repository import PlanRepository
+from .plan_repository import PlanRepository, WriteNotConfirmed
+from .responses import PlanResponse
+from .metrics import generation_metrics, prompt_metrics
+from .admission import Overloaded
+from .idempotency import IdempotencyStore, IdempotencyInProgress, fingerprint
+from .agenda import Agenda, Window, get_agenda
+from .auth import current_user_id, optional_user_id
+from .deadline import Deadline, DeadlineExceeded
 
-app = FastAPI(title="Wise Quest Backend")
+logger = logging.getLogger(__name__)
+_background_tasks: set[asyncio.Task] = set()
 
-async def get_service() -> GoalBreakdownService:
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # cliente HTTP de vida longa para o trabalho que continua depois da resposta
     async with httpx.AsyncClient() as http_client:
-        service = GoalBreakdownService(GeminiClient(http_client), PlanRepository())
+        app.state.background_http = http_client
+        yield
+        for task in list(_background_tasks):
+            task.cancel()
+
+app = FastAPI(title="Wise Quest Backend", lifespan=lifespan)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": str(exc.retry_after)})
+
+async def get_deadline(x_request_timeout: float | None = Header(default=None, gt=0)) -> Deadline | None:
+    """Prazo da requisição: `REQUEST_TIMEOUT` ou o header `X-Request-Timeout` (segundos)."""
+    settings = get_settings()
+    seconds = min(x_request_timeout, settings.request_timeout_max) if x_request_timeout else settings.request_timeout
+    return Deadline.after(seconds) if seconds > 0 else None
+
+async def get_service(deadline: Deadline | None = Depends(get_deadline)) -> GoalBreakdownService:
+    async with httpx.AsyncClient() as http_client:
+        service = GoalBreakdownService(
+            GeminiClient(http_client, deadline=deadline), PlanRepository(deadline=deadline), deadline=deadline
+        )
         yield service
 
-@app.post("/goals/{goal_id}/plan")
-async def generate_plan(goal_id: str, body: GenerateGoalPayload, service: GoalBreakdownService = Depends(get_service)):
-    try:
-        if goal_id != body.goalId:
-            raise ValueError("Payload goalId mismatch")
+async def get_background_service(request: Request) -> GoalBreakdownService:
+    return GoalBreakdownService(GeminiClient(request.app.state.background_http), PlanRepository())
+
+def _spawn(coro: Awaitable) -> None:
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+
+    def _done(task: asyncio.Task) -> None:
+        _background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background plan generation failed: %s", task.exception())
+
+    task.add_done_callback(_done)
+
+async def _pregenerate(service: GoalBreakdownService, payload: GenerateGoalPayload, user_id: str | None) -> None:
+    # o idioma do perfil é o que o frontend vai mandar no clique; sem ele o rascunho não bate
+    if user_id:
+        payload = payload.model_copy(update={"language": await service.preferred_language(user_id)})
+    await service.pregenerate(payload)
+
+async def get_idempotency_store() -> IdempotencyStore:
+    return IdempotencyStore()
+
+async def _run_generation(body: GenerateGoalPayload, service: GoalBreakdownService, include_plan: bool) -> dict:
+    if not include_plan:
         milestones, tasks = await service.generate(body)
         return {"success": True, "milestonesCount": milestones, "tasksCount": tasks}
+
+    milestones, tasks, plan = await service.generate_with_plan(body)
+    return {
+        "success": True,
+        "milestonesCount": milestones,
+        "tasksCount": tasks,
+        "plan": plan.model_dump(mode="json", by_alias=True),
+    }
+
+async def _run_replan(body: GenerateGoalPayload, service: GoalBreakdownService, include_plan: bool) -> dict:
+    diff = await service.replan(body)
+    content = {
+        "success": True,
+        "milestonesKept": diff.kept_milestones,
+        "tasksKept": diff.kept_tasks,
+        "milestonesInserted": len(diff.milestone_inserts),
+        "milestonesUpdated": len(diff.milestone_updates),
+        "milestonesDeleted": len(diff.milestone_deletes),
+        "tasksInserted": len(diff.task_inserts),
+        "tasksUpdated": len(diff.task_updates),
+        "tasksDeleted": len(diff.task_deletes),
+    }
+    if include_plan:
+        content["plan"] = (await service.current_plan(body.goalId)).model_dump(mode="json", by_alias=True)
+    return content
+
+async def _execute(run: Callable[[], Awaitable[dict]]) -> tuple[int, dict]:
+    try:
+        return 200, await run()
     except ValueError as exc:
-        raise HTTPException(status_code=400, detail=str(exc))
+        return 400, {"detail": str(exc)}
+    except DeadlineExceeded as exc:
+        generation_metrics.deadline_exceeded += 1
+        return 504, {"detail": str(exc)}
+    except WriteNotConfirmed as exc:
+        return 504, {"detail": str(exc)}
     except RuntimeError as exc:
-        raise HTTPException(status_code=502, detail=str(exc))
+        return 502, {"detail": str(exc)}
+
+async def _handle(
+    route: str,
+    body: GenerateGoalPayload,
+    run: Callable[[], Awaitable[dict]],
+    include_plan: bool,
+    accept_encoding: str | None,
+    idempotency_key: str | None,
+    idempotency: IdempotencyStore,
+    user_id: str | None,
+    service: GoalBreakdownService,
+):
+    if not idempotency_key:
+        status, content = await _execute(run)
+        if status != 200:
+            raise HTTPException(status_code=status, detail=content["detail"])
+        return PlanResponse(content, accept_encoding=accept_encoding) if include_plan else content
+
+    # sem token de usuário (ex.: Edge Function com a chave de serviço), a meta define o escopo:
+    # cada meta é de um só usuário
+    scope = f"user:{user_id}" if user_id else f"goal:{body.goalId}"
+    request_fingerprint = fingerprint(route, body.model_dump_json(by_alias=True), str(include_plan))
+    try:
+        record = await idempotency.begin(scope, idempotency_key, request_fingerprint)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    except IdempotencyInProgress:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+    if record is not None:
+        response = PlanResponse(record["body"], accept_encoding=accept_encoding, status_code=record["status"])
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+    try:
+        status, content = await _execute(run)
+    except BaseException:
+        if service.write_sent:
+            await idempotency.complete(
+                scope, idempotency_key, request_fingerprint, 504, {"detail": "The plan may have been saved"}
+            )
+        else:
+            await idempotency.release(scope, idempotency_key)
+        raise
+    if status >= 500 and not service.write_sent:
+        # falha do upstream antes de qualquer escrita não é definitiva: deixa o retry tentar de novo
+        await idempotency.release(scope, idempotency_key)
+    else:
+        # depois que a escrita saiu o plano pode estar gravado: o retry recebe esta resposta
+        # em vez de gravar as linhas de novo
+        await idempotency.complete(scope, idempotency_key, request_fingerprint, status, content)
+    return PlanResponse(content, accept_encoding=accept_encoding, status_code=status)
+
+@app.post("/goals/{goal_id}/plan")
+async def generate_plan(
+    goal_id: str,
+    body: GenerateGoalPayload,
+    include_plan: bool = False,
+    accept_encoding: str | None = Header(default=None),
+    idempotency_key: str | None = Header(default=None),
+    service: GoalBreakdownService = Depends(get_service),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+    user_id: str | None = Depends(optional_user_id),
+):
+    if goal_id != body.goalId:
+        raise HTTPException(status_code=400, detail="Payload goalId mismatch")
+    return await _handle(
+        f"/goals/{goal_id}/plan", body, lambda: _run_generation(body, service, include_plan),
+        include_plan, accept_encoding, idempotency_key, idempotency, user_id, service,
+    )
+
+@app.post("/goals/{goal_id}/replan")
+async def replan_goal(
+    goal_id: str,
+    body: GenerateGoalPayload,
+    include_plan: bool = False,
+    accept_encoding: str | None = Header(default=None),
+    idempotency_key: str | None = Header(default=None),
+    service: GoalBreakdownService = Depends(get_service),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+    user_id: str | None = Depends(optional_user_id),
+):
+    if goal_id != body.goalId:
+        raise HTTPException(status_code=400, detail="Payload goalId mismatch")
+    return await _handle(
+        f"/goals/{goal_id}/replan", body, lambda: _run_replan(body, service, include_plan),
+        include_plan, accept_encoding, idempotency_key, idempotency, user_id, service,
+    )
 
 # alias compatível com a Edge Function (sem quebrar frontend)
 @app.post("/api/generate-goal-breakdown")
-async def generate_goal_breakdown(body: GenerateGoalPayload, service: GoalBreakdownService = Depends(get_service)):
+async def generate_goal_breakdown(
+    body: GenerateGoalPayload,
+    include_plan: bool = False,
+    accept_encoding: str | None = Header(default=None),
+    idempotency_key: str | None = Header(default=None),
+    service: GoalBreakdownService = Depends(get_service),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+    user_id: str | None = Depends(optional_user_id),
+):
+    return await _handle(
+        "/api/generate-goal-breakdown", body, lambda: _run_generation(body, service, include_plan),
+        include_plan, accept_encoding, idempotency_key, idempotency, user_id, service,
+    )
+
+# webhook do banco (INSERT em public.goals): pré-gera o plano enquanto o usuário ainda não pediu
+@app.post("/webhooks/goals", status_code=202)
+async def goal_created(
+    event: GoalWebhookEvent,
+    x_webhook_secret: str | None = Header(default=None),
+    service: GoalBreakdownService = Depends(get_background_service),
+):
+    settings = get_settings()
+    if not settings.speculative_generation:
+        return {"scheduled": False}
+    # sem segredo qualquer um dispararia gerações no Gemini: recusa em vez de ficar aberto
+    if not settings.goal_webhook_secret:
+        raise HTTPException(status_code=503, detail="GOAL_WEBHOOK_SECRET is not configured")
+    if not hmac.compare_digest((x_webhook_secret or "").encode(), settings.goal_webhook_secret.encode()):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    if event.type != "INSERT" or event.table != "goals":
+        return {"scheduled": False}
     try:
-        milestones, tasks = await service.generate(body)
-        return {"success": True, "milestonesCount": milestones, "tasksCount": tasks}
+        payload = event.to_payload(settings.speculative_language)
+    except ValueError:
+        return {"scheduled": False}
+    _spawn(_pregenerate(service, payload, event.record.user_id))
+    return {"scheduled": True}
+
+@app.get("/agenda")
+async def agenda(
+    window: Window = "day",
+    day: date | None = Query(default=None, alias="date"),
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=200),
+    user_id: str = Depends(current_user_id),
+    agenda: Agenda = Depends(get_agenda),
+):
+    try:
+        return await agenda.page(user_id, window, day or date.today(), cursor, limit)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
-    except RuntimeError as exc:
-        raise HTTPException(status_code=502, detail=str(exc))
+
+@app.get("/metrics/generation")
+async def generation_stats():
+    return generation_metrics.snapshot()
+
+@app.get("/metrics/prompts")
+async def prompt_stats():
+    return prompt_metrics.snapshot()
@@ -0,0 +1,57 @@
+from dataclasses import dataclass, asdict, field
+
+@dataclass
+class GenerationMetrics:
+    requests: int = 0
+    model_attempts: int = 0
+    fallbacks: int = 0  # pedidos que precisaram de outro modelo além do primeiro
+    upstream_failures: int = 0
+    truncated_responses: int = 0
+    continuations: int = 0
+    plans_validated: int = 0
+    validation_failures: int = 0
+    plan_cache_hits: int = 0
+    shed_requests: int = 0  # recusados com 503 pelo controle de admissão
+    drafts_generated: int = 0  # planos pré-gerados pelo webhook de criação de meta
+    draft_hits: int = 0
+    template_lookups: int = 0
+    template_hits: int = 0  # planos reancorados de uma meta parecida, sem chamar o Gemini
+    deadline_exceeded: int = 0  # requisições encerradas com 504 pelo prazo
+    batches: int = 0  # pedidos ao Gemini com planos de várias metas
+    batched_plans: int = 0  # planos que vieram de um lote
+    batch_fallbacks: int = 0  # pedidos que voltaram à geração individual (lote falhou ou sem o plano)
+
+    def snapshot(self) -> dict:
+        data = asdict(self)
+        data["fallback_rate"] = round(self.fallbacks / self.requests, 4) if self.requests else 0.0
+        checked = self.plans_validated + self.validation_failures
+        data["validation_failure_rate"] = round(self.validation_failures / checked, 4) if checked else 0.0
+        data["template_hit_rate"] = round(self.template_hits / self.template_lookups, 4) if self.template_lookups else 0.0
+        data["plans_per_batch"] = round(self.batched_plans / self.batches, 2) if self.batches else 0.0
+        # o que conta para a cota do Gemini: chamadas por plano gerado
+        data["attempts_per_plan"] = round(self.model_attempts / self.plans_validated, 2) if self.plans_validated else 0.0
+        return data
+
+generation_metrics = GenerationMetrics()
+
+@dataclass
+class PromptMetrics:
+    prompts_built: int = 0
+    input_tokens_total: int = 0  # estimados, ~4 caracteres por token
+    input_tokens_max: int = 0
+    fields_trimmed: int = 0  # descrições/títulos cortados para caber no orçamento
+    tokens_trimmed: int = 0
+    by_template: dict[str, int] = field(default_factory=dict)
+
+    def record(self, template: str, tokens: int) -> None:
+        self.prompts_built += 1
+        self.input_tokens_total += tokens
+        self.input_tokens_max = max(self.input_tokens_max, tokens)
+        self.by_template[template] = self.by_template.get(template, 0) + 1
+
+    def snapshot(self) -> dict:
+        data = asdict(self)
+        data["input_tokens_avg"] = round(self.input_tokens_total / self.prompts_built, 1) if self.prompts_built else 0.0
+        return data
+
+prompt_metrics = PromptMetrics()
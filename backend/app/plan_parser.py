@@ -0,0 +1,58 @@
+import json, re
+from typing import Any
+
+_decoder = json.JSONDecoder()
+
+def extract_json(text: str) -> str:
+    # limpa cercas de código e extrai só o JSON
+    text = re.sub(r"^```(?:json)?|```$", "", text.strip(), flags=re.MULTILINE)
+    m = re.search(r"\{[\s\S]*\}", text)
+    return m.group(0) if m else text
+
+def _salvage_array(text: str, key: str) -> tuple[list[dict[str, Any]], bool]:
+    """Decodifica os objetos completos do array `key`; retorna (itens, array_fechado)."""
+    m = re.search(rf'"{key}"\s*:\s*\[', text)
+    if not m:
+        return [], False
+    items, pos = [], m.end()
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text):
+            return items, False
+        if text[pos] == "]":
+            return items, True
+        try:
+            item, pos = _decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            return items, False
+        if isinstance(item, dict):
+            items.append(item)
+
+def salvage_plan(text: str) -> tuple[dict[str, list[dict[str, Any]]], bool]:
+    """
+    Recupera milestones e tasks completos de um JSON possivelmente cortado.
+    Retorna (plano parcial, truncado).
+    """
+    start = text.find("{")
+    if start >= 0:
+        try:
+            data, _ = _decoder.raw_decode(text, start)
+            if isinstance(data, dict):
+                return {"milestones": data.get("milestones") or [], "tasks": data.get("tasks") or []}, False
+        except json.JSONDecodeError:
+            pass
+    milestones, milestones_closed = _salvage_array(text, "milestones")
+    tasks, tasks_closed = _salvage_array(text, "tasks")
+    return {"milestones": milestones, "tasks": tasks}, not (milestones_closed and tasks_closed)
+
+def last_sequence(items: list[dict[str, Any]]) -> int:
+    return max((i.get("order_sequence") or 0 for i in items if isinstance(i.get("order_sequence"), int)), default=0)
+
+def merge_plans(base: dict[str, list], tail: dict[str, list]) -> dict[str, list]:
+    """Acrescenta ao plano os itens da continuação que ainda não existem (por order_sequence)."""
+    merged = {}
+    for key in ("milestones", "tasks"):
+        seen = {i.get("order_sequence") for i in base[key]}
+        merged[key] = base[key] + [i for i in tail[key] if i.get("order_sequence") not in seen]
+    return merged
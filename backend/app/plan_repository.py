@@ -1,24 +1,132 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import date
+from typing import Any
+import httpx
 from supabase.client import create_client, Client
 from .config import get_settings
-from .schemas import Plan
+from .deadline import Deadline, DeadlineExceeded
+from .schemas import Plan, PersistedPlan
+from .replan import PlanDiff
+
+AGENDA_COLUMNS = (
+    "id,goal_id,title,description,status,priority,estimated_duration,actual_duration,"
+    "due_date,prerequisites,is_ai_generated,order_sequence,completed_at"
+)
+
+class WriteNotConfirmed(RuntimeError):
+    """A escrita foi enviada mas a resposta não chegou: pode ter sido gravada; vira 504."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Database did not confirm {stage}; it may have been saved")
+        self.stage = stage
 
 class PlanRepository:
-    def __init__(self, client: Client | None = None):
+    def __init__(self, client: Client | None = None, deadline: Deadline | None = None):
         settings = get_settings()
-        self._client = client or create_client(settings.supabase_url, settings.supabase_service_key)
+        self._client = client or create_client(str(settings.supabase_url), settings.supabase_service_key)
+        self._deadline = deadline
+        self._write_timeout = settings.database_write_timeout
+
+    @contextmanager
+    def _bounded(self, stage: str) -> Iterator[None]:
+        """Leituras: sem orçamento a chamada nem começa; com orçamento, o HTTP não passa do que sobra."""
+        if self._deadline is None:
+            yield
+            return
+        self._client.postgrest.session.timeout = httpx.Timeout(self._deadline.budget(stage))
+        try:
+            yield
+        except httpx.TimeoutException:
+            if self._deadline.expired:
+                raise DeadlineExceeded(stage) from None
+            raise
+
+    @contextmanager
+    def _writing(self, stage: str) -> Iterator[None]:
+        """
+        Escritas não seguem o prazo: cortada no meio, a transação pode já ter feito commit.
+        O serviço confere o prazo antes de começar; aqui o timeout é fixo.
+        """
+        self._client.postgrest.session.timeout = httpx.Timeout(self._write_timeout)
+        try:
+            yield
+        except httpx.TimeoutException:
+            raise WriteNotConfirmed(stage) from None
 
     def get_goal_owner(self, goal_id: str) -> str:
-        resp = self._client.table("goals").select("user_id").eq("id", goal_id).single().execute()
+        with self._bounded("loading the goal"):
+            resp = self._client.table("goals").select("user_id").eq("id", goal_id).single().execute()
         if not resp.data:
             raise ValueError("Goal not found")
         return resp.data["user_id"]
 
-    def persist_plan(self, goal_id: str, user_id: str, plan: Plan) -> tuple[int, int]:
+    def get_language_preference(self, user_id: str) -> str | None:
+        resp = self._client.table("profiles").select("language_preference").eq("user_id", user_id).limit(1).execute()
+        return resp.data[0]["language_preference"] if resp.data else None
+
+    def persist_plan(self, goal_id: str, user_id: str, plan: Plan) -> PersistedPlan:
+        """Grava o plano numa transação (RPC) e devolve só as linhas inseridas agora, com os ids."""
+        payload = {
+            "goal_id": goal_id,
+            "user_id": user_id,
+            "milestones": [m.model_dump(mode="json", by_alias=True) for m in plan.milestones],
+            "tasks": [t.model_dump(mode="json", by_alias=True) for t in plan.tasks],
+        }
+        with self._writing("persisting the plan"):
+            result = self._client.rpc("persist_generated_plan", payload).execute()
+        return PersistedPlan.model_validate({"milestones": result.data["milestones"], "tasks": result.data["tasks"]})
+
+    def fetch_plan(self, goal_id: str) -> PersistedPlan:
+        with self._bounded("loading the plan"):
+            milestones = (
+                self._client.table("milestones")
+                .select("id,title,description,order_sequence,status")
+                .eq("goal_id", goal_id)
+                .order("order_sequence")
+                .execute()
+            )
+            tasks = (
+                self._client.table("tasks")
+                .select("id,title,description,priority,estimated_duration,due_date,prerequisites,order_sequence,status")
+                .eq("goal_id", goal_id)
+                .order("order_sequence")
+                .execute()
+            )
+        return PersistedPlan.model_validate({"milestones": milestones.data or [], "tasks": tasks.data or []})
+
+    def fetch_agenda(
+        self, user_id: str, start: date, end: date, after: tuple[str, str] | None, limit: int
+    ) -> list[dict[str, Any]]:
+        """
+        Tarefas com due_date em [start, end] na ordem (due_date, id), depois de `after`.
+        Paginação por chave em vez de offset: com o índice (user_id, due_date, id) o custo
+        depende da janela e do limite, não do histórico do usuário.
+        """
+        query = (
+            self._client.table("tasks")
+            .select(AGENDA_COLUMNS)
+            .eq("user_id", user_id)
+            .gte("due_date", start.isoformat())
+            .lte("due_date", end.isoformat())
+        )
+        if after is not None:
+            due_date, task_id = after
+            query = query.or_(f"due_date.gt.{due_date},and(due_date.eq.{due_date},id.gt.{task_id})")
+        return query.order("due_date").order("id").limit(limit).execute().data or []
+
+    def apply_plan_diff(self, goal_id: str, user_id: str, diff: PlanDiff) -> int:
+        """Aplica só as linhas que mudaram, todas numa transação (RPC); devolve quantas foram gravadas."""
         payload = {
             "goal_id": goal_id,
             "user_id": user_id,
-            "milestones": [m.model_dump(by_alias=True) for m in plan.milestones],
-            "tasks": [t.model_dump(by_alias=True) for t in plan.tasks],
+            "milestone_inserts": diff.milestone_inserts,
+            "milestone_updates": diff.milestone_updates,
+            "milestone_deletes": diff.milestone_deletes,
+            "task_inserts": diff.task_inserts,
+            "task_updates": diff.task_updates,
+            "task_deletes": diff.task_deletes,
         }
-        result = self._client.rpc("persist_generated_plan", payload).execute()
-        return result.data["milestones_inserted"], result.data["tasks_inserted"]
+        with self._writing("applying the plan diff"):
+            result = self._client.rpc("apply_plan_diff", payload).execute()
+        return sum(result.data.values())
@@ -0,0 +1,124 @@
+import time, unicodedata, uuid
+from datetime import date, timedelta
+from typing import Any
+from anyio import to_thread
+from .config import get_settings
+from .metrics import generation_metrics
+from .schemas import GenerateGoalPayload, Plan
+from .shared_state import SharedState, get_shared_state
+
+# palavras que não distinguem metas ("aprender a tocar violão" ~ "tocar violão")
+_STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "de", "do", "da", "dos", "das", "em", "no", "na", "para", "por",
+    "meu", "minha", "e", "com", "the", "an", "to", "of", "in", "on", "for", "my", "and", "with",
+}
+
+def title_tokens(title: str) -> frozenset[str]:
+    """Título sem caixa, acentos, pontuação e stopwords, como conjunto de palavras."""
+    folded = unicodedata.normalize("NFKD", title.casefold())
+    plain = "".join(c if c.isalnum() else " " for c in folded if not unicodedata.combining(c))
+    return frozenset(t for t in plain.split() if t not in _STOPWORDS)
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def to_template(payload: GenerateGoalPayload, days_until_target: int, plan: Plan) -> dict[str, Any]:
+    """Plano com as datas como fração do horizonte (0 = hoje, 1 = prazo)."""
+    today = date.today()
+    tasks = []
+    for task in plan.tasks:
+        row = task.model_dump(mode="json", by_alias=True)
+        offset = (task.due_date - today).days
+        row["due_fraction"] = round(min(1.0, max(0.0, offset / days_until_target)), 4)
+        del row["due_date"]
+        tasks.append(row)
+    return {
+        "tokens": sorted(title_tokens(payload.goal.title)),
+        "effort": payload.goal.effort_estimated,
+        "horizon_days": days_until_target,
+        "stored_at": time.time(),
+        "milestones": [m.model_dump(mode="json", by_alias=True) for m in plan.milestones],
+        "tasks": tasks,
+    }
+
+def anchor(template: dict[str, Any], target: date) -> Plan:
+    """Reancora um template no prazo novo: cada tarefa mantém sua fração do horizonte."""
+    today = date.today()
+    horizon = (target - today).days
+    tasks = []
+    for row in template["tasks"]:
+        due = today + timedelta(days=round(row["due_fraction"] * horizon))
+        tasks.append({k: v for k, v in row.items() if k != "due_fraction"} | {"due_date": min(due, target).isoformat()})
+    return Plan.model_validate({"milestones": template["milestones"], "tasks": tasks})
+
+class PlanTemplates:
+    """
+    Planos já gerados, guardados em forma relativa e indexados por idioma e esforço. Metas
+    parecidas (títulos com tokens em comum, horizonte comparável) reaproveitam o plano em vez
+    de chamar o Gemini. Metas sem descrição usam um índice compartilhado entre usuários; com
+    descrição o plano pode refletir texto privado, então só serve ao próprio dono.
+    O índice só guarda tokens e horizonte; cada plano fica na sua própria chave e só o
+    escolhido é lido.
+    """
+
+    def __init__(self, state: SharedState | None = None):
+        self._state = state or get_shared_state()
+        self._settings = get_settings()
+
+    @staticmethod
+    def _index(user_id: str, payload: GenerateGoalPayload) -> str:
+        # sem descrição o prompt só tem título, esforço e prazo: nada do plano é privado
+        scope = f"user:{user_id}" if (payload.goal.description or "").strip() else "shared"
+        return f"templates:{scope}:{payload.language}:{payload.goal.effort_estimated}"
+
+    @staticmethod
+    def _entry(template_id: str) -> str:
+        return f"template:{template_id}"
+
+    def _fresh(self, template: dict) -> bool:
+        return time.time() - template["stored_at"] < self._settings.template_ttl
+
+    def _comparable(self, template: dict, days_until_target: int) -> bool:
+        ratio = max(template["horizon_days"], days_until_target) / max(1, min(template["horizon_days"], days_until_target))
+        return ratio <= self._settings.template_max_horizon_ratio
+
+    async def match(self, user_id: str, payload: GenerateGoalPayload, days_until_target: int) -> Plan | None:
+        generation_metrics.template_lookups += 1
+        index = await to_thread.run_sync(self._state.get, self._index(user_id, payload)) or []
+        tokens = title_tokens(payload.goal.title)
+        best, best_score = None, self._settings.template_min_similarity
+        for meta in index:
+            score = similarity(tokens, frozenset(meta["tokens"]))
+            if score >= best_score and self._fresh(meta) and self._comparable(meta, days_until_target):
+                best, best_score = meta, score
+        if best is None:
+            return None
+        template = await to_thread.run_sync(self._state.get, self._entry(best["id"]))
+        if template is None:
+            return None
+        generation_metrics.template_hits += 1
+        return anchor(template, payload.targetDate)
+
+    async def store(self, user_id: str, payload: GenerateGoalPayload, days_until_target: int, plan: Plan) -> None:
+        template = to_template(payload, days_until_target, plan)
+        if not template["tokens"]:
+            return
+        ttl, limit = self._settings.template_ttl, self._settings.template_bucket_size
+        meta = {k: template[k] for k in ("tokens", "horizon_days", "stored_at")} | {"id": uuid.uuid4().hex}
+        await to_thread.run_sync(self._state.set, self._entry(meta["id"]), template, ttl)
+
+        def _add(index: list | None) -> tuple[list, list[str]]:
+            # substitui o template da mesma meta/horizonte e mantém só os mais recentes
+            kept = [
+                t for t in index or []
+                if self._fresh(t) and (t["tokens"] != meta["tokens"] or not self._comparable(t, days_until_target))
+            ]
+            kept = (kept + [meta])[-limit:]
+            ids = {t["id"] for t in kept}
+            return kept, [t["id"] for t in index or [] if t["id"] not in ids]
+
+        dropped = await to_thread.run_sync(self._state.update, self._index(user_id, payload), _add, ttl)
+        for template_id in dropped:
+            await to_thread.run_sync(self._state.delete, self._entry(template_id))
@@ -1,15 +1,64 @@
 from datetime import date
+from string import Formatter
+from .config import get_settings
 from .schemas import GoalPayload, SupportedLanguage
+from .plan_parser import last_sequence
+from .metrics import prompt_metrics
 
-def build_prompt(goal: GoalPayload, target: date, days_until_target: int, language: SupportedLanguage) -> str:
-    if language == "en":
-        return f"""As a planning expert, break the goal below into daily tasks.
+CHARS_PER_TOKEN = 4
+TRIM_MARKER = " [...] "
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa rápida (~4 caracteres por token), suficiente para orçamento."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+class PromptTemplate:
+    """Template `str.format` validado uma vez no registro; guarda o tamanho da parte fixa."""
+
+    def __init__(self, text: str):
+        parsed = list(Formatter().parse(text))
+        self.text = text
+        self.fields = frozenset(name for _, name, _, _ in parsed if name)
+        self.fixed_tokens = estimate_tokens("".join(literal for literal, _, _, _ in parsed))
+
+    def render(self, **values: object) -> str:
+        return self.text.format_map(values)
+
+_REGISTRY: dict[tuple[str, SupportedLanguage], PromptTemplate] = {}
+
+def register_template(name: str, language: SupportedLanguage, text: str) -> PromptTemplate:
+    _REGISTRY[(name, language)] = PromptTemplate(text)
+    return _REGISTRY[(name, language)]
 
-GOAL: {goal.title}
-DESCRIPTION: {goal.description or 'No description'}
-DEADLINE: {days_until_target} days (until {target.strftime('%m/%d/%Y')})
-IMPORTANCE: {goal.importance_level}/5
-ESTIMATED EFFORT: {goal.effort_estimated}/5
+def get_template(name: str, language: SupportedLanguage) -> PromptTemplate:
+    return _REGISTRY[(name, language)]
+
+def fit_text(text: str, max_tokens: int) -> str:
+    """
+    Corta `text` para ~`max_tokens` de forma determinística: normaliza espaços e mantém
+    o começo (2/3) e o fim (1/3), onde costumam estar o contexto e o pedido concreto.
+    """
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) > 3 * limit:
+        # só as pontas entram no resultado: não normaliza o miolo de textos enormes
+        text = text[: 2 * limit] + "\n" + text[-limit:]
+    text = "\n".join(" ".join(line.split()) for line in text.splitlines() if line.strip())
+    if len(text) <= limit:
+        return text
+    room = max(0, limit - len(TRIM_MARKER))
+    head, tail = text[: room * 2 // 3], text[len(text) - room // 3:] if room // 3 else ""
+    # não corta palavras ao meio
+    head = head.rsplit(" ", 1)[0] if " " in head else head
+    tail = tail.split(" ", 1)[-1] if " " in tail else tail
+    return f"{head.rstrip()}{TRIM_MARKER}{tail.lstrip()}".strip()
+
+register_template("plan", "en", """As a planning expert, break the goal below into daily tasks.
+
+GOAL: {title}
+DESCRIPTION: {description}
+DEADLINE: {days_until_target} days (until {target})
+IMPORTANCE: {importance}/5
+ESTIMATED EFFORT: {effort}/5
 
 Rules:
 - Balance tasks across {days_until_target} days.
@@ -26,14 +75,15 @@ Respond ONLY with valid JSON:
     "estimated_duration":60,"due_date":"2025-12-01","prerequisites":["..."],"order_sequence":1
   }}]
 }}
-"""
-    return f"""Como especialista em planejamento, quebre a meta abaixo em tarefas diárias.
+""")
 
-META: {goal.title}
-DESCRIÇÃO: {goal.description or 'Sem descrição'}
-PRAZO: {days_until_target} dias (até {target.strftime('%d/%m/%Y')})
-IMPORTÂNCIA: {goal.importance_level}/5
-ESFORÇO ESTIMADO: {goal.effort_estimated}/5
+register_template("plan", "pt", """Como especialista em planejamento, quebre a meta abaixo em tarefas diárias.
+
+META: {title}
+DESCRIÇÃO: {description}
+PRAZO: {days_until_target} dias (até {target})
+IMPORTÂNCIA: {importance}/5
+ESFORÇO ESTIMADO: {effort}/5
 
 Regras:
 - Distribua o plano ao longo dos {days_until_target} dias.
@@ -50,4 +100,115 @@ Responda APENAS com JSON válido:
     "estimated_duration":60,"due_date":"2025-12-01","prerequisites":["..."],"order_sequence":1
   }}]
 }}
-"""
+""")
+
+register_template("continuation", "en", """{original_prompt}
+The previous answer was cut off. Milestones up to order_sequence {last_milestone} and tasks up to order_sequence {last_task} were already generated. {context}
+Continue the SAME plan returning ONLY the remaining items: milestones with order_sequence > {last_milestone} and tasks with order_sequence > {last_task}.
+Use the same JSON format; use "milestones": [] if no milestone is missing.
+""")
+
+register_template("continuation", "pt", """{original_prompt}
+A resposta anterior foi interrompida. Já foram gerados marcos até order_sequence {last_milestone} e tarefas até order_sequence {last_task}. {context}
+Continue o MESMO plano retornando APENAS os itens restantes: marcos com order_sequence > {last_milestone} e tarefas com order_sequence > {last_task}.
+Use o mesmo formato JSON; use "milestones": [] se não faltar nenhum marco.
+""")
+
+register_template("replan", "en", """{base}
+PROGRESS SO FAR: {completed_tasks} of {total_tasks} tasks completed ({completed_minutes} min).
+Recently completed: {recent}
+In progress (kept as is): {doing}
+Skipped by the user (do not plan again): {skipped}
+Milestones already reached: {milestones}
+Plan ONLY the remaining work from today until the deadline; do not repeat completed or in-progress tasks.
+Number milestones from order_sequence {next_milestone_sequence} and tasks from order_sequence {next_task_sequence}.
+""")
+
+register_template("replan", "pt", """{base}
+PROGRESSO ATÉ AGORA: {completed_tasks} de {total_tasks} tarefas concluídas ({completed_minutes} min).
+Concluídas recentemente: {recent}
+Em andamento (serão mantidas): {doing}
+Puladas pelo usuário (não planeje de novo): {skipped}
+Marcos já alcançados: {milestones}
+Planeje APENAS o que falta de hoje até o prazo; não repita tarefas concluídas ou em andamento.
+Numere os marcos a partir de order_sequence {next_milestone_sequence} e as tarefas a partir de {next_task_sequence}.
+""")
+
+register_template("batch", "en", """Create one independent plan for each of the {count} goals below, following each goal's own instructions.
+Respond ONLY with a JSON object whose keys are the goal ids ({ids}) and whose values are the plans, each in the format requested for that goal.
+{goals}""")
+
+register_template("batch", "pt", """Crie um plano independente para cada uma das {count} metas abaixo, seguindo as instruções de cada uma.
+Responda APENAS com um objeto JSON cujas chaves são os ids das metas ({ids}) e cujos valores são os planos, cada um no formato pedido para a meta.
+{goals}""")
+
+_NO_DESCRIPTION = {"en": "No description", "pt": "Sem descrição"}
+_DATE_FORMAT = {"en": "%m/%d/%Y", "pt": "%d/%m/%Y"}
+
+def _render(name: str, language: SupportedLanguage, **values: object) -> str:
+    prompt = get_template(name, language).render(**values)
+    prompt_metrics.record(name, estimate_tokens(prompt))
+    return prompt
+
+def _plan_values(goal: GoalPayload, target: date, days_until_target: int, language: SupportedLanguage) -> dict:
+    template = get_template("plan", language)
+    values = {
+        "title": goal.title,
+        "description": goal.description or _NO_DESCRIPTION[language],
+        "days_until_target": days_until_target,
+        "target": target.strftime(_DATE_FORMAT[language]),
+        "importance": goal.importance_level,
+        "effort": goal.effort_estimated,
+    }
+    # o texto livre do usuário (título e descrição) divide o que sobra do orçamento
+    budget = get_settings().prompt_max_input_tokens - template.fixed_tokens - 16
+    title_budget = max(16, budget // 8)
+    for name, limit in (("title", title_budget), ("description", max(16, budget - title_budget))):
+        text = str(values[name])
+        if estimate_tokens(text) > limit:
+            values[name] = fit_text(text, limit)
+            prompt_metrics.fields_trimmed += 1
+            prompt_metrics.tokens_trimmed += estimate_tokens(text) - estimate_tokens(values[name])
+    return values
+
+def build_prompt(goal: GoalPayload, target: date, days_until_target: int, language: SupportedLanguage) -> str:
+    return _render("plan", language, **_plan_values(goal, target, days_until_target, language))
+
+def build_continuation_prompt(original_prompt: str, plan: dict, language: SupportedLanguage) -> str:
+    """Pede só o trecho que faltou de um plano cortado por limite de tokens."""
+    previous = plan["tasks"][-1] if plan["tasks"] else None
+    if previous and language == "en":
+        context = f'Last task generated: "{previous.get("title")}" due {previous.get("due_date")}.'
+    elif previous:
+        context = f'Última tarefa gerada: "{previous.get("title")}" com prazo {previous.get("due_date")}.'
+    else:
+        context = ""
+    return _render(
+        "continuation", language, original_prompt=original_prompt, context=context,
+        last_milestone=last_sequence(plan["milestones"]), last_task=last_sequence(plan["tasks"]),
+    )
+
+def build_replan_prompt(
+    goal: GoalPayload, target: date, days_until_target: int, progress: dict, language: SupportedLanguage
+) -> str:
+    """Prompt só para a parte que falta: o progresso vai resumido, não o plano inteiro."""
+    # a base é renderizada direto do template: só o prompt "replan" entra nas métricas
+    base = get_template("plan", language).render(**_plan_values(goal, target, days_until_target, language))
+    return _render(
+        "replan", language,
+        base=base,
+        completed_tasks=progress["completed_tasks"],
+        total_tasks=progress["total_tasks"],
+        completed_minutes=progress["completed_minutes"],
+        recent="; ".join(progress["recent_completed"]) or "-",
+        doing="; ".join(progress["in_progress"]) or "-",
+        skipped="; ".join(progress["skipped"]) or "-",
+        milestones="; ".join(progress["completed_milestones"]) or "-",
+        next_milestone_sequence=progress["next_milestone_sequence"],
+        next_task_sequence=progress["next_task_sequence"],
+    )
+
+def build_batch_prompt(prompts: dict[str, str], language: SupportedLanguage) -> str:
+    """Vários prompts de plano num só pedido; a resposta traz um plano por id de meta."""
+    goals = "".join(f"\n### {key}\n{prompt}" for key, prompt in prompts.items())
+    return _render("batch", language, count=len(prompts), ids=", ".join(prompts), goals=goals)
@@ -0,0 +1,91 @@
+from dataclasses import dataclass, field
+from typing import Any
+from .schemas import Plan, PersistedPlan
+
+# tarefas/marcos nesses status são decisões do usuário (inclusive pular): o re-plano nunca os altera
+KEPT_STATUSES = {"completed", "in_progress", "skipped"}
+# campos comparados para decidir se uma linha existente precisa de UPDATE
+_MILESTONE_FIELDS = ("description", "order_sequence")
+_TASK_FIELDS = ("description", "priority", "estimated_duration", "due_date", "prerequisites", "order_sequence")
+
+@dataclass
+class PlanDiff:
+    milestone_inserts: list[dict[str, Any]] = field(default_factory=list)
+    milestone_updates: list[dict[str, Any]] = field(default_factory=list)  # linha completa com id
+    milestone_deletes: list[str] = field(default_factory=list)
+    task_inserts: list[dict[str, Any]] = field(default_factory=list)
+    task_updates: list[dict[str, Any]] = field(default_factory=list)
+    task_deletes: list[str] = field(default_factory=list)
+    kept_milestones: int = 0
+    kept_tasks: int = 0
+
+    @property
+    def rows_written(self) -> int:
+        return sum(len(rows) for rows in (
+            self.milestone_inserts, self.milestone_updates, self.milestone_deletes,
+            self.task_inserts, self.task_updates, self.task_deletes,
+        ))
+
+def _norm(title: str) -> str:
+    return " ".join(title.lower().split())
+
+def progress_summary(existing: PersistedPlan, max_titles: int = 8) -> dict[str, Any]:
+    """Resumo curto do que já foi feito; só os títulos mais recentes entram no prompt."""
+    kept_tasks = [t for t in existing.tasks if t.status in KEPT_STATUSES]
+    done = [t for t in kept_tasks if t.status == "completed"]
+    return {
+        "completed_tasks": len(done),
+        "completed_minutes": sum(t.estimated_duration or 0 for t in done),
+        "total_tasks": len(existing.tasks),
+        "recent_completed": [t.title for t in done[-max_titles:]],
+        "in_progress": [t.title for t in kept_tasks if t.status == "in_progress"][:max_titles],
+        "skipped": [t.title for t in kept_tasks if t.status == "skipped"][-max_titles:],
+        "completed_milestones": [m.title for m in existing.milestones if m.status in KEPT_STATUSES],
+        "next_milestone_sequence": max((m.order_sequence for m in existing.milestones if m.status in KEPT_STATUSES), default=0) + 1,
+        "next_task_sequence": max((t.order_sequence for t in kept_tasks), default=0) + 1,
+    }
+
+def _diff_items(
+    existing: list, generated: list, fields: tuple[str, ...], first_sequence: int
+) -> tuple[list[dict], list[dict], list[str], int]:
+    kept = [e for e in existing if e.status in KEPT_STATUSES]
+    kept_titles = {_norm(e.title) for e in kept}
+    open_items = [e for e in existing if e.status not in KEPT_STATUSES]
+    open_by_title: dict[str, Any] = {}
+    for e in open_items:
+        open_by_title.setdefault(_norm(e.title), e)
+
+    inserts, updates, matched, matched_ids = [], [], set(), set()
+    sequence = first_sequence
+    for item in generated:
+        key = _norm(item.title)
+        if key in kept_titles or key in matched:
+            continue  # o modelo repetiu algo já feito ou duplicou um item
+        row = item.model_dump(mode="json", by_alias=True) | {"order_sequence": sequence}
+        sequence += 1
+        current = open_by_title.get(key)
+        if current is None:
+            inserts.append(row)
+            continue
+        matched.add(key)
+        matched_ids.add(current.id)
+        stored = current.model_dump(mode="json", by_alias=True)
+        if any(stored.get(f) != row.get(f) for f in fields):
+            updates.append(stored | row | {"id": current.id})
+    deletes = [e.id for e in open_items if e.id not in matched_ids]
+    return inserts, updates, deletes, len(kept)
+
+def diff_plan(existing: PersistedPlan, remaining: Plan) -> PlanDiff:
+    """
+    Compara o plano gravado com o trecho regenerado.
+    Itens concluídos/em andamento ficam como estão; itens abertos com o mesmo título
+    só são atualizados se algum campo mudou; os que sumiram do novo plano são apagados.
+    """
+    summary = progress_summary(existing)
+    m_ins, m_upd, m_del, m_kept = _diff_items(
+        existing.milestones, remaining.milestones, _MILESTONE_FIELDS, summary["next_milestone_sequence"]
+    )
+    t_ins, t_upd, t_del, t_kept = _diff_items(
+        existing.tasks, remaining.tasks, _TASK_FIELDS, summary["next_task_sequence"]
+    )
+    return PlanDiff(m_ins, m_upd, m_del, t_ins, t_upd, t_del, m_kept, t_kept)
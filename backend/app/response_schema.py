@@ -0,0 +1,46 @@
+from functools import lru_cache
+from typing import Any
+from pydantic import BaseModel
+from .schemas import Plan
+
+# subconjunto OpenAPI aceito em generationConfig.responseSchema
+_ALLOWED_KEYS = {"type", "properties", "required", "items", "enum", "description", "nullable"}
+
+def _convert(node: dict[str, Any], defs: dict[str, Any]) -> dict[str, Any]:
+    if "$ref" in node:
+        node = defs[node["$ref"].rsplit("/", 1)[-1]]
+    if "anyOf" in node:
+        options = [o for o in node["anyOf"] if o.get("type") != "null"]
+        converted = _convert(options[0], defs)
+        if len(options) < len(node["anyOf"]):
+            converted["nullable"] = True
+        return converted
+
+    out: dict[str, Any] = {}
+    for key, value in node.items():
+        if key not in _ALLOWED_KEYS:
+            continue
+        if key == "type":
+            out["type"] = value.upper()
+        elif key == "properties":
+            out["properties"] = {name: _convert(prop, defs) for name, prop in value.items()}
+        elif key == "items":
+            out["items"] = _convert(value, defs)
+        else:
+            out[key] = value
+    if "enum" in out:
+        out["format"] = "enum"
+    return out
+
+def gemini_schema(model: type[BaseModel]) -> dict[str, Any]:
+    schema = model.model_json_schema(by_alias=True)
+    return _convert(schema, schema.get("$defs", {}))
+
+@lru_cache
+def plan_response_schema() -> dict[str, Any]:
+    """Schema de Plan/Milestone/Task no formato de responseSchema do Gemini."""
+    return gemini_schema(Plan)
+
+def batch_response_schema(keys: tuple[str, ...]) -> dict[str, Any]:
+    """Um Plan por chave (id da meta) para as respostas em lote."""
+    return {"type": "OBJECT", "properties": {key: plan_response_schema() for key in keys}, "required": list(keys)}
@@ -0,0 +1,71 @@
+import gzip, json
+from typing import Any
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli é opcional
+    brotli = None
+
+# abaixo disso comprimir custa mais do que economiza
+MIN_COMPRESS_SIZE = 1024
+
+def encode_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+def _quality(params: str) -> float:
+    for param in params.split(";"):
+        name, _, value = param.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+def _accepted_encodings(accept_encoding: str | None) -> dict[str, float]:
+    """Codificação → peso q do header; `q=0` (em qualquer grafia) recusa a codificação."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip():
+            accepted[name.strip().lower()] = _quality(params)
+    return accepted
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    available = ("br", "gzip") if brotli is not None else ("gzip",)
+    # maior q vence; no empate, br antes de gzip. Nenhuma aceita: identity
+    best = max(available, key=lambda name: (accepted.get(name, wildcard), name == "br"))
+    return best if accepted.get(best, wildcard) > 0 else None
+
+def compress(body: bytes, encoding: str | None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=5)
+    return body
+
+class PlanResponse(Response):
+    """JSON serializado com orjson e comprimido conforme o Accept-Encoding do cliente."""
+
+    media_type = "application/json"
+
+    def __init__(self, content: Any, accept_encoding: str | None = None, status_code: int = 200):
+        body = encode_json(content)
+        encoding = negotiate_encoding(accept_encoding) if len(body) >= MIN_COMPRESS_SIZE else None
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        super().__init__(content=compress(body, encoding), status_code=status_code, headers=headers)
+
+    def render(self, content: Any) -> bytes:
+        return content
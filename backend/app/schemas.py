@@ -16,6 +16,41 @@ class GenerateGoalPayload(BaseModel):
     goal: GoalPayload
     targetDate: date = Field(alias="targetDate")
     language: SupportedLanguage = "pt"
+    forceFresh: bool = Field(default=False, alias="forceFresh")  # ignora templates e cache de planos
+
+class GoalRecord(BaseModel):
+    """Linha de public.goals como chega no webhook do banco."""
+    id: str
+    user_id: Optional[str] = None
+    title: str
+    description: Optional[str] = None
+    importance_level: int = 3
+    effort_estimated: int = 3
+    target_date: Optional[date] = None
+
+class GoalWebhookEvent(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+    type: str
+    table: str
+    schema_: str = Field(default="public", alias="schema")
+    record: Optional[GoalRecord] = None
+
+    def to_payload(self, language: SupportedLanguage) -> GenerateGoalPayload:
+        if self.record is None or self.record.target_date is None:
+            raise ValueError("Goal has no target date")
+        if self.record.target_date <= date.today():
+            raise ValueError("Target date must be in the future")
+        return GenerateGoalPayload(
+            goalId=self.record.id,
+            goal=GoalPayload(
+                title=self.record.title,
+                description=self.record.description,
+                importance_level=self.record.importance_level,
+                effort_estimated=self.record.effort_estimated,
+            ),
+            targetDate=self.record.target_date,
+            language=language,
+        )
 
 class Milestone(BaseModel):
     title: str
@@ -25,7 +60,7 @@ class Milestone(BaseModel):
 class Task(BaseModel):
     title: str
     description: str
-    priority: str
+    priority: str = Field(json_schema_extra={"enum": ["alta", "media", "baixa"]})
     estimated_duration: int
     due_date: date = Field(alias="due_date")
     prerequisites: Sequence[str] | None = None
@@ -40,3 +75,19 @@ class Task(BaseModel):
 class Plan(BaseModel):
     milestones: list[Milestone] = []
     tasks: list[Task] = []
+
+class PersistedMilestone(Milestone):
+    id: str
+    description: Optional[str] = None
+    status: str = "pending"
+
+class PersistedTask(Task):
+    id: str
+    description: Optional[str] = None
+    estimated_duration: Optional[int] = None
+    due_date: Optional[date] = Field(default=None, alias="due_date")
+    status: str = "pending"
+
+class PersistedPlan(BaseModel):
+    milestones: list[PersistedMilestone] = []
+    tasks: list[PersistedTask] = []
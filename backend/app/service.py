@@ -1,23 +1,209 @@
+import hashlib
+from collections.abc import Callable
 from datetime import date
+from typing import Any
 from anyio import to_thread
-from .prompt_builder import build_prompt
-from .schemas import GenerateGoalPayload, Plan
+from pydantic import ValidationError
+from .prompt_builder import build_prompt, build_continuation_prompt, build_replan_prompt
+from .schemas import GenerateGoalPayload, Plan, PersistedPlan, SupportedLanguage
+from .replan import PlanDiff, diff_plan, progress_summary
 from .gemini_client import GeminiClient
 from .plan_repository import PlanRepository
+from .metrics import generation_metrics
+from .config import get_settings
+from .shared_state import SharedState, get_shared_state
+from .admission import AdmissionController, get_admission_controller
+from .drafts import DraftStore, draft_fingerprint
+from .plan_templates import PlanTemplates
+from .deadline import Deadline
+from .batching import PlanBatcher, get_plan_batcher
+from .agenda import AgendaCache
 
 class GoalBreakdownService:
-    def __init__(self, gemini: GeminiClient, repository: PlanRepository):
+    def __init__(
+        self,
+        gemini: GeminiClient,
+        repository: PlanRepository,
+        state: SharedState | None = None,
+        admission: AdmissionController | None = None,
+        drafts: DraftStore | None = None,
+        templates: PlanTemplates | None = None,
+        agenda_cache: AgendaCache | None = None,
+        deadline: Deadline | None = None,
+        batcher: PlanBatcher | None = None,
+    ):
         self._gemini = gemini
         self._repository = repository
+        self._state = state or get_shared_state()
+        self._admission = admission or get_admission_controller()
+        self._drafts = drafts or DraftStore(self._state)
+        self._templates = templates or PlanTemplates(self._state)
+        self._agenda_cache = agenda_cache or AgendaCache(self._state)
+        self._deadline = deadline
+        self._batcher = batcher or get_plan_batcher()
+        self._settings = get_settings()
+        # uma escrita já enviada pode ter sido gravada: a chave de idempotência não é mais liberada
+        self.write_sent = False
 
-    async def generate(self, payload: GenerateGoalPayload) -> tuple[int, int]:
+    @staticmethod
+    def _days_until_target(payload: GenerateGoalPayload) -> int:
         days_until_target = (payload.targetDate - date.today()).days
         if days_until_target <= 0:
             raise ValueError("Target date must be in the future")
+        return days_until_target
+
+    def _max_wait(self) -> float | None:
+        """Espera (fila, rascunho) que ainda deixa tempo para uma chamada ao Gemini e a gravação."""
+        if self._deadline is None:
+            return None
+        reserve = self._settings.deadline_persist_reserve + self._settings.deadline_min_attempt
+        return max(0.0, self._deadline.remaining() - reserve)
+
+    def _prompt(self, payload: GenerateGoalPayload) -> str:
+        days_until_target = self._days_until_target(payload)
+        return build_prompt(payload.goal, payload.targetDate, days_until_target, payload.language)
+
+    async def _build_plan(self, payload: GenerateGoalPayload) -> Plan:
+        return await self._plan_from_prompt(self._prompt(payload), payload)
+
+    @staticmethod
+    def _cache_key(prompt: str) -> str:
+        # mesmo prompt (meta, prazo e dia de hoje) → mesmo plano, em qualquer worker
+        return "plan:" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    async def _reused_plan(self, prompt: str, payload: GenerateGoalPayload, user_id: str | None = None) -> Plan | None:
+        """
+        Plano do cache ou de um template do mesmo usuário, sem chamar o Gemini; None se precisa gerar.
+        Sem `user_id` (ex.: re-plano, cujo prompt não é o plano completo da meta) não há templates.
+        """
+        if payload.forceFresh:
+            return None
+        if self._settings.plan_cache_ttl > 0:
+            cached = await to_thread.run_sync(self._state.get, self._cache_key(prompt))
+            if cached is not None:
+                generation_metrics.plan_cache_hits += 1
+                return Plan.model_validate(cached)
+        if user_id and self._settings.plan_templates:
+            return await self._templates.match(user_id, payload, self._days_until_target(payload))
+        return None
+
+    async def _plan_from_prompt(self, prompt: str, payload: GenerateGoalPayload, user_id: str | None = None) -> Plan:
+        reused = await self._reused_plan(prompt, payload, user_id)
+        if reused is not None:
+            return reused
+        return await self._fresh_plan(prompt, payload, user_id)
+
+    async def _fresh_plan(self, prompt: str, payload: GenerateGoalPayload, user_id: str | None = None) -> Plan:
+        raw_plan = await self._batcher.generate(  # string JSON
+            self._gemini, payload.goalId, prompt, payload.language,
+            continuation=lambda partial: build_continuation_prompt(prompt, partial, payload.language),
+            max_wait=self._max_wait(),
+        )
+        try:
+            plan = Plan.model_validate_json(raw_plan)
+        except ValidationError as exc:
+            generation_metrics.validation_failures += 1
+            raise RuntimeError("Gemini returned an invalid plan") from exc
+        generation_metrics.plans_validated += 1
+        if self._settings.plan_cache_ttl > 0:
+            await to_thread.run_sync(
+                self._state.set, self._cache_key(prompt), plan.model_dump(mode="json", by_alias=True),
+                self._settings.plan_cache_ttl,
+            )
+        if user_id and self._settings.plan_templates:
+            await self._templates.store(user_id, payload, self._days_until_target(payload), plan)
+        return plan
+
+    async def _owner(self, payload: GenerateGoalPayload) -> str:
+        return await to_thread.run_sync(self._repository.get_goal_owner, payload.goalId)
+
+    async def _write(self, stage: str, write: Callable[..., Any], *args: Any) -> Any:
+        """O prazo só decide se a escrita começa; depois dela o repositório usa um timeout fixo."""
+        if self._deadline is not None:
+            self._deadline.budget(stage)
+        self.write_sent = True
+        return await to_thread.run_sync(write, *args)
+
+    async def _persist(self, payload: GenerateGoalPayload, user_id: str, plan: Plan) -> PersistedPlan:
+        persisted = await self._write(
+            "persisting the plan", self._repository.persist_plan, payload.goalId, user_id, plan
+        )
+        await self._agenda_cache.invalidate(user_id)
+        return persisted
+
+    async def generate(self, payload: GenerateGoalPayload) -> tuple[int, int]:
+        persisted = await self._generate(payload)
+        return len(persisted.milestones), len(persisted.tasks)
+
+    async def _generate(self, payload: GenerateGoalPayload) -> PersistedPlan:
+        prompt = self._prompt(payload)
+        user_id = await self._owner(payload)
+        # rascunho pré-gerado quando a meta foi criada: não ocupa vaga nem chama o Gemini;
+        # pode ter vindo de um template, então forceFresh também o ignora
+        draft = None
+        if not payload.forceFresh:
+            draft = await self._drafts.take(payload.goalId, draft_fingerprint(prompt), self._max_wait())
+        if draft is not None:
+            generation_metrics.draft_hits += 1
+            return await self._persist(payload, user_id, Plan.model_validate(draft))
+
+        # cache e templates também não ocupam vaga: só a chamada ao Gemini passa pela fila
+        plan = await self._reused_plan(prompt, payload, user_id)
+        if plan is None:
+            async with self._admission.slot(payload.goal.importance_level, max_wait=self._max_wait()):
+                plan = await self._fresh_plan(prompt, payload, user_id)
+        return await self._persist(payload, user_id, plan)
+
+    async def preferred_language(self, user_id: str) -> SupportedLanguage:
+        """`profiles.language_preference` do usuário; `SPECULATIVE_LANGUAGE` se não houver."""
+        language = await to_thread.run_sync(self._repository.get_language_preference, user_id)
+        return language if language in ("pt", "en") else self._settings.speculative_language
+
+    async def pregenerate(self, payload: GenerateGoalPayload) -> bool:
+        """Gera o plano em segundo plano e guarda como rascunho; False se já havia um."""
+        prompt = self._prompt(payload)
+        fingerprint = draft_fingerprint(prompt)
+        if not await self._drafts.claim(payload.goalId, fingerprint):
+            return False
+        try:
+            user_id = await self._owner(payload)
+            plan = await self._reused_plan(prompt, payload, user_id)
+            if plan is None:
+                async with self._admission.slot(payload.goal.importance_level, background=True):
+                    plan = await self._fresh_plan(prompt, payload, user_id)
+        except BaseException:
+            await self._drafts.discard(payload.goalId)
+            raise
+        await self._drafts.store(payload.goalId, fingerprint, plan.model_dump(mode="json", by_alias=True))
+        generation_metrics.drafts_generated += 1
+        return True
+
+    async def generate_with_plan(self, payload: GenerateGoalPayload) -> tuple[int, int, PersistedPlan]:
+        # as linhas que a RPC acabou de inserir, com os ids do banco: sem reler a meta inteira
+        persisted = await self._generate(payload)
+        return len(persisted.milestones), len(persisted.tasks), persisted
+
+    async def current_plan(self, goal_id: str) -> PersistedPlan:
+        return await to_thread.run_sync(self._repository.fetch_plan, goal_id)
 
-        prompt = build_prompt(payload.goal, payload.targetDate, days_until_target, payload.language)
-        raw_plan = await self._gemini.generate_plan(prompt)  # string JSON
-        plan = Plan.model_validate_json(raw_plan)
+    async def replan(self, payload: GenerateGoalPayload) -> PlanDiff:
+        """
+        Regera só o que falta: tarefas concluídas/em andamento ficam, o prompt leva um
+        resumo do progresso e apenas as linhas que mudaram são gravadas.
+        """
+        days_until_target = self._days_until_target(payload)
+        existing = await to_thread.run_sync(self._repository.fetch_plan, payload.goalId)
+        user_id = await self._owner(payload)
+        prompt = build_replan_prompt(
+            payload.goal, payload.targetDate, days_until_target, progress_summary(existing), payload.language
+        )
+        # como em _generate: leituras, cache e gravação ficam fora da vaga, que é só do Gemini
+        remaining = await self._reused_plan(prompt, payload)
+        if remaining is None:
+            async with self._admission.slot(payload.goal.importance_level, max_wait=self._max_wait()):
+                remaining = await self._fresh_plan(prompt, payload)
+        diff = diff_plan(existing, remaining)
 
-        user_id = await to_thread.run_sync(self._repository.get_goal_owner, payload.goalId)
-        return await to_thread.run_sync(self._repository.persist_plan, payload.goalId, user_id, plan)
+        await self._write("applying the plan diff", self._repository.apply_plan_diff, payload.goalId, user_id, diff)
+        await self._agenda_cache.invalidate(user_id)
+        return diff
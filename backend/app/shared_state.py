@@ -0,0 +1,177 @@
+import itertools, json, sqlite3, threading, time
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Any, Protocol
+from .config import get_settings
+
+# update recebe o valor atual (ou None) e devolve (novo valor, retorno para o chamador);
+# devolver o próprio valor atual não regrava a chave (o TTL continua o mesmo); devolver None
+# apaga a chave, em vez de deixar um None sem TTL para sempre
+Updater = Callable[[Any], tuple[Any, Any]]
+
+class SharedState(Protocol):
+    def get(self, key: str) -> Any: ...
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None: ...
+    def update(self, key: str, fn: Updater, ttl: float | None = None) -> Any: ...
+    def delete(self, key: str) -> None: ...
+
+class MemoryState:
+    """
+    Estado só deste processo (padrão, um único worker).
+    Chave expirada sai ao ser lida; as que ninguém lê mais saem a cada `purge_every` escritas.
+    """
+
+    def __init__(self, purge_every: int = 0):
+        self._data: dict[str, tuple[Any, float | None]] = {}
+        self._lock = threading.Lock()
+        self._purge_every = purge_every
+        self._writes = 0
+
+    def _current(self, key: str) -> Any:
+        value, expires_at = self._data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def _store(self, key: str, value: Any, ttl: float | None) -> None:
+        self._data[key] = (value, time.time() + ttl if ttl else None)
+        self._writes += 1
+        if self._purge_every and self._writes % self._purge_every == 0:
+            self._purge()
+
+    def _purge(self) -> int:
+        now = time.time()
+        expired = [k for k, (_, expires_at) in self._data.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            return self._current(key)
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def update(self, key: str, fn: Updater, ttl: float | None = None) -> Any:
+        with self._lock:
+            current = self._current(key)
+            value, result = fn(current)
+            if value is None:
+                self._data.pop(key, None)
+            elif value is not current:
+                self._store(key, value, ttl)
+            return result
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge()
+
+class SqliteState:
+    """
+    Estado compartilhado pelos workers do mesmo host num arquivo SQLite (WAL).
+    `update` roda dentro de BEGIN IMMEDIATE, então o read-modify-write é atômico entre processos.
+    Cada processo apaga as linhas expiradas a cada `purge_every` escritas suas.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0, purge_every: int = 0):
+        self._path = path
+        self._busy_timeout = busy_timeout
+        self._purge_every = purge_every
+        self._writes = itertools.count(1)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shared_state ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=self._busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _decode(row: tuple[str, float | None] | None) -> Any:
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0])
+
+    def get(self, key: str) -> Any:
+        row = self._conn().execute("SELECT value, expires_at FROM shared_state WHERE key = ?", (key,)).fetchone()
+        return self._decode(row)
+
+    def _wrote(self) -> None:
+        if self._purge_every and next(self._writes) % self._purge_every == 0:
+            self.purge_expired()
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO shared_state VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl if ttl else None),
+        )
+        self._wrote()
+
+    def update(self, key: str, fn: Updater, ttl: float | None = None) -> Any:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value, expires_at FROM shared_state WHERE key = ?", (key,)).fetchone()
+            current = self._decode(row)
+            value, result = fn(current)
+            wrote = value is not current and value is not None
+            if value is None:
+                conn.execute("DELETE FROM shared_state WHERE key = ?", (key,))
+            elif wrote:
+                conn.execute(
+                    "INSERT OR REPLACE INTO shared_state VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time() + ttl if ttl else None),
+                )
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        if wrote:
+            self._wrote()
+        return result
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM shared_state WHERE key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        return self._conn().execute("DELETE FROM shared_state WHERE expires_at <= ?", (time.time(),)).rowcount
+
+def take_token(state: SharedState, bucket: str, per_minute: int, burst: int | None = None) -> float:
+    """
+    Token bucket compartilhado: consome um token e devolve 0,
+    ou devolve quantos segundos esperar até haver um (sem consumir).
+    """
+    capacity = burst or per_minute
+
+    def _take(current: dict | None) -> tuple[dict, float]:
+        now = time.time()
+        tokens, updated = (current["tokens"], current["updated"]) if current else (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * per_minute / 60)
+        if tokens >= 1:
+            return {"tokens": tokens - 1, "updated": now}, 0.0
+        return {"tokens": tokens, "updated": now}, (1 - tokens) * 60 / per_minute
+
+    return state.update(f"bucket:{bucket}", _take)
+
+@lru_cache
+def get_shared_state() -> SharedState:
+    settings = get_settings()
+    if settings.shared_state_backend == "sqlite":
+        return SqliteState(settings.shared_state_path, purge_every=settings.shared_state_purge_every)
+    return MemoryState(settings.shared_state_purge_every)
@@ -0,0 +1,58 @@
+"""
+Benchmark do payload de /goals/{goal_id}/plan?include_plan=true
+
+Mede tamanho e tempo de encode (json x orjson) e de compressão (gzip/br)
+para planos sintéticos de 50 a 5000 tarefas.
+
+    cd backend
+    python -m benchmarks.bench_plan_response
+"""
+
+import json, time, uuid
+from datetime import date, timedelta
+from app import responses
+
+SIZES = (50, 500, 1000, 5000)
+ROUNDS = 20
+
+def synthetic_plan(n_tasks: int) -> dict:
+    start = date.today()
+    milestones = [
+        {"id": str(uuid.uuid4()), "title": f"Marco {i} ({i * 25}%)", "description": "Revisar o progresso do período",
+         "order_sequence": i, "status": "pending"}
+        for i in range(1, 5)
+    ]
+    tasks = [
+        {"id": str(uuid.uuid4()), "title": f"Tarefa {i}", "description": "Estudar o conteúdo do dia e praticar exercícios",
+         "priority": ("alta", "media", "baixa")[i % 3], "estimated_duration": 30 + i % 90,
+         "due_date": start + timedelta(days=i % 365), "prerequisites": [f"Tarefa {i - 1}"] if i > 1 else None,
+         "order_sequence": i, "status": "pending"}
+        for i in range(1, n_tasks + 1)
+    ]
+    return {"success": True, "milestonesCount": len(milestones), "tasksCount": len(tasks),
+            "plan": {"milestones": milestones, "tasks": tasks}}
+
+def timed(fn, *args) -> tuple[float, object]:
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = fn(*args)
+    return (time.perf_counter() - started) / ROUNDS * 1000, result
+
+def stdlib_json(content: dict) -> bytes:
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+def main():
+    encodings = ["gzip"] + (["br"] if responses.brotli is not None else [])
+    print(f"{'tarefas':>8} {'json ms':>9} {'fast ms':>9} {'bytes':>9} " + " ".join(f"{e + ' bytes':>10} {e + ' ms':>8}" for e in encodings))
+    for size in SIZES:
+        plan = synthetic_plan(size)
+        json_ms, _ = timed(stdlib_json, plan)
+        fast_ms, body = timed(responses.encode_json, plan)
+        row = f"{size:>8} {json_ms:>9.2f} {fast_ms:>9.2f} {len(body):>9}"
+        for encoding in encodings:
+            ms, compressed = timed(responses.compress, body, encoding)
+            row += f" {len(compressed):>10} {ms:>8.2f}"
+        print(row)
+
+if __name__ == "__main__":
+    main()
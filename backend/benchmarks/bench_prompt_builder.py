@@ -0,0 +1,40 @@
+"""
+Benchmark de app.prompt_builder
+
+Mede prompts montados por segundo e o tamanho estimado (tokens) para descrições
+de 0 a 20KB, mostrando o corte feito pelo orçamento de entrada.
+
+    cd backend
+    python -m benchmarks.bench_prompt_builder
+"""
+
+import os, time
+from datetime import date, timedelta
+
+for name, value in {"SUPABASE_URL": "http://localhost", "SUPABASE_SERVICE_KEY": "-", "GEMINI_API_KEY": "-"}.items():
+    os.environ.setdefault(name, value)
+
+from app.prompt_builder import build_prompt, estimate_tokens
+from app.schemas import GoalPayload
+
+DESCRIPTION_SIZES = (0, 500, 2_000, 20_000)  # caracteres
+ROUNDS = 5_000
+
+def goal(size: int) -> GoalPayload:
+    words = ("estudar praticar revisar projeto prazo entrega semana " * (size // 50 + 1))[:size]
+    return GoalPayload(title="Aprender Python", description=words or None, importance_level=4, effort_estimated=3)
+
+def main():
+    target = date.today() + timedelta(days=90)
+    print(f"{'descrição':>10} {'idioma':>6} {'tokens':>7} {'prompts/s':>10}")
+    for size in DESCRIPTION_SIZES:
+        payload = goal(size)
+        for language in ("pt", "en"):
+            started = time.perf_counter()
+            for _ in range(ROUNDS):
+                prompt = build_prompt(payload, target, 90, language)
+            rate = ROUNDS / (time.perf_counter() - started)
+            print(f"{size:>10} {language:>6} {estimate_tokens(prompt):>7} {rate:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Servidores falsos do Gemini e do PostgREST (Supabase) para testes de carga
+
+Cada um responde só às rotas que o backend usa, com latência sorteada de uma
+distribuição log-normal (mediana + sigma), taxas de erro 5xx e 429 e planos
+de tamanho configurável.
+"""
+
+import asyncio, json, random, threading, time, uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+@dataclass
+class UpstreamProfile:
+    latency_median_ms: float = 50.0
+    latency_sigma: float = 0.5  # 0 = latência fixa
+    error_rate: float = 0.0  # fração de respostas 500
+    rate_429: float = 0.0  # fração de respostas 429
+    tasks: int = 30  # tarefas por plano (Gemini)
+
+    def latency(self, rng: random.Random) -> float:
+        if self.latency_sigma <= 0:
+            return self.latency_median_ms / 1000
+        return rng.lognormvariate(0, self.latency_sigma) * self.latency_median_ms / 1000
+
+    def failure(self, rng: random.Random) -> JSONResponse | None:
+        roll = rng.random()
+        if roll < self.rate_429:
+            return JSONResponse({"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}, status_code=429)
+        if roll < self.rate_429 + self.error_rate:
+            return JSONResponse({"error": {"code": 500, "status": "INTERNAL"}}, status_code=500)
+        return None
+
+def synthetic_plan(n_tasks: int) -> dict:
+    start = date.today() + timedelta(days=1)
+    return {
+        "milestones": [
+            {"title": f"Marco {i} ({i * 25}%)", "description": "Revisar o progresso", "order_sequence": i}
+            for i in range(1, 5)
+        ],
+        "tasks": [
+            {"title": f"Tarefa {i}", "description": "Estudar o conteúdo do dia e praticar",
+             "priority": ("alta", "media", "baixa")[i % 3], "estimated_duration": 30 + i % 60,
+             "due_date": (start + timedelta(days=i % 60)).isoformat(), "prerequisites": None, "order_sequence": i}
+            for i in range(1, n_tasks + 1)
+        ],
+    }
+
+class _Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values: dict[str, int] = {}
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + 1
+
+def fake_gemini(profile: UpstreamProfile, seed: int = 1) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    body = json.dumps(synthetic_plan(profile.tasks))
+    app.state.counters = counters = _Counters()
+
+    @app.get("/v1beta/models")
+    async def models():
+        counters.add("models")
+        return {"models": [
+            {"name": f"models/{name}", "supportedGenerationMethods": ["generateContent"]}
+            for name in ("gemini-1.5-flash", "gemini-1.5-pro")
+        ]}
+
+    @app.post("/v1beta/models/{model_action}")
+    async def generate(model_action: str, request: Request):
+        schema = (await request.json())["generationConfig"].get("responseSchema", {})
+        # lote: o responseSchema traz uma propriedade por id de meta
+        keys = [key for key in schema.get("properties", {}) if key not in ("milestones", "tasks")]
+        counters.add("generate_batch" if keys else "generate")
+        await asyncio.sleep(profile.latency(rng))
+        if (failure := profile.failure(rng)) is not None:
+            counters.add(f"generate_{failure.status_code}")
+            return failure
+        text = "{" + ",".join(f"{json.dumps(key)}:{body}" for key in keys) + "}" if keys else body
+        return {"candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}]}
+
+    return app
+
+def fake_postgrest(profile: UpstreamProfile, seed: int = 2) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    app.state.counters = counters = _Counters()
+    app.state.queries = queries = []  # query strings dos selects, para os testes
+    app.state.rows = rows = {"milestones": [], "tasks": []}  # linhas gravadas pelo RPC
+
+    async def delay(name: str) -> JSONResponse | None:
+        counters.add(name)
+        await asyncio.sleep(profile.latency(rng))
+        return profile.failure(rng)
+
+    @app.get("/rest/v1/goals")
+    async def goal_owner():
+        # .single() pede um objeto (Accept: application/vnd.pgrst.object+json)
+        return await delay("goals") or {"user_id": str(uuid.uuid5(uuid.NAMESPACE_URL, "loadtest"))}
+
+    @app.post("/rest/v1/rpc/persist_generated_plan")
+    async def persist(request: Request):
+        payload = await request.json()
+        if (failure := await delay("persist")) is not None:
+            return failure
+        inserted = {
+            table: [{**row, "id": str(uuid.uuid4()), "goal_id": payload["goal_id"], "status": "pending"}
+                    for row in payload[table]]
+            for table in ("milestones", "tasks")
+        }
+        for table, new_rows in inserted.items():
+            rows[table].extend(new_rows)
+        return {
+            "milestones_inserted": len(inserted["milestones"]), "tasks_inserted": len(inserted["tasks"]),
+            **inserted,
+        }
+
+    @app.post("/rest/v1/rpc/apply_plan_diff")
+    async def apply_diff(request: Request):
+        payload = await request.json()
+        if (failure := await delay("apply_diff")) is not None:
+            return failure
+        counts = {}
+        for table, prefix in (("milestones", "milestone"), ("tasks", "task")):
+            # como a função no banco: linhas concluídas/em andamento não mudam
+            open_rows = {
+                row["id"]: row for row in rows[table]
+                if row["goal_id"] == payload["goal_id"] and row["status"] not in ("completed", "in_progress", "skipped")
+            }
+            deleted = set(payload[f"{prefix}_deletes"]) & open_rows.keys()
+            rows[table][:] = [row for row in rows[table] if row["id"] not in deleted]
+            updated = [u for u in payload[f"{prefix}_updates"] if u["id"] in open_rows and u["id"] not in deleted]
+            for update in updated:
+                open_rows[update["id"]].update({k: v for k, v in update.items() if k not in ("status", "goal_id")})
+            rows[table].extend(
+                {**row, "id": str(uuid.uuid4()), "goal_id": payload["goal_id"], "status": "pending"}
+                for row in payload[f"{prefix}_inserts"]
+            )
+            counts |= {f"{table}_deleted": len(deleted), f"{table}_updated": len(updated),
+                       f"{table}_inserted": len(payload[f"{prefix}_inserts"])}
+        return counts
+
+    @app.get("/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        queries.append(f"{table}?{request.url.query}")
+        if (failure := await delay(f"select_{table}")) is not None:
+            return failure
+        goal = request.query_params.get("goal_id", "").removeprefix("eq.")
+        return [row for row in rows.get(table, []) if row["goal_id"] == goal]
+
+    return app
+
+class BackgroundServer:
+    """Roda um app ASGI com uvicorn numa thread; use como context manager."""
+
+    def __init__(self, app, port: int, host: str = "127.0.0.1"):
+        self.app = app
+        self.url = f"http://{host}:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "BackgroundServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
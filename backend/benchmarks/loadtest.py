@@ -0,0 +1,200 @@
+"""
+Teste de carga ponta a ponta do backend
+
+Sobe Gemini e PostgREST falsos (benchmarks/fake_upstreams.py), inicia o app com
+uvicorn apontando para eles e envia GenerateGoalPayloads sintéticos em níveis
+crescentes de concorrência. Mostra vazão e percentis de latência por nível e
+grava um JSON que pode ser comparado com o de outro commit.
+
+    cd backend
+    python -m benchmarks.loadtest --concurrency 1 4 16 64 --duration 10
+    python -m benchmarks.loadtest --gemini-latency-ms 800 --gemini-429-rate 0.05 --output atual.json
+    python -m benchmarks.loadtest --compare anterior.json
+"""
+
+import argparse, asyncio, json, os, random, socket, subprocess, sys, time
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+import httpx
+from benchmarks.fake_upstreams import BackgroundServer, UpstreamProfile, fake_gemini, fake_postgrest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TITLES = ("Aprender Python", "Correr 10km", "Ler 12 livros", "Tirar certificação", "Aprender inglês", "Montar um app")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+def synthetic_payloads(seed: int):
+    rng = random.Random(seed)
+    for i in range(sys.maxsize):
+        yield {
+            "goalId": f"00000000-0000-4000-8000-{i:012d}",
+            "goal": {
+                "title": f"{rng.choice(TITLES)} #{i}",
+                "description": "Meta sintética do teste de carga. " * rng.randint(0, 20) or None,
+                "importance_level": rng.randint(1, 5),
+                "effort_estimated": rng.randint(1, 5),
+            },
+            "targetDate": (date.today() + timedelta(days=rng.randint(14, 180))).isoformat(),
+            "language": rng.choice(("pt", "en")),
+        }
+
+def start_app(port: int, gemini_url: str, postgrest_url: str, workers: int, extra_env: dict[str, str]) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "SUPABASE_URL": postgrest_url,
+        "SUPABASE_SERVICE_KEY": "loadtest-service-key",
+        "GEMINI_API_KEY": "loadtest",
+        "GEMINI_BASE_URL": f"{gemini_url}/v1beta",
+        "PLAN_CACHE_TTL": "0",
+        **extra_env,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+async def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{url}/metrics/generation")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("app did not start")
+
+async def run_stage(url: str, concurrency: int, duration: float, payloads, include_plan: bool) -> dict:
+    latencies: list[float] = []
+    statuses: Counter[str] = Counter()
+    deadline = time.monotonic() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        async def user():
+            while time.monotonic() < deadline:
+                body = next(payloads)
+                started = time.perf_counter()
+                try:
+                    resp = await client.post(
+                        f"/goals/{body['goalId']}/plan", json=body, params={"include_plan": include_plan}
+                    )
+                    statuses[str(resp.status_code)] += 1
+                except httpx.HTTPError as exc:
+                    statuses[type(exc).__name__] += 1
+                    continue
+                if resp.status_code == 200:
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.monotonic()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": sum(statuses.values()),
+        "ok": len(latencies),
+        "statuses": dict(statuses),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p90_ms": round(percentile(latencies, 90), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies, default=0.0), 1),
+    }
+
+def print_report(stages: list[dict], baseline: dict | None = None) -> None:
+    previous = {s["concurrency"]: s for s in (baseline or {}).get("stages", [])}
+    print(f"{'conc':>5} {'reqs':>6} {'ok':>6} {'rps':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}  status")
+    for stage in stages:
+        print(f"{stage['concurrency']:>5} {stage['requests']:>6} {stage['ok']:>6} {stage['throughput_rps']:>8.1f}"
+              f" {stage['p50_ms']:>8.1f} {stage['p90_ms']:>8.1f} {stage['p99_ms']:>8.1f} {stage['max_ms']:>8.1f}"
+              f"  {' '.join(f'{k}:{v}' for k, v in sorted(stage['statuses'].items()))}")
+        if (old := previous.get(stage["concurrency"])) is not None:
+            delta = lambda key: f"{(stage[key] - old[key]) / old[key] * 100:+.0f}%" if old[key] else "-"
+            print(f"{'':>5} vs {baseline.get('commit', '?')}: rps {delta('throughput_rps')}"
+                  f"  p50 {delta('p50_ms')}  p99 {delta('p99_ms')}")
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga com Gemini e PostgREST falsos")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos por nível de concorrência")
+    parser.add_argument("--workers", type=int, default=1, help="workers do uvicorn")
+    parser.add_argument("--include-plan", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800.0)
+    parser.add_argument("--gemini-sigma", type=float, default=0.4)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--gemini-429-rate", type=float, default=0.0)
+    parser.add_argument("--plan-tasks", type=int, default=30, help="tarefas por plano gerado")
+    parser.add_argument("--db-latency-ms", type=float, default=15.0)
+    parser.add_argument("--db-sigma", type=float, default=0.3)
+    parser.add_argument("--db-error-rate", type=float, default=0.0)
+    parser.add_argument("--env", nargs="*", default=[], metavar="NOME=VALOR",
+                        help="variáveis extras para o app (ex.: MAX_IN_FLIGHT_GENERATIONS=32)")
+    parser.add_argument("--output", help="grava o resultado em JSON")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    return parser.parse_args(argv)
+
+async def run(args) -> dict:
+    gemini = UpstreamProfile(args.gemini_latency_ms, args.gemini_sigma, args.gemini_error_rate,
+                             args.gemini_429_rate, args.plan_tasks)
+    postgrest = UpstreamProfile(args.db_latency_ms, args.db_sigma, args.db_error_rate)
+    extra_env = dict(item.split("=", 1) for item in args.env)
+
+    with BackgroundServer(fake_gemini(gemini, args.seed), free_port()) as gemini_server, \
+         BackgroundServer(fake_postgrest(postgrest, args.seed + 1), free_port()) as postgrest_server:
+        port = free_port()
+        app = start_app(port, gemini_server.url, postgrest_server.url, args.workers, extra_env)
+        try:
+            url = f"http://127.0.0.1:{port}"
+            await wait_ready(url)
+            payloads = synthetic_payloads(args.seed)
+            stages = []
+            for concurrency in args.concurrency:
+                stages.append(await run_stage(url, concurrency, args.duration, payloads, args.include_plan))
+                print(f"nível {concurrency} concluído", file=sys.stderr)
+            async with httpx.AsyncClient() as client:
+                app_metrics = (await client.get(f"{url}/metrics/generation")).json()
+        finally:
+            app.terminate()
+            app.wait(timeout=10)
+        upstream_calls = {"gemini": gemini_server.app.state.counters.values,
+                          "postgrest": postgrest_server.app.state.counters.values}
+
+    return {
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k not in {"output", "compare"}},
+        "stages": stages,
+        "app_metrics": app_metrics,
+        "upstream_calls": upstream_calls,
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(run(args))
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(result["stages"], baseline)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
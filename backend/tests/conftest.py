@@ -0,0 +1,38 @@
+import pytest
+from app.config import get_settings
+from app.metrics import GenerationMetrics, PromptMetrics, generation_metrics, prompt_metrics
+from app.shared_state import get_shared_state
+from app.admission import get_admission_controller
+from app.batching import get_plan_batcher
+from benchmarks.fake_upstreams import BackgroundServer, UpstreamProfile, fake_postgrest
+from benchmarks.loadtest import free_port
+
+@pytest.fixture(autouse=True)
+def settings_env(monkeypatch):
+    monkeypatch.setenv("SUPABASE_URL", "http://supabase.test")
+    monkeypatch.setenv("SUPABASE_SERVICE_KEY", "service-key")
+    monkeypatch.setenv("GEMINI_API_KEY", "gemini-key")
+    monkeypatch.setenv("GEMINI_BASE_URL", "http://gemini.test/v1beta")
+    get_settings.cache_clear()
+    get_shared_state.cache_clear()
+    get_admission_controller.cache_clear()
+    get_plan_batcher.cache_clear()
+    yield
+    get_settings.cache_clear()
+    get_shared_state.cache_clear()
+    get_admission_controller.cache_clear()
+    get_plan_batcher.cache_clear()
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    for metrics, fresh in ((generation_metrics, GenerationMetrics()), (prompt_metrics, PromptMetrics())):
+        for name, value in vars(fresh).items():
+            setattr(metrics, name, value)
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    """PostgREST falso (sem latência) num servidor local, com SUPABASE_URL apontando para ele."""
+    with BackgroundServer(fake_postgrest(UpstreamProfile(latency_median_ms=0, latency_sigma=0)), free_port()) as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        get_settings.cache_clear()
+        yield server
@@ -0,0 +1,147 @@
+import asyncio, time
+import httpx
+import pytest
+from app.admission import AdmissionController, Overloaded
+from app.deadline import DeadlineExceeded
+from app.gemini_client import GeminiClient
+from app.main import app, get_service
+from app.metrics import generation_metrics
+from app.service import GoalBreakdownService
+from app.shared_state import MemoryState
+from tests.test_drafts import FakeRepository, SlowGemini, payload
+
+async def _job(controller, importance=3, duration=0.05, order=None):
+    async with controller.slot(importance):
+        if order is not None:
+            order.append(importance)
+        await asyncio.sleep(duration)
+
+def test_in_flight_never_exceeds_limit():
+    controller = AdmissionController(max_in_flight=2, max_queue=10, max_wait=5)
+    peak = 0
+
+    async def job():
+        nonlocal peak
+        async with controller.slot():
+            peak = max(peak, controller.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def go():
+        await asyncio.gather(*(job() for _ in range(10)))
+
+    asyncio.run(go())
+    assert peak == 2
+    assert controller.in_flight == 0 and controller.waiting == 0
+
+def test_full_queue_fails_fast_with_retry_after():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, max_wait=5)
+
+    async def go():
+        running = asyncio.create_task(_job(controller, duration=0.2))
+        queued = asyncio.create_task(_job(controller))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded) as exc:
+            await _job(controller)
+        await asyncio.gather(running, queued)
+        return exc.value
+
+    error = asyncio.run(go())
+    assert error.retry_after >= 1
+    assert generation_metrics.shed_requests == 1
+
+def test_queue_orders_by_importance():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_wait=5, ordering="importance")
+    order = []
+
+    async def go():
+        first = asyncio.create_task(_job(controller, importance=1, duration=0.05, order=order))
+        await asyncio.sleep(0.01)
+        waiting = [asyncio.create_task(_job(controller, importance=i, duration=0, order=order)) for i in (2, 5, 3)]
+        await asyncio.gather(first, *waiting)
+
+    asyncio.run(go())
+    assert order == [1, 5, 3, 2]
+
+def test_admitted_latency_stays_bounded_under_overload():
+    controller = AdmissionController(max_in_flight=4, max_queue=4, max_wait=0.1)
+    latencies, shed = [], 0
+
+    async def request():
+        nonlocal shed
+        started = time.monotonic()
+        try:
+            await _job(controller, duration=0.05)
+        except Overloaded:
+            shed += 1
+            return
+        latencies.append(time.monotonic() - started)
+
+    async def go():
+        await asyncio.gather(*(request() for _ in range(200)))
+
+    asyncio.run(go())
+    assert shed > 0
+    # cada admitido espera no máximo max_wait na fila antes de rodar
+    assert max(latencies) < 0.1 + 0.05 + 0.05
+
+def test_wait_cut_short_by_deadline_is_a_timeout_not_overload():
+    controller = AdmissionController(max_in_flight=1, max_queue=10, max_wait=5)
+
+    async def go():
+        running = asyncio.create_task(_job(controller, duration=0.2))
+        await asyncio.sleep(0.01)
+        with pytest.raises(DeadlineExceeded):
+            async with controller.slot(max_wait=0):
+                pass
+        with pytest.raises(DeadlineExceeded):
+            async with controller.slot(max_wait=0.05):
+                pass
+        await running
+        # com vaga livre, nem um prazo no limite espera: entra direto
+        async with controller.slot(max_wait=0):
+            pass
+
+    asyncio.run(go())
+    assert generation_metrics.shed_requests == 0
+    assert controller.in_flight == 0 and controller.waiting == 0
+
+def test_cached_plan_is_served_without_a_slot():
+    controller = AdmissionController(max_in_flight=1, max_queue=0, max_wait=5)
+    gemini, repository, state = SlowGemini(), FakeRepository(), MemoryState()
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(gemini)) as http:
+            service = GoalBreakdownService(GeminiClient(http, state), repository, state=state, admission=controller)
+            first = await service.generate(payload())
+            async with controller.slot():  # worker lotado e fila zerada
+                return first, await service.generate(payload())
+
+    first, second = asyncio.run(go())
+    assert first == second
+    assert gemini.calls == 1
+    assert generation_metrics.plan_cache_hits == 1 and generation_metrics.shed_requests == 0
+
+class SlowService:
+    async def generate(self, payload):
+        await asyncio.sleep(0)
+        raise Overloaded(retry_after=7)
+
+def test_overload_maps_to_503_with_retry_after():
+    app.dependency_overrides[get_service] = lambda: SlowService()
+    body = {
+        "goalId": "g1",
+        "goal": {"title": "Aprender", "importance_level": 3, "effort_estimated": 2},
+        "targetDate": "2099-12-31",
+    }
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/goals/g1/plan", json=body)
+
+    try:
+        resp = asyncio.run(go())
+    finally:
+        app.dependency_overrides.clear()
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "7"
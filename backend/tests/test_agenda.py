@@ -0,0 +1,119 @@
+import asyncio, time, uuid
+from urllib.parse import parse_qs
+from datetime import date, timedelta
+import httpx
+import jwt
+import pytest
+from app.agenda import Agenda, AgendaCache, decode_cursor, encode_cursor, get_agenda, window_bounds
+from app.config import get_settings
+from app.main import app
+from app.plan_repository import PlanRepository
+from app.shared_state import MemoryState
+from tests.test_drafts import SlowGemini, payload, run_with_service
+
+TODAY = date.today()
+SECRET = "agenda-test-secret-with-32-bytes!"
+
+class FakeAgendaRepository:
+    def __init__(self, tasks):
+        self.tasks = sorted(tasks, key=lambda t: (t["due_date"], t["id"]))
+        self.calls = 0
+
+    def fetch_agenda(self, user_id, start, end, after, limit):
+        self.calls += 1
+        rows = [
+            t for t in self.tasks
+            if t["user_id"] == user_id and start.isoformat() <= t["due_date"] <= end.isoformat()
+            and (after is None or (t["due_date"], t["id"]) > after)
+        ]
+        return rows[:limit]
+
+def task(days, user_id="u1"):
+    return {"id": str(uuid.uuid4()), "user_id": user_id, "title": "Tarefa",
+            "due_date": (TODAY + timedelta(days=days)).isoformat()}
+
+def token(sub="u1", **claims):
+    return jwt.encode({"sub": sub, "aud": "authenticated", "exp": int(time.time()) + 60, **claims}, SECRET)
+
+@pytest.fixture(autouse=True)
+def jwt_secret(monkeypatch, settings_env):
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", SECRET)
+    get_settings.cache_clear()
+
+def request(repository, *queries, headers=None):
+    agenda = Agenda(repository, AgendaCache(MemoryState()))
+    app.dependency_overrides[get_agenda] = lambda: agenda
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                await client.get("/agenda", params=params, headers=headers or {"Authorization": f"Bearer {token()}"})
+                for params in queries
+            ]
+
+    try:
+        return asyncio.run(go())
+    finally:
+        app.dependency_overrides.clear()
+
+def test_window_bounds():
+    assert window_bounds("day", date(2026, 10, 19)) == (date(2026, 10, 19), date(2026, 10, 19))
+    assert window_bounds("week", date(2026, 10, 21)) == (date(2026, 10, 19), date(2026, 10, 25))
+    assert window_bounds("month", date(2028, 2, 10)) == (date(2028, 2, 1), date(2028, 2, 29))
+
+def test_cursor_round_trip_and_rejects_tampering():
+    row = task(0)
+    assert decode_cursor(encode_cursor(row)) == (row["due_date"], row["id"])
+    for bad in ("nope", encode_cursor({"due_date": "2026-01-01", "id": "x),id.gt.0"})):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+def test_pages_through_window_in_due_date_order():
+    tasks = [task(d) for d in range(-3, 40)] + [task(0, user_id="u2")]
+    repository = FakeAgendaRepository(tasks)
+    month = [t for t in repository.tasks if t["user_id"] == "u1" and t["due_date"][:7] == TODAY.isoformat()[:7]]
+
+    seen, cursor = [], None
+    while True:
+        (resp,) = request(repository, {"window": "month", "limit": 4, **({"cursor": cursor} if cursor else {})})
+        assert resp.status_code == 200
+        seen += resp.json()["tasks"]
+        if (cursor := resp.json()["nextCursor"]) is None:
+            break
+    assert [t["id"] for t in seen] == [t["id"] for t in month]
+
+def test_hot_windows_are_cached_per_user():
+    repository = FakeAgendaRepository([task(0), task(1), task(120)])
+    far = (TODAY + timedelta(days=120)).isoformat()
+    responses = request(repository, {"window": "week"}, {"window": "week"}, {"date": far}, {"date": far})
+    assert [len(r.json()["tasks"]) for r in responses][-1] == 1
+    # a semana atual vem do cache na segunda vez; a janela distante sempre consulta
+    assert repository.calls == 3
+
+def test_rejects_missing_or_invalid_token_and_bad_cursor():
+    repository = FakeAgendaRepository([])
+    (missing,) = request(repository, {}, headers={"Authorization": "Basic abc"})
+    (forged,) = request(repository, {}, headers={"Authorization": f"Bearer {jwt.encode({'sub': 'u1'}, 'another-secret-with-at-least-32-bytes')}"})
+    (bad_cursor,) = request(repository, {"cursor": "nope"})
+    assert (missing.status_code, forged.status_code, bad_cursor.status_code) == (401, 401, 400)
+
+def test_persisting_a_plan_invalidates_the_owner_agenda():
+    async def scenario(service):
+        cache = service._agenda_cache
+        await cache.put("u1", "page", {"tasks": []})
+        await service.generate(payload())
+        return await cache.get("u1", "page")
+
+    cached, _ = run_with_service(SlowGemini(), scenario)
+    assert cached is None
+
+def test_agenda_query_uses_keyset_filter(postgrest):
+    after = (TODAY.isoformat(), str(uuid.uuid4()))
+    PlanRepository().fetch_agenda("u1", TODAY, TODAY + timedelta(days=6), after, 51)
+    (query,) = postgrest.app.state.queries
+    table, params = query.split("?")
+    params = parse_qs(params)
+    assert table == "tasks" and params["user_id"] == ["eq.u1"] and "offset" not in params
+    assert params["or"] == [f"(due_date.gt.{after[0]},and(due_date.eq.{after[0]},id.gt.{after[1]}))"]
+    assert params["order"] == ["due_date.asc,id.asc"] and params["limit"] == ["51"]
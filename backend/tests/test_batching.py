@@ -0,0 +1,133 @@
+import asyncio, json, time
+from datetime import date, timedelta
+import httpx
+import pytest
+from app.batching import PlanBatcher, get_plan_batcher
+from app.config import get_settings
+from app.gemini_client import GeminiClient
+from app.metrics import generation_metrics
+from app.schemas import GenerateGoalPayload
+from app.service import GoalBreakdownService
+from app.shared_state import MemoryState
+from tests.test_drafts import FakeRepository
+from tests.test_gemini_client import PLAN
+
+def payload(goal_id, title=None):
+    return GenerateGoalPayload(
+        goalId=goal_id,
+        goal={"title": title or f"Meta {goal_id}", "importance_level": 3, "effort_estimated": 2},
+        targetDate=date.today() + timedelta(days=30),
+    )
+
+class BatchGemini:
+    """Responde lotes pelo responseSchema; `bad` recebe um plano inválido, `fail` derruba os lotes."""
+
+    def __init__(self, bad=(), missing=(), fail=False):
+        self.bad, self.missing, self.fail = set(bad), set(missing), fail
+        self.batch_calls, self.single_calls, self.output_tokens = [], 0, []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, json={"models": []})
+        body = json.loads(request.content)
+        keys = list(body["generationConfig"]["responseSchema"]["properties"])
+        if "tasks" in keys:
+            self.single_calls += 1
+            text = json.dumps(PLAN)
+        else:
+            self.batch_calls.append((keys, body["contents"][0]["parts"][0]["text"]))
+            self.output_tokens.append(body["generationConfig"]["maxOutputTokens"])
+            if self.fail:
+                return httpx.Response(500, json={"error": {"message": "upstream"}})
+            plans = {k: ({"tasks": "nope"} if k in self.bad else PLAN) for k in keys if k not in self.missing}
+            text = json.dumps(plans)
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": text}]}, "finishReason": "STOP"}]})
+
+@pytest.fixture(autouse=True)
+def batch_env(monkeypatch, settings_env):
+    monkeypatch.setenv("PLAN_CACHE_TTL", "0")
+    monkeypatch.setenv("PLAN_TEMPLATES", "false")
+    get_settings.cache_clear()
+
+def run(gemini, payloads, max_size=4, window=0.2):
+    batcher, repository = PlanBatcher(max_size, window), FakeRepository()
+
+    async def one(http, body):
+        state = MemoryState()
+        service = GoalBreakdownService(GeminiClient(http, state), repository, state=state, batcher=batcher)
+        return await service.generate(body)
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(gemini)) as http:
+            return await asyncio.gather(*(one(http, body) for body in payloads), return_exceptions=True)
+
+    return asyncio.run(go())
+
+def test_concurrent_goals_share_one_gemini_call():
+    gemini = BatchGemini()
+    results = run(gemini, [payload(f"g{i}") for i in range(4)])
+
+    assert results == [(1, 2)] * 4
+    (keys, prompt), = gemini.batch_calls
+    assert sorted(keys) == ["g0", "g1", "g2", "g3"] and gemini.single_calls == 0
+    assert all(f"### g{i}\n" in prompt and f"Meta g{i}" in prompt for i in range(4))
+    stats = generation_metrics.snapshot()
+    assert stats["batches"] == 1 and stats["plans_per_batch"] == 4.0 and stats["attempts_per_plan"] == 0.25
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    gemini = BatchGemini()
+    started = time.monotonic()
+    run(gemini, [payload(f"g{i}") for i in range(2)], max_size=2, window=5)
+    assert time.monotonic() - started < 1
+    assert len(gemini.batch_calls) == 1
+
+def test_bad_or_missing_goal_does_not_fail_the_others():
+    gemini = BatchGemini(bad={"g1"}, missing={"g2"})
+    results = run(gemini, [payload(f"g{i}") for i in range(3)])
+
+    assert results == [(1, 2)] * 3
+    assert gemini.single_calls == 2  # g1, com plano inválido, e g2, ausente do lote, foram geradas sozinhas
+    assert generation_metrics.validation_failures == 1 and generation_metrics.batch_fallbacks == 2
+
+def test_failed_batch_falls_back_to_individual_generation():
+    gemini = BatchGemini(fail=True)
+    assert run(gemini, [payload(f"g{i}") for i in range(3)]) == [(1, 2)] * 3
+    assert gemini.single_calls == 3 and generation_metrics.batch_fallbacks == 3
+
+def test_lone_request_and_disabled_batching_call_gemini_directly():
+    gemini = BatchGemini()
+    assert run(gemini, [payload("g0")], window=0.01) == [(1, 2)]
+    assert run(gemini, [payload("g1"), payload("g2")], max_size=1) == [(1, 2)] * 2
+    assert gemini.batch_calls == [] and gemini.single_calls == 3
+
+def test_follower_stops_waiting_for_a_slow_batch_when_its_budget_runs_out():
+    batcher, gemini = PlanBatcher(4, 5), BatchGemini()
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(gemini)) as http:
+            client = GeminiClient(http, MemoryState())
+            leader = asyncio.create_task(batcher.generate(client, "g0", "p0", "pt"))
+            await asyncio.sleep(0.01)
+            started = time.monotonic()
+            raw = await batcher.generate(client, "g1", "p1", "pt", max_wait=0.1)
+            waited = time.monotonic() - started
+            leader.cancel()
+            await asyncio.gather(leader, return_exceptions=True)
+            return raw, waited
+
+    raw, waited = asyncio.run(go())
+    assert json.loads(raw) == PLAN and waited < 1
+    assert gemini.single_calls == 1 and generation_metrics.batch_fallbacks == 1
+
+def test_batch_output_stays_within_the_model_limit(monkeypatch):
+    monkeypatch.setenv("PLAN_BATCH_MAX_SIZE", "10")
+    get_settings.cache_clear()
+    get_plan_batcher.cache_clear()
+    try:
+        assert get_plan_batcher().max_size == 4  # 8192 // 2048
+    finally:
+        get_plan_batcher.cache_clear()
+
+    gemini = BatchGemini()
+    run(gemini, [payload(f"g{i}") for i in range(6)], max_size=6)
+    assert gemini.output_tokens == [8192]
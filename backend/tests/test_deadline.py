@@ -0,0 +1,132 @@
+import asyncio, json, time
+from datetime import date, timedelta
+import httpx
+import pytest
+from fastapi import Depends
+from app.config import get_settings
+from app.deadline import Deadline, DeadlineExceeded
+from app.gemini_client import GeminiClient
+from app.main import app, get_deadline, get_service
+from app.metrics import generation_metrics
+from app.plan_repository import PlanRepository
+from app.schemas import GenerateGoalPayload, Plan
+from app.service import GoalBreakdownService
+from app.shared_state import MemoryState
+from tests.test_drafts import FakeRepository
+from tests.test_gemini_client import PLAN
+
+BODY = {
+    "goalId": "g1",
+    "goal": {"title": "Aprender", "importance_level": 3, "effort_estimated": 2},
+    "targetDate": (date.today() + timedelta(days=30)).isoformat(),
+}
+
+class SlowFailingGemini:
+    """Cada geração demora `delay` e falha com 500, forçando o fallback; guarda o timeout recebido."""
+
+    def __init__(self, delay, status=500):
+        self.delay = delay
+        self.status = status
+        self.timeouts = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, json={"models": [
+                {"name": f"models/m{i}", "supportedGenerationMethods": ["generateContent"]} for i in range(3)
+            ]})
+        self.timeouts.append(request.extensions["timeout"]["read"])
+        await asyncio.sleep(self.delay)
+        if self.status != 200:
+            return httpx.Response(self.status, json={"error": {"message": "upstream"}})
+        return httpx.Response(200, json={"candidates": [
+            {"content": {"parts": [{"text": json.dumps(PLAN)}]}, "finishReason": "STOP"}
+        ]})
+
+@pytest.fixture(autouse=True)
+def deadline_env(monkeypatch, settings_env):
+    monkeypatch.setenv("PLAN_CACHE_TTL", "0")
+    monkeypatch.setenv("PLAN_TEMPLATES", "false")
+    monkeypatch.setenv("DEADLINE_MIN_ATTEMPT", "0.2")
+    monkeypatch.setenv("DEADLINE_PERSIST_RESERVE", "0.1")
+    get_settings.cache_clear()
+
+def test_budget_is_capped_and_refuses_too_little_time():
+    deadline = Deadline.after(5)
+    assert 4.5 < deadline.budget("x") <= 5
+    assert deadline.budget("x", cap=2) == 2
+    assert 3.5 < deadline.budget("x", reserve=1) <= 4
+    with pytest.raises(DeadlineExceeded, match="before calling m1"):
+        deadline.budget("calling m1", minimum=5)
+    assert Deadline.after(0).expired
+
+def test_fallback_attempts_share_one_budget():
+    gemini = SlowFailingGemini(delay=0.25)
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(gemini)) as http:
+            client = GeminiClient(http, MemoryState(), deadline=Deadline.after(1.0))
+            await client.generate_plan("prompt")
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(go())
+    # 4 candidatos x 20s sem prazo; com prazo de 1s, cada tentativa recebe só o que sobra
+    assert time.monotonic() - started < 1.0
+    assert len(gemini.timeouts) == 3
+    assert all(a > b for a, b in zip(gemini.timeouts, gemini.timeouts[1:]))
+    assert gemini.timeouts[0] <= 0.9
+
+def test_header_overrides_settings_up_to_the_cap(monkeypatch):
+    monkeypatch.setenv("REQUEST_TIMEOUT_MAX", "10")
+    get_settings.cache_clear()
+    assert 4 < asyncio.run(get_deadline(5)).remaining() <= 5
+    assert 9 < asyncio.run(get_deadline(600)).remaining() <= 10
+    assert 59 < asyncio.run(get_deadline(None)).remaining() <= 60
+
+    monkeypatch.setenv("REQUEST_TIMEOUT", "0")
+    get_settings.cache_clear()
+    assert asyncio.run(get_deadline(None)) is None
+
+def test_expired_deadline_returns_504_without_touching_the_database():
+    gemini, repository = SlowFailingGemini(delay=0.3), FakeRepository()
+
+    async def service(deadline: Deadline | None = Depends(get_deadline)):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(gemini)) as http:
+            state = MemoryState()
+            yield GoalBreakdownService(GeminiClient(http, state, deadline), repository, state=state, deadline=deadline)
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/goals/g1/plan", json=BODY, headers={"X-Request-Timeout": "0.5"})
+
+    app.dependency_overrides[get_service] = service
+    try:
+        resp = asyncio.run(go())
+    finally:
+        app.dependency_overrides.clear()
+    assert resp.status_code == 504
+    assert repository.persisted == []
+    assert generation_metrics.deadline_exceeded == 1
+
+def test_repository_skips_calls_without_budget(postgrest):
+    with pytest.raises(DeadlineExceeded, match="loading the goal"):
+        PlanRepository(deadline=Deadline.after(0)).get_goal_owner("g1")
+    assert postgrest.app.state.counters.values == {}
+
+    repository = PlanRepository(deadline=Deadline.after(3))
+    assert repository.get_goal_owner("g1")
+    assert repository._client.postgrest.session.timeout.read <= 3
+
+def test_persistence_is_not_started_without_budget():
+    repository = FakeRepository()
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(SlowFailingGemini(0, status=200))) as http:
+            service = GoalBreakdownService(GeminiClient(http), repository, state=MemoryState(), deadline=Deadline.after(0))
+            with pytest.raises(DeadlineExceeded, match="persisting the plan"):
+                await service._persist(GenerateGoalPayload.model_validate(BODY), "u1", Plan.model_validate(PLAN))
+            return service
+
+    assert not asyncio.run(go()).write_sent
+    assert repository.persisted == []
@@ -0,0 +1,241 @@
+import asyncio, json
+from datetime import date, timedelta
+import httpx
+import pytest
+from app.admission import AdmissionController
+from app.config import get_settings
+from app.drafts import DraftStore
+from app.gemini_client import GeminiClient
+from app.main import app, get_background_service
+from app.metrics import generation_metrics
+from app.schemas import GenerateGoalPayload, PersistedPlan
+from app.service import GoalBreakdownService
+from app.shared_state import MemoryState, SqliteState
+from tests.test_gemini_client import PLAN
+
+TARGET = date.today() + timedelta(days=30)
+
+def payload(**goal):
+    return GenerateGoalPayload(
+        goalId="g1",
+        goal={"title": "Aprender", "importance_level": 3, "effort_estimated": 2, **goal},
+        targetDate=TARGET,
+    )
+
+class SlowGemini:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, json={"models": []})
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return httpx.Response(200, json={"candidates": [
+            {"content": {"parts": [{"text": json.dumps(PLAN)}]}, "finishReason": "STOP"}
+        ]})
+
+class FakeRepository:
+    def __init__(self):
+        self.persisted = []
+
+    def get_goal_owner(self, goal_id):
+        return "u1"
+
+    def get_language_preference(self, user_id):
+        return {"u2": "en", "u3": "es"}.get(user_id)
+
+    def persist_plan(self, goal_id, user_id, plan):
+        self.persisted.append(plan)
+        rows = plan.model_dump(mode="json", by_alias=True)
+        for i, row in enumerate(rows["milestones"] + rows["tasks"]):
+            row["id"] = f"{goal_id}-{len(self.persisted)}-{i}"
+        return PersistedPlan.model_validate(rows)
+
+def run_with_service(gemini, scenario):
+    state, repository = MemoryState(), FakeRepository()
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(gemini)) as http:
+            # cache de planos desligado: só o rascunho pode evitar a chamada
+            service = GoalBreakdownService(GeminiClient(http, state), repository, state=state)
+            return await scenario(service)
+
+    return asyncio.run(go()), repository
+
+@pytest.fixture(autouse=True)
+def no_plan_cache(monkeypatch, settings_env):
+    monkeypatch.setenv("PLAN_CACHE_TTL", "0")
+    monkeypatch.setenv("DRAFT_WAIT_TIMEOUT", "2")
+    get_settings.cache_clear()
+
+def test_click_uses_pregenerated_draft():
+    gemini = SlowGemini()
+
+    async def scenario(service):
+        assert await service.pregenerate(payload())
+        return await service.generate(payload())
+
+    counts, repository = run_with_service(gemini, scenario)
+    assert counts == (1, 2)
+    assert gemini.calls == 1
+    assert generation_metrics.draft_hits == 1 and generation_metrics.drafts_generated == 1
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_taken_draft_leaves_no_key_behind(backend, tmp_path):
+    state = MemoryState() if backend == "memory" else SqliteState(str(tmp_path / "state.db"))
+    drafts = DraftStore(state)
+
+    async def go():
+        await drafts.store("g1", "fp", PLAN)
+        return await drafts.take("g1", "fp")
+
+    assert asyncio.run(go()) == PLAN
+    if backend == "memory":
+        assert "draft:g1" not in state._data
+    else:
+        assert state._conn().execute("SELECT count(*) FROM shared_state").fetchone() == (0,)
+
+def test_changed_inputs_ignore_draft():
+    gemini = SlowGemini()
+
+    async def scenario(service):
+        await service.pregenerate(payload())
+        return await service.generate(payload(title="Aprender Rust"))
+
+    run_with_service(gemini, scenario)
+    assert gemini.calls == 2
+    assert generation_metrics.draft_hits == 0
+
+def test_forced_fresh_generation_ignores_draft():
+    gemini = SlowGemini()
+
+    async def scenario(service):
+        await service.pregenerate(payload())
+        return await service.generate(payload().model_copy(update={"forceFresh": True}))
+
+    run_with_service(gemini, scenario)
+    assert gemini.calls == 2
+    assert generation_metrics.draft_hits == 0
+
+def test_click_during_pregeneration_waits_for_it():
+    gemini = SlowGemini(delay=0.3)
+
+    async def scenario(service):
+        background = asyncio.create_task(service.pregenerate(payload()))
+        await asyncio.sleep(0.05)
+        result = await service.generate(payload())
+        await background
+        return result
+
+    run_with_service(gemini, scenario)
+    assert gemini.calls == 1
+    assert generation_metrics.draft_hits == 1
+
+def test_background_work_gives_way_to_interactive_requests():
+    controller = AdmissionController(max_in_flight=2, max_queue=10, max_wait=5, background_reserve=1)
+    order = []
+
+    async def job(name, background, duration=0.05):
+        async with controller.slot(background=background):
+            order.append(name)
+            await asyncio.sleep(duration)
+
+    async def go():
+        first = asyncio.create_task(job("bg-1", True, 0.1))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(job("bg-2", True))
+        await asyncio.sleep(0.01)
+        # bg-2 espera: a vaga restante é reservada para requisições interativas
+        assert order == ["bg-1"] and controller.in_flight == 1
+        await job("interactive", False)
+        await asyncio.gather(first, second)
+
+    asyncio.run(go())
+    assert order == ["bg-1", "interactive", "bg-2"]
+
+class RecordingService:
+    def __init__(self, languages=None):
+        self.payloads = []
+        self.languages = languages or {}
+
+    async def preferred_language(self, user_id):
+        return self.languages.get(user_id, "pt")
+
+    async def pregenerate(self, payload):
+        self.payloads.append(payload)
+        return True
+
+WEBHOOK_SECRET = {"X-Webhook-Secret": "s3cret"}
+
+@pytest.fixture(autouse=True)
+def webhook_secret(monkeypatch, no_plan_cache):
+    monkeypatch.setenv("GOAL_WEBHOOK_SECRET", "s3cret")
+    get_settings.cache_clear()
+
+def post_webhook(event, headers=WEBHOOK_SECRET, service=None):
+    service = service or RecordingService()
+    app.dependency_overrides[get_background_service] = lambda: service
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post("/webhooks/goals", json=event, headers=headers)
+            for _ in range(3):
+                await asyncio.sleep(0)
+            return resp
+
+    try:
+        return asyncio.run(go()), service
+    finally:
+        app.dependency_overrides.clear()
+
+EVENT = {
+    "type": "INSERT", "table": "goals", "schema": "public", "old_record": None,
+    "record": {"id": "g1", "user_id": "u1", "title": "Aprender", "description": None,
+               "importance_level": 4, "effort_estimated": 2, "target_date": TARGET.isoformat()},
+}
+
+def test_goal_insert_webhook_schedules_pregeneration():
+    resp, service = post_webhook(EVENT)
+    assert resp.status_code == 202 and resp.json() == {"scheduled": True}
+    assert service.payloads[0].goalId == "g1" and service.payloads[0].goal.importance_level == 4
+
+def test_webhook_ignores_goals_without_future_target_date():
+    event = {**EVENT, "record": {**EVENT["record"], "target_date": None}}
+    resp, service = post_webhook(event)
+    assert resp.json() == {"scheduled": False} and not service.payloads
+
+def test_webhook_secret_is_enforced():
+    assert post_webhook(EVENT, {})[0].status_code == 401
+    assert post_webhook(EVENT, {"X-Webhook-Secret": "s3cre"})[0].status_code == 401
+    assert post_webhook(EVENT)[0].status_code == 202
+
+def test_webhook_without_configured_secret_fails_closed(monkeypatch):
+    monkeypatch.delenv("GOAL_WEBHOOK_SECRET")
+    get_settings.cache_clear()
+    resp, service = post_webhook(EVENT, {"X-Webhook-Secret": ""})
+    assert resp.status_code == 503 and not service.payloads
+
+def test_webhook_uses_the_profile_language():
+    resp, service = post_webhook(EVENT, service=RecordingService({"u1": "en"}))
+    assert resp.json() == {"scheduled": True}
+    assert service.payloads[0].language == "en"
+
+def test_preferred_language_falls_back_to_setting(monkeypatch):
+    monkeypatch.setenv("SPECULATIVE_LANGUAGE", "en")
+    get_settings.cache_clear()
+
+    async def scenario(service):
+        return [await service.preferred_language(user) for user in ("u1", "u2", "u3")]
+
+    languages, _ = run_with_service(SlowGemini(), scenario)
+    assert languages == ["en", "en", "en"]
+
+def test_preferred_language_from_profile():
+    async def scenario(service):
+        return [await service.preferred_language(user) for user in ("u1", "u2")]
+
+    languages, _ = run_with_service(SlowGemini(), scenario)
+    assert languages == ["pt", "en"]
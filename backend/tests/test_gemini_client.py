@@ -0,0 +1,117 @@
+import asyncio, json
+from datetime import date, timedelta
+import httpx
+import pytest
+from app.gemini_client import GeminiClient
+from app.metrics import generation_metrics
+from app.schemas import GenerateGoalPayload
+from app.service import GoalBreakdownService
+
+PLAN = {
+    "milestones": [{"title": "Base", "description": "Fundamentos", "order_sequence": 1}],
+    "tasks": [
+        {"title": "Estudar", "description": "Ler o material", "priority": "alta",
+         "estimated_duration": 60, "due_date": "2025-01-10", "order_sequence": 1},
+        {"title": "Praticar", "description": "Exercícios", "priority": "media",
+         "estimated_duration": 30, "due_date": "2025-01-12", "order_sequence": 2},
+    ],
+}
+
+class FakeGemini:
+    """Upstream falso: responde /models e devolve as respostas de `replies` em ordem."""
+
+    def __init__(self, replies, models=("gemini-1.5-flash", "gemini-1.5-pro")):
+        self.replies = list(replies)
+        self.models = models
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, json={"models": [
+                {"name": f"models/{m}", "supportedGenerationMethods": ["generateContent"]} for m in self.models
+            ]})
+        self.requests.append((request.url.path, json.loads(request.content)))
+        status, text, finish_reason = self.replies.pop(0)
+        if status != 200:
+            return httpx.Response(status, json={"error": {"message": "upstream"}})
+        return httpx.Response(200, json={"candidates": [
+            {"content": {"parts": [{"text": text}]}, "finishReason": finish_reason}
+        ]})
+
+def run_generate(fake, prompt="plano", continuation=None):
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(fake)) as http:
+            return await GeminiClient(http).generate_plan(prompt, continuation)
+    return asyncio.run(go())
+
+def test_structured_output_sends_schema_and_skips_fence_cleanup():
+    fake = FakeGemini([(200, json.dumps(PLAN), "STOP")])
+    raw = run_generate(fake)
+
+    assert json.loads(raw) == PLAN
+    path, body = fake.requests[0]
+    assert path == "/v1beta/models/gemini-1.5-flash:generateContent"
+    config = body["generationConfig"]
+    assert config["responseMimeType"] == "application/json"
+    tasks = config["responseSchema"]["properties"]["tasks"]["items"]
+    assert tasks["properties"]["priority"]["enum"] == ["alta", "media", "baixa"]
+    assert "due_date" in tasks["required"]
+
+def test_legacy_mode_strips_fences(monkeypatch):
+    monkeypatch.setenv("GEMINI_STRUCTURED_OUTPUT", "false")
+    fake = FakeGemini([(200, f"```json\n{json.dumps(PLAN)}\n```", "STOP")])
+    raw = run_generate(fake)
+
+    assert json.loads(raw) == PLAN
+    assert "responseSchema" not in fake.requests[0][1]["generationConfig"]
+
+def test_fallback_to_next_model_is_counted():
+    fake = FakeGemini([(503, "", None), (200, json.dumps(PLAN), "STOP")])
+    run_generate(fake)
+
+    assert [p.rsplit("/", 1)[-1] for p, _ in fake.requests] == [
+        "gemini-1.5-flash:generateContent", "gemini-1.5-pro:generateContent",
+    ]
+    stats = generation_metrics.snapshot()
+    assert stats["fallbacks"] == 1 and stats["fallback_rate"] == 1.0
+    assert stats["model_attempts"] == 2
+
+def test_all_models_failing_raises_and_counts_upstream_failure():
+    fake = FakeGemini([(500, "", None)] * 2)
+    with pytest.raises(RuntimeError):
+        run_generate(fake)
+    assert generation_metrics.upstream_failures == 1
+
+def test_truncated_response_is_continued():
+    full = json.dumps(PLAN)
+    cut = full[: full.index('{"title": "Praticar"')]
+    tail = json.dumps({"milestones": [], "tasks": PLAN["tasks"][1:]})
+    fake = FakeGemini([(200, cut, "MAX_TOKENS"), (200, tail, "STOP")])
+    raw = run_generate(fake, continuation=lambda partial: f"continue após {len(partial['tasks'])}")
+
+    assert json.loads(raw) == PLAN
+    assert fake.requests[1][1]["contents"][0]["parts"][0]["text"] == "continue após 1"
+    assert generation_metrics.truncated_responses == 1
+    assert generation_metrics.continuations == 1
+
+class OwnerOnlyRepository:
+    def get_goal_owner(self, goal_id):
+        return "u1"
+
+def test_invalid_plan_is_recorded_as_validation_failure():
+    invalid = {**PLAN, "tasks": [{**PLAN["tasks"][0], "estimated_duration": "uma hora"}]}
+    fake = FakeGemini([(200, json.dumps(invalid), "STOP")])
+    payload = GenerateGoalPayload(
+        goalId="g1",
+        goal={"title": "Aprender", "importance_level": 3, "effort_estimated": 2},
+        targetDate=date.today() + timedelta(days=30),
+    )
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(fake)) as http:
+            return await GoalBreakdownService(GeminiClient(http), OwnerOnlyRepository()).generate(payload)
+
+    with pytest.raises(RuntimeError, match="invalid plan"):
+        asyncio.run(go())
+    stats = generation_metrics.snapshot()
+    assert stats["validation_failures"] == 1 and stats["validation_failure_rate"] == 1.0
@@ -0,0 +1,129 @@
+import asyncio, time
+import httpx
+import pytest
+from app.config import get_settings
+from app.idempotency import IdempotencyStore
+from app.main import app, get_idempotency_store, get_service
+from app.plan_repository import WriteNotConfirmed
+from app.shared_state import MemoryState
+from tests.test_agenda import SECRET, token
+
+BODY = {
+    "goalId": "g1",
+    "goal": {"title": "Aprender Python", "importance_level": 4, "effort_estimated": 3},
+    "targetDate": "2099-12-31",
+}
+
+class FakeService:
+    def __init__(self, delay=0.0, error=None):
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+        self.write_sent = False
+
+    async def generate(self, payload):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if isinstance(self.error, WriteNotConfirmed):
+            self.write_sent = True
+        if self.error:
+            raise self.error
+        return 3, 7
+
+@pytest.fixture
+def fake_service():
+    service = FakeService()
+    store = IdempotencyStore(MemoryState())
+    app.dependency_overrides[get_service] = lambda: service
+    app.dependency_overrides[get_idempotency_store] = lambda: store
+    yield service
+    app.dependency_overrides.clear()
+
+def post(*requests):
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(client.post(url, json=body, headers=headers) for url, body, headers in requests))
+    return asyncio.run(go())
+
+def test_replay_returns_stored_response_without_running_again(fake_service):
+    (first,) = post(("/goals/g1/plan", BODY, {"Idempotency-Key": "k1"}))
+    (second,) = post(("/goals/g1/plan", BODY, {"Idempotency-Key": "k1"}))
+
+    assert first.json() == second.json() == {"success": True, "milestonesCount": 3, "tasksCount": 7}
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert fake_service.calls == 1
+
+def test_concurrent_replay_waits_for_first_request(fake_service):
+    fake_service.delay = 0.3
+    request = ("/goals/g1/plan", BODY, {"Idempotency-Key": "k2"})
+    first, second = post(request, request)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert fake_service.calls == 1
+
+def test_same_key_with_different_body_is_rejected(fake_service):
+    post(("/goals/g1/plan", BODY, {"Idempotency-Key": "k3"}))
+    (other,) = post(("/goals/g1/plan", {**BODY, "language": "en"}, {"Idempotency-Key": "k3"}))
+
+    assert other.status_code == 422
+    assert fake_service.calls == 1
+
+def test_upstream_failure_is_not_stored(fake_service):
+    fake_service.error = RuntimeError("Failed to generate plan with Gemini")
+    request = ("/goals/g1/plan", BODY, {"Idempotency-Key": "k4"})
+    (failed,) = post(request)
+    fake_service.error = None
+    (retried,) = post(request)
+
+    assert failed.status_code == 502
+    assert retried.status_code == 200 and "Idempotent-Replayed" not in retried.headers
+    assert fake_service.calls == 2
+
+def test_unconfirmed_write_keeps_the_key_so_the_retry_does_not_duplicate_rows(fake_service):
+    fake_service.error = WriteNotConfirmed("persisting the plan")
+    request = ("/goals/g1/plan", BODY, {"Idempotency-Key": "k8"})
+    (failed,) = post(request)
+    fake_service.error = None
+    (retried,) = post(request)
+
+    assert failed.status_code == retried.status_code == 504
+    assert retried.headers["Idempotent-Replayed"] == "true"
+    assert fake_service.calls == 1
+
+def test_requests_without_key_always_run(fake_service):
+    post(("/api/generate-goal-breakdown", BODY, {}), ("/api/generate-goal-breakdown", BODY, {}))
+    assert fake_service.calls == 2
+
+def test_same_key_from_different_users_does_not_collide(fake_service, monkeypatch):
+    monkeypatch.setenv("SUPABASE_JWT_SECRET", SECRET)
+    get_settings.cache_clear()
+    (first,) = post(("/goals/g1/plan", BODY, {"Idempotency-Key": "k5", "Authorization": f"Bearer {token('u1')}"}))
+    (other_user,) = post(("/goals/g1/plan", {**BODY, "language": "en"},
+                          {"Idempotency-Key": "k5", "Authorization": f"Bearer {token('u2')}"}))
+    (replay,) = post(("/goals/g1/plan", BODY, {"Idempotency-Key": "k5", "Authorization": f"Bearer {token('u1')}"}))
+
+    assert first.status_code == other_user.status_code == 200
+    assert "Idempotent-Replayed" not in other_user.headers
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert fake_service.calls == 2
+
+def test_without_user_token_keys_are_scoped_by_goal(fake_service):
+    post(("/goals/g1/plan", BODY, {"Idempotency-Key": "k6"}))
+    (other_goal,) = post(("/goals/g2/plan", {**BODY, "goalId": "g2"}, {"Idempotency-Key": "k6"}))
+
+    assert other_goal.status_code == 200 and "Idempotent-Replayed" not in other_goal.headers
+    assert fake_service.calls == 2
+
+def test_lock_outlives_the_longest_possible_run(monkeypatch):
+    monkeypatch.setenv("IDEMPOTENCY_LOCK_TTL", "30")
+    monkeypatch.setenv("REQUEST_TIMEOUT_MAX", "300")
+    monkeypatch.setenv("ADMISSION_MAX_WAIT", "15")
+    get_settings.cache_clear()
+    state = MemoryState()
+    store = IdempotencyStore(state)
+
+    assert asyncio.run(store.begin("user:u1", "k7", "fp")) is None
+    _, expires_at = state._data["idem:user:u1:k7"]
+    assert expires_at - time.time() > 314
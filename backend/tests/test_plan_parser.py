@@ -0,0 +1,61 @@
+import json
+from app.plan_parser import extract_json, last_sequence, merge_plans, salvage_plan
+from tests.test_gemini_client import PLAN, FakeGemini, run_generate
+
+FULL = json.dumps(PLAN)
+
+def test_complete_json_is_not_truncated():
+    assert salvage_plan(f"texto antes {FULL} texto depois") == (PLAN, False)
+
+def test_salvage_keeps_complete_items_before_the_cut():
+    cut = FULL[: FULL.index('"Praticar"') + 5]
+    plan, truncated = salvage_plan(cut)
+    assert truncated
+    assert plan == {"milestones": PLAN["milestones"], "tasks": PLAN["tasks"][:1]}
+
+def test_salvage_cut_inside_milestones_has_no_tasks():
+    cut = FULL[: FULL.index('"Fundamentos"')]
+    assert salvage_plan(cut) == ({"milestones": [], "tasks": []}, True)
+
+def test_salvage_cut_right_after_closed_arrays_is_still_truncated_without_both():
+    cut = FULL[: FULL.index('"tasks"')]
+    plan, truncated = salvage_plan(cut)
+    assert plan["milestones"] == PLAN["milestones"] and plan["tasks"] == []
+    assert truncated
+
+def test_salvage_skips_non_object_items():
+    plan, truncated = salvage_plan('{"milestones": [1, {"title": "A"}], "tasks": [')
+    assert plan == {"milestones": [{"title": "A"}], "tasks": []} and truncated
+
+def test_salvage_without_json():
+    assert salvage_plan("desculpe, não consegui") == ({"milestones": [], "tasks": []}, True)
+
+def test_extract_json_strips_fences():
+    assert extract_json(f"```json\n{FULL}\n```") == FULL
+
+def test_last_sequence_ignores_missing_values():
+    assert last_sequence([{"order_sequence": 3}, {"order_sequence": None}, {"title": "x"}]) == 3
+    assert last_sequence([]) == 0
+
+def test_merge_skips_items_already_in_the_plan():
+    base = {"milestones": PLAN["milestones"], "tasks": PLAN["tasks"][:1]}
+    tail = {"milestones": PLAN["milestones"], "tasks": [{**PLAN["tasks"][0], "title": "Repetida"}, PLAN["tasks"][1]]}
+    assert merge_plans(base, tail) == PLAN
+
+def test_merge_with_only_duplicates_is_unchanged():
+    assert merge_plans(PLAN, PLAN) == PLAN
+
+def test_continuation_repeating_items_stops_early():
+    cut = FULL[: FULL.index('{"title": "Praticar"')]
+    repeated = json.dumps({"milestones": [], "tasks": PLAN["tasks"][:1]})
+    # a continuação só repete o que já veio: não adianta pedir de novo
+    fake = FakeGemini([(200, cut, "MAX_TOKENS"), (200, repeated, "MAX_TOKENS"), (200, FULL, "STOP")])
+    raw = run_generate(fake, continuation=lambda partial: "continue")
+
+    assert json.loads(raw) == {"milestones": PLAN["milestones"], "tasks": PLAN["tasks"][:1]}
+    assert len(fake.requests) == 2
+
+def test_truncated_response_without_complete_items_tries_next_model():
+    fake = FakeGemini([(200, FULL[:20], "MAX_TOKENS"), (200, FULL, "STOP")])
+    assert json.loads(run_generate(fake, continuation=lambda partial: "continue")) == PLAN
+    assert fake.requests[1][0].endswith("gemini-1.5-pro:generateContent")
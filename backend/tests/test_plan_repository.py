@@ -0,0 +1,74 @@
+import time
+import pytest
+from app.config import get_settings
+from app.deadline import Deadline
+from app.plan_repository import PlanRepository, WriteNotConfirmed
+from app.replan import PlanDiff
+from app.schemas import Plan
+from benchmarks.fake_upstreams import BackgroundServer, UpstreamProfile, fake_postgrest, synthetic_plan
+from benchmarks.loadtest import free_port
+
+@pytest.fixture
+def slow_postgrest(monkeypatch):
+    with BackgroundServer(fake_postgrest(UpstreamProfile(latency_median_ms=300, latency_sigma=0)), free_port()) as server:
+        monkeypatch.setenv("SUPABASE_URL", server.url)
+        monkeypatch.setenv("DATABASE_WRITE_TIMEOUT", "0.1")
+        get_settings.cache_clear()
+        yield server
+
+def test_persist_plan_against_fake_postgrest(postgrest):
+    repository = PlanRepository()
+    plan = Plan.model_validate(synthetic_plan(5))
+
+    assert repository.get_goal_owner("g1")
+    persisted = repository.persist_plan("g1", "u1", plan)
+    assert (len(persisted.milestones), len(persisted.tasks)) == (4, 5)
+    assert all(t.id for t in persisted.tasks) and persisted.tasks[0].title == plan.tasks[0].title
+    assert postgrest.app.state.counters.values == {"goals": 1, "persist": 1}
+
+def test_persist_returns_only_the_new_rows_while_fetch_plan_reads_the_whole_goal(postgrest):
+    repository = PlanRepository()
+    first = repository.persist_plan("g1", "u1", Plan.model_validate(synthetic_plan(3)))
+    second = repository.persist_plan("g1", "u1", Plan.model_validate(synthetic_plan(2)))
+    repository.persist_plan("g2", "u1", Plan.model_validate(synthetic_plan(7)))
+
+    assert len(second.tasks) == 2 and not {t.id for t in second.tasks} & {t.id for t in first.tasks}
+    stored = repository.fetch_plan("g1")
+    assert [t.id for t in stored.tasks] == [t.id for t in first.tasks + second.tasks]
+    assert len(stored.milestones) == 8
+
+def test_fetch_plan_of_goal_without_plan(postgrest):
+    assert PlanRepository().fetch_plan("g1").tasks == []
+
+def test_plan_diff_is_applied_in_one_call(postgrest):
+    repository = PlanRepository()
+    persisted = repository.persist_plan("g1", "u1", Plan.model_validate(synthetic_plan(4)))
+    done, update, delete, raced = persisted.tasks[:4]
+    rows = {row["id"]: row for row in postgrest.app.state.rows["tasks"]}
+    rows[done.id]["status"] = "completed"
+    rows[raced.id]["status"] = "in_progress"  # o usuário começou a tarefa depois do diff ser calculado
+
+    new_task = {**update.model_dump(mode="json", exclude={"id", "status"}), "title": "Nova"}
+    diff = PlanDiff(
+        task_inserts=[new_task],
+        task_updates=[{**update.model_dump(mode="json"), "title": "Revista"}, {**raced.model_dump(mode="json"), "title": "X"}],
+        task_deletes=[delete.id],
+    )
+    written = repository.apply_plan_diff("g1", "u1", diff)
+
+    assert postgrest.app.state.counters.values == {"persist": 1, "apply_diff": 1}
+    assert written == 3
+    titles = {t.id: t.title for t in repository.fetch_plan("g1").tasks}
+    assert titles[update.id] == "Revista" and titles[raced.id] == raced.title
+    assert delete.id not in titles and done.id in titles
+    assert "Nova" in titles.values()
+
+def test_write_timeout_after_commit_is_reported_as_unconfirmed(slow_postgrest):
+    # o prazo curto não corta a escrita: o timeout é o fixo de escrita
+    repository = PlanRepository(deadline=Deadline.after(0.05))
+    with pytest.raises(WriteNotConfirmed, match="persisting the plan"):
+        repository.persist_plan("g1", "u1", Plan.model_validate(synthetic_plan(3)))
+    assert repository._client.postgrest.session.timeout.read == 0.1
+
+    time.sleep(0.4)
+    assert len(slow_postgrest.app.state.rows["tasks"]) == 3  # a transação terminou depois do timeout
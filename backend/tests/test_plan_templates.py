@@ -0,0 +1,99 @@
+import asyncio
+from datetime import date, timedelta
+import httpx
+from app.gemini_client import GeminiClient
+from app.metrics import generation_metrics
+from app.plan_templates import PlanTemplates, anchor, similarity, title_tokens, to_template
+from app.schemas import GenerateGoalPayload, Plan
+from app.service import GoalBreakdownService
+from app.shared_state import MemoryState
+from tests.test_drafts import FakeRepository, SlowGemini
+
+TODAY = date.today()
+
+def payload(title="Aprender inglês", days=60, effort=3, language="pt", goal_description=None, **extra):
+    return GenerateGoalPayload(
+        goalId="g1",
+        goal={"title": title, "description": goal_description, "importance_level": 3, "effort_estimated": effort},
+        targetDate=TODAY + timedelta(days=days),
+        language=language,
+        **extra,
+    )
+
+def plan(days=60):
+    return Plan.model_validate({
+        "milestones": [{"title": "Metade", "description": "...", "order_sequence": 1}],
+        "tasks": [
+            {"title": f"Aula {i}", "description": "...", "priority": "media", "estimated_duration": 30,
+             "due_date": (TODAY + timedelta(days=d)).isoformat(), "order_sequence": i}
+            for i, d in enumerate((0, days // 2, days), start=1)
+        ],
+    })
+
+def test_titles_are_normalized_before_matching():
+    assert title_tokens("Aprender  INGLÊS!") == title_tokens("aprender ingles") == {"aprender", "ingles"}
+    assert title_tokens("Correr uma meia-maratona") == {"correr", "meia", "maratona"}
+    assert similarity(title_tokens("Run a 5k"), title_tokens("run 10k")) < 0.5
+
+def test_template_is_reanchored_to_new_target():
+    template = to_template(payload(days=60), 60, plan(60))
+    assert [t["due_fraction"] for t in template["tasks"]] == [0.0, 0.5, 1.0]
+
+    anchored = anchor(template, TODAY + timedelta(days=90))
+    assert [t.due_date for t in anchored.tasks] == [TODAY, TODAY + timedelta(days=45), TODAY + timedelta(days=90)]
+
+def match(stored, incoming, user="u1"):
+    templates = PlanTemplates(MemoryState())
+
+    async def go():
+        await templates.store("u1", stored, (stored.targetDate - TODAY).days, plan((stored.targetDate - TODAY).days))
+        return await templates.match(user, incoming, (incoming.targetDate - TODAY).days)
+
+    return asyncio.run(go())
+
+def test_similar_goal_matches_but_different_effort_language_or_horizon_do_not():
+    assert match(payload("Aprender inglês"), payload("aprender ingles", days=45)) is not None
+    assert match(payload("Aprender inglês"), payload("Aprender inglês", effort=5)) is None
+    assert match(payload("Aprender inglês"), payload("Aprender inglês", language="en")) is None
+    assert match(payload("Aprender inglês"), payload("Aprender inglês", days=365)) is None
+    assert match(payload("Aprender inglês"), payload("Aprender alemão")) is None
+    assert generation_metrics.template_lookups == 5 and generation_metrics.template_hits == 1
+
+def test_templates_without_description_are_shared_between_users():
+    assert match(payload("Run a 5k"), payload("run a 5K", days=50), user="u2") is not None
+
+def test_templates_shaped_by_a_description_stay_with_their_owner():
+    private = payload("Aprender inglês", goal_description="Entrevista na Acme em março")
+    assert match(private, private, user="u2") is None
+    assert match(private, private) is not None
+    assert match(private, payload("Aprender inglês"), user="u2") is None
+
+def test_index_holds_only_metadata_and_replaced_plans_are_deleted():
+    state = MemoryState()
+    templates = PlanTemplates(state)
+
+    async def go():
+        await templates.store("u1", payload(), 60, plan(60))
+        first = state.get("templates:shared:pt:3")[0]["id"]
+        await templates.store("u1", payload(), 50, plan(50))
+        return first, state.get("templates:shared:pt:3")
+
+    first, index = asyncio.run(go())
+    assert len(index) == 1 and set(index[0]) == {"id", "tokens", "horizon_days", "stored_at"}
+    assert state.get(f"template:{first}") is None
+    assert state.get(f"template:{index[0]['id']}")["horizon_days"] == 50
+
+def test_service_reuses_template_unless_fresh_generation_is_forced(monkeypatch, settings_env):
+    gemini, state = SlowGemini(), MemoryState()
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(gemini)) as http:
+            service = GoalBreakdownService(GeminiClient(http, state), FakeRepository(), state=state)
+            await service.generate(payload("Aprender inglês", days=30))
+            await service.generate(payload("aprender Inglês", days=40))
+            await service.generate(payload("aprender Inglês", days=40, forceFresh=True))
+
+    asyncio.run(go())
+    assert gemini.calls == 2
+    stats = generation_metrics.snapshot()
+    assert stats["template_hits"] == 1 and stats["template_hit_rate"] == 0.5
@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+import pytest
+from app.config import get_settings
+from app.metrics import prompt_metrics
+from app.prompt_builder import build_prompt, estimate_tokens, fit_text, get_template, register_template
+from app.schemas import GoalPayload
+
+TARGET = date.today() + timedelta(days=60)
+
+def goal(description=None, title="Aprender Python"):
+    return GoalPayload(title=title, description=description, importance_level=4, effort_estimated=3)
+
+def test_short_goal_is_rendered_verbatim():
+    prompt = build_prompt(goal("Quero automatizar planilhas."), TARGET, 60, "pt")
+    assert "DESCRIÇÃO: Quero automatizar planilhas.\n" in prompt
+    assert f"PRAZO: 60 dias (até {TARGET.strftime('%d/%m/%Y')})" in prompt
+    assert prompt_metrics.fields_trimmed == 0
+    assert prompt_metrics.by_template == {"plan": 1}
+
+@pytest.mark.parametrize("language", ["pt", "en"])
+def test_long_description_fits_budget(language):
+    description = "Contexto inicial importante. " + "texto colado " * 2000 + "Pedido final concreto."
+    prompt = build_prompt(goal(description, title="T" * 3000), TARGET, 60, language)
+
+    assert estimate_tokens(prompt) <= get_settings().prompt_max_input_tokens
+    assert "Contexto inicial importante." in prompt and "Pedido final concreto." in prompt
+    assert prompt_metrics.fields_trimmed == 2
+    assert prompt_metrics.input_tokens_max == estimate_tokens(prompt)
+
+def test_budget_is_configurable(monkeypatch):
+    monkeypatch.setenv("PROMPT_MAX_INPUT_TOKENS", "400")
+    get_settings.cache_clear()
+    prompt = build_prompt(goal("x " * 5000), TARGET, 60, "en")
+    assert estimate_tokens(prompt) <= 400
+
+def test_fit_text_is_deterministic_and_keeps_whole_words():
+    text = "um dois três quatro cinco seis sete oito nove dez " * 50
+    first, second = fit_text(text, 20), fit_text(text, 20)
+    assert first == second
+    assert len(first) <= 20 * 4
+    assert all(word in text.split() for word in first.replace("[...]", "").split())
+
+def test_registered_template_exposes_fields():
+    template = register_template("probe", "pt", "Meta: {title} ({days} dias) {{json}}")
+    assert template.fields == {"title", "days"}
+    assert get_template("probe", "pt").render(title="Ler", days=3) == "Meta: Ler (3 dias) {json}"
@@ -0,0 +1,133 @@
+import asyncio, json
+from datetime import date, timedelta
+import httpx
+from app.admission import AdmissionController
+from app.gemini_client import GeminiClient
+from app.metrics import prompt_metrics
+from app.prompt_builder import build_replan_prompt
+from app.replan import diff_plan, progress_summary
+from app.schemas import GenerateGoalPayload, GoalPayload, PersistedPlan, Plan
+from app.service import GoalBreakdownService
+from app.shared_state import MemoryState
+from tests.test_gemini_client import FakeGemini
+
+DUE = (date.today() + timedelta(days=5)).isoformat()
+
+def task(title, seq, status="pending", **extra):
+    return {"title": title, "description": f"{title}.", "priority": "media", "estimated_duration": 30,
+            "due_date": DUE, "order_sequence": seq, "status": status, **extra}
+
+def existing_plan(completed=2):
+    tasks = [task(f"Feita {i}", i, "completed", id=f"t{i}") for i in range(1, completed + 1)]
+    tasks += [
+        task("Revisar", completed + 1, id="open-same"),
+        task("Praticar", completed + 2, id="open-changed"),
+        task("Abandonar", completed + 3, id="open-gone"),
+    ]
+    milestones = [
+        {"id": "m1", "title": "Marco 1", "description": "", "order_sequence": 1, "status": "completed"},
+        {"id": "m2", "title": "Marco 2", "description": "Metade", "order_sequence": 2, "status": "pending"},
+    ]
+    return PersistedPlan.model_validate({"milestones": milestones, "tasks": tasks})
+
+def remaining_plan(completed=2):
+    base = completed + 1
+    return Plan.model_validate({
+        "milestones": [{"title": "Marco 2", "description": "Metade", "order_sequence": 2}],
+        "tasks": [
+            {k: v for k, v in task("Revisar", base).items() if k != "status"},
+            {k: v for k, v in task("Praticar", base + 1, estimated_duration=45).items() if k != "status"},
+            {k: v for k, v in task("Feita 1", base + 2).items() if k != "status"},
+            {k: v for k, v in task("Nova", base + 3).items() if k != "status"},
+        ],
+    })
+
+def test_diff_keeps_completed_and_writes_only_changes():
+    diff = diff_plan(existing_plan(), remaining_plan())
+
+    assert diff.kept_tasks == 2 and diff.kept_milestones == 1
+    assert [row["id"] for row in diff.task_updates] == ["open-changed"]
+    assert diff.task_updates[0]["estimated_duration"] == 45
+    assert [row["title"] for row in diff.task_inserts] == ["Nova"]
+    assert diff.task_inserts[0]["order_sequence"] == 5
+    assert diff.task_deletes == ["open-gone"]
+    assert not diff.milestone_inserts and not diff.milestone_updates and not diff.milestone_deletes
+    assert diff.rows_written == 3
+
+def test_diff_keeps_tasks_the_user_skipped():
+    existing = existing_plan()
+    existing.tasks[3].status = "skipped"  # "Praticar"
+    diff = diff_plan(existing, remaining_plan())
+
+    assert diff.kept_tasks == 3
+    assert "open-changed" not in [row["id"] for row in diff.task_updates] + diff.task_deletes
+    assert [row["title"] for row in diff.task_inserts] == ["Nova"]
+    assert progress_summary(existing)["skipped"] == ["Praticar"]
+
+def test_replan_prompt_stays_compact_as_progress_grows():
+    goal = GoalPayload(title="Aprender", importance_level=3, effort_estimated=2)
+    target = date.today() + timedelta(days=30)
+    small = build_replan_prompt(goal, target, 30, progress_summary(existing_plan(5)), "pt")
+    large = build_replan_prompt(goal, target, 30, progress_summary(existing_plan(500)), "pt")
+
+    assert "500 de 503 tarefas concluídas" in large
+    assert "Feita 1;" not in large and "Feita 500" in large
+    assert len(large) - len(small) < 200
+    assert prompt_metrics.by_template == {"replan": 2}
+
+class FakeRepository:
+    def __init__(self, plan):
+        self.plan = plan
+        self.applied = None
+
+    def fetch_plan(self, goal_id):
+        return self.plan
+
+    def get_goal_owner(self, goal_id):
+        return "u1"
+
+    def apply_plan_diff(self, goal_id, user_id, diff):
+        self.applied = (goal_id, user_id, diff)
+        return diff.rows_written
+
+def test_service_replan_prompts_with_progress_and_applies_diff():
+    remaining = remaining_plan().model_dump(mode="json", by_alias=True)
+    fake = FakeGemini([(200, json.dumps(remaining), "STOP")])
+    repository = FakeRepository(existing_plan())
+    payload = GenerateGoalPayload(
+        goalId="g1",
+        goal={"title": "Aprender", "importance_level": 3, "effort_estimated": 2},
+        targetDate=date.today() + timedelta(days=30),
+    )
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(fake)) as http:
+            service = GoalBreakdownService(GeminiClient(http, MemoryState()), repository, state=MemoryState())
+            return await service.replan(payload)
+
+    diff = asyncio.run(go())
+    prompt = fake.requests[0][1]["contents"][0]["parts"][0]["text"]
+    assert "2 de 5 tarefas concluídas" in prompt
+    assert "a partir de 3" in prompt
+    assert repository.applied == ("g1", "u1", diff)
+
+def test_cached_replan_is_served_without_a_slot():
+    remaining = remaining_plan().model_dump(mode="json", by_alias=True)
+    fake = FakeGemini([(200, json.dumps(remaining), "STOP")])
+    repository, state = FakeRepository(existing_plan()), MemoryState()
+    controller = AdmissionController(max_in_flight=1, max_queue=0, max_wait=5)
+    payload = GenerateGoalPayload(
+        goalId="g1",
+        goal={"title": "Aprender", "importance_level": 3, "effort_estimated": 2},
+        targetDate=date.today() + timedelta(days=30),
+    )
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(fake)) as http:
+            service = GoalBreakdownService(GeminiClient(http, state), repository, state=state, admission=controller)
+            first = await service.replan(payload)
+            async with controller.slot():  # worker lotado e fila zerada
+                return first, await service.replan(payload)
+
+    first, second = asyncio.run(go())
+    assert first == second and len(fake.requests) == 1
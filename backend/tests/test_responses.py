@@ -0,0 +1,39 @@
+import gzip
+import brotli
+import pytest
+from app.responses import MIN_COMPRESS_SIZE, PlanResponse, negotiate_encoding
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0.00, gzip;q=0.5", "gzip"),
+    ("br; q=0.2, gzip; q=0.8", "gzip"),
+    ("gzip;q=0, br;q=0", None),
+    ("*", "br"),
+    ("*;q=0", None),
+    ("*, br;q=0", "gzip"),
+    ("identity;q=1, *;q=0", None),
+    ("GZIP;Q=1", "gzip"),
+    ("deflate", None),
+])
+def test_accept_encoding_negotiation(header, expected):
+    assert negotiate_encoding(header) == expected
+
+def test_plan_response_compresses_large_bodies_and_declares_vary():
+    content = {"plan": {"tasks": [{"title": "Tarefa", "description": "x" * 40}] * 100}}
+    plain = PlanResponse(content)
+    assert "content-encoding" not in plain.headers and plain.headers["vary"] == "Accept-Encoding"
+
+    br = PlanResponse(content, accept_encoding="br")
+    assert br.headers["content-encoding"] == "br" and brotli.decompress(br.body) == plain.body
+    gz = PlanResponse(content, accept_encoding="gzip, br;q=0")
+    assert gz.headers["content-encoding"] == "gzip" and gzip.decompress(gz.body) == plain.body
+
+def test_small_bodies_are_not_compressed():
+    small = PlanResponse({"success": True}, accept_encoding="br, gzip", status_code=201)
+    assert len(small.body) < MIN_COMPRESS_SIZE
+    assert "content-encoding" not in small.headers and small.status_code == 201
@@ -0,0 +1,103 @@
+import asyncio, json, multiprocessing, sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+import httpx
+from app.gemini_client import GeminiClient
+from app.schemas import GenerateGoalPayload
+from app.service import GoalBreakdownService
+from app.shared_state import MemoryState, SqliteState, take_token
+from tests.test_gemini_client import PLAN, FakeGemini
+
+def _increment(path, times):
+    state = SqliteState(path)
+    for _ in range(times):
+        state.update("counter", lambda current: ((current or 0) + 1, None))
+
+def test_sqlite_update_is_atomic_across_processes(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    SqliteState(path)
+    # spawn, como workers do uvicorn: nada de conexões herdadas via fork
+    with ProcessPoolExecutor(max_workers=4, mp_context=multiprocessing.get_context("spawn")) as pool:
+        list(pool.map(_increment, [path] * 4, [200] * 4))
+    assert SqliteState(path).get("counter") == 800
+
+def test_expired_entries_are_ignored(tmp_path):
+    for state in (MemoryState(), SqliteState(str(tmp_path / "state.sqlite"))):
+        state.set("models", ["a"], ttl=-1)
+        state.set("plan", {"tasks": []}, ttl=60)
+        assert state.get("models") is None
+        assert state.get("plan") == {"tasks": []}
+
+def test_memory_state_drops_expired_entry_on_read():
+    state = MemoryState()
+    state.set("models", ["a"], ttl=-1)
+    assert state.get("models") is None
+    assert "models" not in state._data
+    assert state.update("models", lambda current: (current or ["b"], current)) is None
+    assert state.get("models") == ["b"]
+
+def _rows(path):
+    return sqlite3.connect(path).execute("SELECT key FROM shared_state ORDER BY key").fetchall()
+
+def test_expired_entries_are_purged_every_n_writes(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    memory, sqlite = MemoryState(purge_every=3), SqliteState(path, purge_every=3)
+    for state in (memory, sqlite):
+        state.set("old:1", 1, ttl=-1)
+        state.set("old:2", 2, ttl=-1)
+    assert len(memory._data) == 2 and len(_rows(path)) == 2
+
+    for state in (memory, sqlite):
+        state.update("counter", lambda current: ((current or 0) + 1, None))  # terceira escrita
+    assert list(memory._data) == ["counter"]
+    assert _rows(path) == [("counter",)]
+
+def test_unchanged_update_is_not_counted_as_write(tmp_path):
+    state = SqliteState(str(tmp_path / "state.sqlite"), purge_every=2)
+    state.set("old", 1, ttl=-1)
+    state.update("missing", lambda current: (current, None))
+    assert state.purge_expired() == 1
+
+def test_token_bucket_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+    first, second = SqliteState(path), SqliteState(path)
+    assert take_token(first, "gemini", per_minute=60, burst=2) == 0
+    assert take_token(second, "gemini", per_minute=60, burst=2) == 0
+    wait = take_token(first, "gemini", per_minute=60, burst=2)
+    assert 0 < wait <= 1
+
+def test_model_list_is_fetched_once_per_shared_state(tmp_path):
+    state = SqliteState(str(tmp_path / "state.sqlite"))
+    listed = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        listed.append(request.url.path)
+        return httpx.Response(200, json={"models": [
+            {"name": "models/gemini-1.5-flash", "supportedGenerationMethods": ["generateContent"]}
+        ]})
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            # um cliente por requisição, como em get_service
+            return [await GeminiClient(http, state)._list_models() for _ in range(3)]
+
+    assert asyncio.run(go()) == [["gemini-1.5-flash"]] * 3
+    assert listed == ["/v1beta/models"]
+
+def test_validated_plan_is_served_from_shared_cache(tmp_path):
+    state = SqliteState(str(tmp_path / "state.sqlite"))
+    fake = FakeGemini([(200, json.dumps(PLAN), "STOP")])
+    payload = GenerateGoalPayload(
+        goalId="g1",
+        goal={"title": "Aprender", "importance_level": 3, "effort_estimated": 2},
+        targetDate=date.today() + timedelta(days=30),
+    )
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(fake)) as http:
+            service = GoalBreakdownService(GeminiClient(http, state), repository=None, state=state)
+            return await service._build_plan(payload), await service._build_plan(payload)
+
+    first, second = asyncio.run(go())
+    assert first == second
+    assert len(fake.requests) == 1
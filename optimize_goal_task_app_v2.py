@@ -6,17 +6,7 @@ VERSÃO COM RETRY AUTOMÁTICO E RATE LIMIT HANDLING
 import sys
 sys.path.append('G:/claude')
 
-# Importar a versão com retry
-from workflow_autogen_with_retry import SimpleWorkflow
-
-def main():
-    # Inicializar com retry e delay configurados
-    workflow = SimpleWorkflow(
-        retry_attempts=3,        # 3 tentativas em caso de rate limit
-        delay_between_phases=15  # 15 segundos entre cada fase
-    )
-
-    user_request = """
+USER_REQUEST = """
     Analisar e otimizar o aplicativo Goal Task Manager (React + TypeScript + Vite + Supabase).
 
     CONTEXTO DA APLICAÇÃO:
@@ -121,13 +111,22 @@ def main():
     5. Code quality (médio)
     """
 
+def main():
+    from workflow_autogen_with_retry import SimpleWorkflow
+
+    # Inicializar com retry e delay configurados
+    workflow = SimpleWorkflow(
+        retry_attempts=3,        # 3 tentativas em caso de rate limit
+        delay_between_phases=15  # 15 segundos entre cada fase
+    )
+
     print("\n" + "="*80)
     print("EXECUTANDO WORKFLOW DE OTIMIZAÇÃO - GOAL TASK MANAGER")
     print("COM RETRY AUTOMÁTICO E RATE LIMIT HANDLING")
     print("="*80 + "\n")
 
     # Executar workflow completo com retry automático
-    results = workflow.run(user_request, save_plan=True)
+    results = workflow.run(USER_REQUEST, save_plan=True)
 
     if results:
         workflow.save_results(results)
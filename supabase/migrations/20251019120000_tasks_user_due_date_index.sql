@@ -0,0 +1,5 @@
+-- Index for the backend agenda (GET /agenda): a user's tasks in a due_date window,
+-- paginated by (due_date, id). Keeps the query a range scan bounded by the window,
+-- regardless of how many tasks the user has accumulated.
+CREATE INDEX IF NOT EXISTS tasks_user_id_due_date_idx
+  ON public.tasks (user_id, due_date, id);
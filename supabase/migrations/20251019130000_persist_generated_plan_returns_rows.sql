@@ -0,0 +1,47 @@
+-- persist_generated_plan: inserts a generated plan in a single transaction and returns
+-- the rows it inserted (with their ids), so the backend can answer include_plan=true
+-- without re-reading the goal, and without mixing in rows from earlier plans.
+DROP FUNCTION IF EXISTS public.persist_generated_plan(uuid, uuid, jsonb, jsonb);
+
+CREATE FUNCTION public.persist_generated_plan(goal_id uuid, user_id uuid, milestones jsonb, tasks jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  inserted_milestones jsonb;
+  inserted_tasks jsonb;
+BEGIN
+  WITH inserted AS (
+    INSERT INTO public.milestones (goal_id, user_id, title, description, order_sequence)
+    SELECT persist_generated_plan.goal_id, persist_generated_plan.user_id, m.title, m.description, m.order_sequence
+    FROM jsonb_to_recordset(persist_generated_plan.milestones) AS m(title text, description text, order_sequence integer)
+    RETURNING id, title, description, order_sequence, status
+  )
+  SELECT coalesce(jsonb_agg(to_jsonb(inserted) ORDER BY inserted.order_sequence), '[]'::jsonb)
+  INTO inserted_milestones FROM inserted;
+
+  WITH inserted AS (
+    INSERT INTO public.tasks (
+      goal_id, user_id, title, description, priority, estimated_duration, due_date,
+      prerequisites, order_sequence, is_ai_generated
+    )
+    SELECT persist_generated_plan.goal_id, persist_generated_plan.user_id, t.title, t.description, t.priority,
+           t.estimated_duration, t.due_date, t.prerequisites, t.order_sequence, true
+    FROM jsonb_to_recordset(persist_generated_plan.tasks) AS t(
+      title text, description text, priority text, estimated_duration integer, due_date date,
+      prerequisites text[], order_sequence integer
+    )
+    RETURNING id, title, description, priority, estimated_duration, due_date, prerequisites, order_sequence, status
+  )
+  SELECT coalesce(jsonb_agg(to_jsonb(inserted) ORDER BY inserted.order_sequence), '[]'::jsonb)
+  INTO inserted_tasks FROM inserted;
+
+  RETURN jsonb_build_object(
+    'milestones_inserted', jsonb_array_length(inserted_milestones),
+    'tasks_inserted', jsonb_array_length(inserted_tasks),
+    'milestones', inserted_milestones,
+    'tasks', inserted_tasks
+  );
+END;
+$$;
@@ -0,0 +1,85 @@
+-- apply_plan_diff: applies a re-plan diff (deletes, updates and inserts of milestones and
+-- tasks) in a single transaction, so a failure or timeout never leaves a goal half re-planned.
+-- Rows the user completed, started or skipped in the meantime are neither updated nor deleted.
+CREATE OR REPLACE FUNCTION public.apply_plan_diff(
+  goal_id uuid,
+  user_id uuid,
+  milestone_inserts jsonb,
+  milestone_updates jsonb,
+  milestone_deletes uuid[],
+  task_inserts jsonb,
+  task_updates jsonb,
+  task_deletes uuid[]
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  milestones_deleted integer;
+  milestones_updated integer;
+  milestones_inserted integer;
+  tasks_deleted integer;
+  tasks_updated integer;
+  tasks_inserted integer;
+BEGIN
+  DELETE FROM public.milestones m
+  WHERE m.id = ANY (apply_plan_diff.milestone_deletes)
+    AND m.goal_id = apply_plan_diff.goal_id
+    AND coalesce(m.status, 'pending') NOT IN ('completed', 'in_progress', 'skipped');
+  GET DIAGNOSTICS milestones_deleted = ROW_COUNT;
+
+  UPDATE public.milestones m
+  SET title = u.title, description = u.description, order_sequence = u.order_sequence, updated_at = now()
+  FROM jsonb_to_recordset(apply_plan_diff.milestone_updates) AS u(id uuid, title text, description text, order_sequence integer)
+  WHERE m.id = u.id
+    AND m.goal_id = apply_plan_diff.goal_id
+    AND coalesce(m.status, 'pending') NOT IN ('completed', 'in_progress', 'skipped');
+  GET DIAGNOSTICS milestones_updated = ROW_COUNT;
+
+  INSERT INTO public.milestones (goal_id, user_id, title, description, order_sequence)
+  SELECT apply_plan_diff.goal_id, apply_plan_diff.user_id, m.title, m.description, m.order_sequence
+  FROM jsonb_to_recordset(apply_plan_diff.milestone_inserts) AS m(title text, description text, order_sequence integer);
+  GET DIAGNOSTICS milestones_inserted = ROW_COUNT;
+
+  DELETE FROM public.tasks t
+  WHERE t.id = ANY (apply_plan_diff.task_deletes)
+    AND t.goal_id = apply_plan_diff.goal_id
+    AND coalesce(t.status, 'pending') NOT IN ('completed', 'in_progress', 'skipped');
+  GET DIAGNOSTICS tasks_deleted = ROW_COUNT;
+
+  UPDATE public.tasks t
+  SET title = u.title, description = u.description, priority = u.priority,
+      estimated_duration = u.estimated_duration, due_date = u.due_date,
+      prerequisites = u.prerequisites, order_sequence = u.order_sequence, updated_at = now()
+  FROM jsonb_to_recordset(apply_plan_diff.task_updates) AS u(
+    id uuid, title text, description text, priority text, estimated_duration integer, due_date date,
+    prerequisites text[], order_sequence integer
+  )
+  WHERE t.id = u.id
+    AND t.goal_id = apply_plan_diff.goal_id
+    AND coalesce(t.status, 'pending') NOT IN ('completed', 'in_progress', 'skipped');
+  GET DIAGNOSTICS tasks_updated = ROW_COUNT;
+
+  INSERT INTO public.tasks (
+    goal_id, user_id, title, description, priority, estimated_duration, due_date,
+    prerequisites, order_sequence, is_ai_generated
+  )
+  SELECT apply_plan_diff.goal_id, apply_plan_diff.user_id, t.title, t.description, t.priority,
+         t.estimated_duration, t.due_date, t.prerequisites, t.order_sequence, true
+  FROM jsonb_to_recordset(apply_plan_diff.task_inserts) AS t(
+    title text, description text, priority text, estimated_duration integer, due_date date,
+    prerequisites text[], order_sequence integer
+  );
+  GET DIAGNOSTICS tasks_inserted = ROW_COUNT;
+
+  RETURN jsonb_build_object(
+    'milestones_deleted', milestones_deleted,
+    'milestones_updated', milestones_updated,
+    'milestones_inserted', milestones_inserted,
+    'tasks_deleted', tasks_deleted,
+    'tasks_updated', tasks_updated,
+    'tasks_inserted', tasks_inserted
+  );
+END;
+$$;
@@ -0,0 +1,81 @@
+import pytest
+from workflow_cache import CacheFases, ExecutorComCache, chave_fase
+from workflow_context import MontadorContexto
+from workflow_gemini import ExecutorGemini
+
+FASE = {"fase": 2, "nome": "Revisão", "agente": "revisor", "tarefa": "Revisar o código", "output_esperado": "lista"}
+
+class ExecutorFalso(ExecutorGemini):
+    """ExecutorGemini sem rede: devolve um texto por chamada e guarda os prompts enviados."""
+
+    def __init__(self, **kwargs):
+        super().__init__("Solicitação original", api_key="chave", **kwargs)
+        self.prompts = []
+
+    def executar(self, fase, prompt):
+        self.prompts.append(prompt)
+        self.metricas[fase["fase"]] = {"tentativas": 1}
+        return f"resultado {len(self.prompts)}"
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheFases(tmp_path / "cache.sqlite")
+
+def test_miss_then_hit(cache):
+    assert cache.obter("a") is None
+    cache.gravar("a", "revisor", "texto")
+    assert cache.obter("a") == "texto"
+    assert cache.estatisticas() == {"acertos": 1, "falhas": 1, "taxa_acerto": 0.5, "entradas": 1, "tamanho_bytes": 5}
+
+def test_evicts_least_recently_used_over_size_limit(tmp_path):
+    cache = CacheFases(tmp_path / "cache.sqlite", tamanho_maximo=10)
+    cache.gravar("a", "x", "aaaa")
+    cache.gravar("b", "x", "bbbb")
+    cache.obter("a")  # "b" passa a ser a menos usada
+    cache.gravar("c", "x", "cccc")
+
+    assert cache.obter("b") is None
+    assert cache.obter("a") == "aaaa" and cache.obter("c") == "cccc"
+    assert cache.estatisticas()["tamanho_bytes"] == 8
+
+def test_entry_larger_than_limit_is_not_kept(tmp_path):
+    cache = CacheFases(tmp_path / "cache.sqlite", tamanho_maximo=3)
+    cache.gravar("a", "x", "ção")  # 5 bytes em UTF-8
+    assert cache.estatisticas()["entradas"] == 0
+
+def test_cache_survives_reopening(tmp_path):
+    CacheFases(tmp_path / "cache.sqlite").gravar("a", "x", "texto")
+    assert CacheFases(tmp_path / "cache.sqlite").obter("a") == "texto"
+
+def test_key_depends_on_prompt_and_model():
+    assert chave_fase("p", "m") == chave_fase("p", "m")
+    assert len({chave_fase("p", "m"), chave_fase("p2", "m"), chave_fase("p", "m2")}) == 3
+
+def test_executor_reuses_cached_result(cache):
+    executor = ExecutorComCache(ExecutorFalso(), cache)
+    assert executor(FASE, {1: "entrada"}) == "resultado 1"
+    assert executor(FASE, {1: "entrada"}) == "resultado 1"
+    assert executor(FASE, {1: "outra entrada"}) == "resultado 2"
+    assert executor.metricas[2] == {"tentativas": 1, "cache": False}
+
+    executor(FASE, {1: "entrada"})
+    assert executor.metricas[2] == {"cache": True}
+
+def test_force_refresh_calls_model_and_overwrites(cache):
+    ExecutorComCache(ExecutorFalso(), cache)(FASE, {})
+    executor = ExecutorComCache(ExecutorFalso(), cache, forcar_atualizacao=True)
+    executor.executor.prompts.append("anterior")
+    assert executor(FASE, {}) == "resultado 2"
+    assert ExecutorComCache(ExecutorFalso(), cache)(FASE, {}) == "resultado 2"
+
+def test_context_budget_changes_the_key(cache):
+    entradas = {1: "\n".join(f"linha {i} " + "x" * 60 for i in range(200))}
+    completo = ExecutorComCache(ExecutorFalso(), cache)
+    cortado = ExecutorComCache(ExecutorFalso(montador=MontadorContexto(orcamento_tokens=500)), cache)
+
+    completo(FASE, entradas)
+    cortado(FASE, entradas)
+
+    assert cortado.metricas[2]["cache"] is False
+    assert len(cortado.executor.prompts[0]) < len(completo.executor.prompts[0])
+    assert cache.estatisticas()["entradas"] == 2
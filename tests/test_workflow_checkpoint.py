@@ -0,0 +1,57 @@
+import json
+import yaml
+from workflow_checkpoint import Checkpoint, fases_para_retomar
+
+DAG = {1: set(), 2: {1}, 3: {2}, 4: set(), 5: {4}}
+
+def escrever_plano(tmp_path):
+    caminho = tmp_path / "workflow_plan_teste.yaml"
+    fases = [{"fase": n, "nome": f"Fase {n}", "agente": "agente", "dependencias": sorted(DAG[n])} for n in DAG]
+    caminho.write_text(yaml.safe_dump({"workflow": "teste", "fases": fases}), encoding="utf-8")
+    return caminho
+
+def status_no_plano(caminho):
+    return {f["fase"]: f["status"] for f in yaml.safe_load(caminho.read_text(encoding="utf-8"))["fases"]}
+
+def test_retomar_reruns_pending_phases_and_their_dependents():
+    assert fases_para_retomar(DAG, {1: "r1", 3: "r3", 4: "r4", 5: "r5"}) == {2, 3}
+
+def test_retomar_propagates_transitively():
+    assert fases_para_retomar(DAG, {2: "r2", 3: "r3", 4: "r4", 5: "r5"}) == {1, 2, 3}
+
+def test_retomar_nothing_when_all_completed():
+    assert fases_para_retomar(DAG, {n: "ok" for n in DAG}) == set()
+
+def test_retomar_everything_without_checkpoints():
+    assert fases_para_retomar(DAG, {}) == set(DAG)
+
+def test_registrar_writes_json_and_plan_status(tmp_path):
+    plano = escrever_plano(tmp_path)
+    checkpoint = Checkpoint(plano)
+    checkpoint.registrar(1, "completed", "resultado 1", {"duracao_s": 1.2})
+    checkpoint.registrar(2, "failed", "[ERRO] Fase 2: x")
+
+    gravado = json.loads(plano.with_suffix(".checkpoint.json").read_text(encoding="utf-8"))
+    assert gravado["plano"] == plano.name
+    assert gravado["fases"]["1"]["resultado"] == "resultado 1"
+    assert status_no_plano(plano) == {1: "completed", 2: "failed", 3: "pending", 4: "pending", 5: "pending"}
+    assert yaml.safe_load(plano.read_text(encoding="utf-8"))["fases"][0]["metricas"] == {"duracao_s": 1.2}
+
+def test_reloaded_checkpoint_returns_only_completed_phases(tmp_path):
+    plano = escrever_plano(tmp_path)
+    checkpoint = Checkpoint(plano)
+    checkpoint.registrar(1, "completed", "resultado 1")
+    checkpoint.registrar(2, "failed", "[ERRO]")
+
+    assert Checkpoint(plano).concluidas() == {1: "resultado 1"}
+
+def test_limpar_discards_checkpoints_and_resets_plan(tmp_path):
+    plano = escrever_plano(tmp_path)
+    checkpoint = Checkpoint(plano)
+    checkpoint.registrar(1, "completed", "resultado 1", {"duracao_s": 1.2})
+    checkpoint.limpar()
+
+    assert not plano.with_suffix(".checkpoint.json").exists()
+    assert Checkpoint(plano).concluidas() == {}
+    assert set(status_no_plano(plano).values()) == {"pending"}
+    assert "metricas" not in yaml.safe_load(plano.read_text(encoding="utf-8"))["fases"][0]
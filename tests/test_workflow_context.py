@@ -0,0 +1,79 @@
+from workflow_context import (
+    MARCADOR_CORTE, MontadorContexto, dividir_solicitacao, estimar_tokens, resumir, solicitacao_para_fase,
+)
+
+SOLICITACAO = """Otimizar o Goal Task Manager.
+
+CONTEXTO:
+- React + Supabase
+
+1. AUTENTICAÇÃO E AUTORIZAÇÃO (security_auditor):
+   - Revisar políticas RLS e tokens JWT
+
+2. PERFORMANCE DO DASHBOARD (performance_engineer):
+   - Medir renderizações do dashboard e consultas lentas
+
+3. ACESSIBILIDADE (ui_designer):
+   - Contraste e rótulos dos botões
+"""
+
+FASE = {"fase": 3, "nome": "Performance do dashboard", "agente": "performance_engineer",
+        "tarefa": "Medir renderizações e consultas lentas do dashboard"}
+
+def test_estimar_tokens_rounds_up():
+    assert [estimar_tokens(t) for t in ("", "abc", "abcd", "abcde")] == [0, 1, 1, 2]
+
+def test_dividir_solicitacao_separates_preamble_and_sections():
+    preambulo, secoes = dividir_solicitacao(SOLICITACAO)
+    assert preambulo.startswith("Otimizar") and "1." not in preambulo
+    assert [s.strip().split("\n")[0][:2] for s in secoes] == ["1.", "2.", "3."]
+    assert dividir_solicitacao("sem seções") == ("sem seções", [])
+
+def test_solicitacao_para_fase_keeps_matching_sections_only():
+    recorte = solicitacao_para_fase(FASE, SOLICITACAO)
+    assert "CONTEXTO" in recorte
+    assert "PERFORMANCE DO DASHBOARD" in recorte
+    assert "ACESSIBILIDADE" not in recorte and "RLS" not in recorte
+
+def test_solicitacao_para_fase_without_overlap_keeps_preamble():
+    fase = {"nome": "xyz", "tarefa": "qwerty", "agente": "abc"}
+    assert solicitacao_para_fase(fase, SOLICITACAO) == dividir_solicitacao(SOLICITACAO)[0]
+
+def test_resumir_returns_short_text_unchanged():
+    assert resumir("curto", 10) == "curto"
+
+def test_resumir_keeps_headings_and_bullets_first():
+    texto = "\n".join(["# Achados"] + [f"parágrafo corrido {i} " + "x" * 80 for i in range(30)]
+                      + ["- item importante", "1. passo numerado"])
+    resumo = resumir(texto, 60)
+
+    assert estimar_tokens(resumo) <= 60
+    assert "# Achados" in resumo and "- item importante" in resumo and "1. passo numerado" in resumo
+    assert MARCADOR_CORTE in resumo
+    assert resumo.index("# Achados") < resumo.index("- item importante")  # ordem original
+
+def test_resumir_respects_ceiling_with_many_gaps():
+    texto = "\n".join(("- tópico " if i % 2 else "corpo ") + "y" * 30 for i in range(400))
+    assert len(resumir(texto, 100)) <= 100 * 4
+
+def test_montador_fits_budget_and_reports_savings():
+    montador = MontadorContexto(orcamento_tokens=400)
+    entradas = {1: "resultado da fase 1 " * 300, 2: "- achado\n" * 500}
+
+    prompt = montador.montar(FASE, SOLICITACAO, entradas)
+
+    assert estimar_tokens(prompt) <= 400 + 50  # cabeçalhos da montagem ficam fora do orçamento
+    assert "### Fase 1" in prompt and "### Fase 2" in prompt
+    relatorio = montador.relatorio()
+    assert relatorio["tokens_enviados"] == estimar_tokens(prompt)
+    assert relatorio["tokens_economizados"] > 0 and 0 < relatorio["economia"] < 1
+
+def test_phase_budget_overrides_default():
+    montador = MontadorContexto(orcamento_tokens=10_000)
+    entradas = {1: "x" * 20_000}
+    grande = montador.montar(FASE, SOLICITACAO, entradas)
+    pequeno = montador.montar({**FASE, "orcamento_tokens": 300}, SOLICITACAO, entradas)
+    assert estimar_tokens(pequeno) < 400 < estimar_tokens(grande)
+
+def test_relatorio_empty():
+    assert MontadorContexto().relatorio()["economia"] == 0.0
@@ -0,0 +1,84 @@
+import threading
+import pytest
+from workflow_dag import caminho_critico, construir_dag, executar_plano, totalizar_metricas
+
+def fase(numero, *dependencias):
+    return {"fase": numero, "nome": f"Fase {numero}", "agente": "agente", "dependencias": list(dependencias)}
+
+PLANO = {"workflow": "teste", "fases": [fase(1), fase(2, 1), fase(3, 1), fase(4, 2, 3), fase(5)]}
+
+def test_construir_dag_maps_dependencies():
+    assert construir_dag(PLANO["fases"]) == {1: set(), 2: {1}, 3: {1}, 4: {2, 3}, 5: set()}
+
+def test_construir_dag_rejects_unknown_dependency():
+    with pytest.raises(ValueError, match="inexistentes: \\[9\\]"):
+        construir_dag([fase(1), fase(2, 9)])
+
+def test_construir_dag_rejects_cycle():
+    with pytest.raises(ValueError, match="Ciclo"):
+        construir_dag([fase(1, 3), fase(2, 1), fase(3, 2)])
+
+def test_caminho_critico_is_the_longest_chain():
+    assert caminho_critico(construir_dag(PLANO["fases"])) == 3
+    assert caminho_critico({}) == 0
+
+def test_totalizar_metricas_sums_numbers_only():
+    assert totalizar_metricas([{"duracao_s": 1.5, "cache": True}, {"duracao_s": 2, "tentativas": 1}]) == {
+        "duracao_s": 3.5, "tentativas": 1,
+    }
+
+def test_executar_plano_passes_dependency_results():
+    recebidas = {}
+
+    def executar(f, entradas):
+        recebidas[f["fase"]] = entradas
+        return f"r{f['fase']}"
+
+    results = executar_plano(PLANO, executar, max_workers=3)
+
+    assert recebidas[4] == {2: "r2", 3: "r3"}
+    assert recebidas[5] == {}
+    assert {k: v["resultado"] for k, v in results["fases"].items()} == {f"fase_{n}": f"r{n}" for n in range(1, 6)}
+
+def test_executar_plano_runs_independent_phases_in_parallel():
+    # 2 e 3 só passam da barreira se estiverem rodando ao mesmo tempo
+    barreira = threading.Barrier(2, timeout=5)
+
+    def executar(f, entradas):
+        if f["fase"] in (2, 3):
+            barreira.wait()
+        return "ok"
+
+    results = executar_plano(PLANO, executar, max_workers=2)
+    assert all(v["resultado"] == "ok" for v in results["fases"].values())
+
+def test_executar_plano_skips_dependents_of_failed_phase():
+    executadas = []
+    concluidas = []
+
+    def executar(f, entradas):
+        executadas.append(f["fase"])
+        if f["fase"] == 2:
+            raise RuntimeError("falhou")
+        return "ok"
+
+    results = executar_plano(PLANO, executar, ao_concluir=lambda n, status, *_: concluidas.append((n, status)))
+
+    assert 4 not in executadas
+    assert results["fases"]["fase_2"]["resultado"] == "[ERRO] Fase 2: falhou"
+    assert results["fases"]["fase_4"]["resultado"].startswith("[ERRO] Fase 4: dependências com erro [2]")
+    assert (2, "failed") in concluidas and (3, "completed") in concluidas
+    assert "metricas" not in results["fases"]["fase_4"]
+
+def test_executar_plano_reuses_completed_phases():
+    executadas = []
+
+    def executar(f, entradas):
+        executadas.append(f["fase"])
+        return f"novo{f['fase']}"
+
+    results = executar_plano(PLANO, executar, concluidas={1: "antigo1", 2: "antigo2"})
+
+    assert sorted(executadas) == [3, 4, 5]
+    assert results["fases"]["fase_1"]["resultado"] == "antigo1"
+    assert results["fases"]["fase_4"]["resultado"] == "novo4"
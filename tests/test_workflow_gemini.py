@@ -0,0 +1,50 @@
+import email.message
+import io
+import urllib.error
+import pytest
+from test_workflow_stream import FASE, evento
+from workflow_gemini import ExecutorGemini, montar_prompt
+from workflow_rate_limit import LimitadorAdaptativo
+
+def erro_http(codigo, retry_after="0"):
+    cabecalhos = email.message.Message()
+    cabecalhos["Retry-After"] = retry_after
+    return urllib.error.HTTPError("http://gemini.test", codigo, "erro", cabecalhos, io.BytesIO(b"{}"))
+
+class ExecutorRoteirizado(ExecutorGemini):
+    """Cada chamada consome a próxima resposta do roteiro: um HTTPError ou as linhas do stream."""
+
+    def __init__(self, roteiro, **kwargs):
+        super().__init__("Solicitação", api_key="chave",
+                         limitador=LimitadorAdaptativo(requisicoes_por_minuto=60_000), **kwargs)
+        self.roteiro = list(roteiro)
+
+    def _abrir_stream(self, prompt):
+        resposta = self.roteiro.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return io.BytesIO(b"".join(resposta))
+
+def test_montar_prompt_lists_dependency_results_in_order():
+    prompt = montar_prompt({**FASE, "output_esperado": "lista"}, "  pedido  ", {3: "c", 1: "a"})
+    assert "SOLICITAÇÃO ORIGINAL:\npedido\n" in prompt
+    assert prompt.index("### Fase 1") < prompt.index("### Fase 3")
+
+def test_retries_after_429_and_503():
+    executor = ExecutorRoteirizado([erro_http(429), erro_http(503), [evento("ok")]])
+    assert executor(FASE, {}) == "ok"
+    assert executor.metricas[4]["tentativas"] == 3
+    assert executor.metricas[4]["respostas_429"] == 1
+
+def test_gives_up_after_max_attempts():
+    executor = ExecutorRoteirizado([erro_http(429)] * 3 + [[evento("tarde demais")]], max_tentativas=3)
+    with pytest.raises(RuntimeError, match="sem cota após 3 tentativas"):
+        executor(FASE, {})
+    assert executor.metricas[4]["tentativas"] == 3
+    assert len(executor.roteiro) == 1
+
+def test_other_http_errors_are_not_retried():
+    executor = ExecutorRoteirizado([erro_http(400), [evento("ok")]])
+    with pytest.raises(urllib.error.HTTPError):
+        executor(FASE, {})
+    assert executor.metricas[4]["tentativas"] == 1
@@ -0,0 +1,72 @@
+import email.utils
+import json
+import time
+import pytest
+from workflow_rate_limit import LimitadorAdaptativo, interpretar_retry_after, limitador_para
+
+def test_retry_after_in_seconds():
+    assert interpretar_retry_after(" 7 ") == 7.0
+
+def test_retry_after_as_http_date():
+    data = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 28 <= interpretar_retry_after(data) <= 30
+
+def test_retry_after_in_the_past_is_zero():
+    assert interpretar_retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)) == 0.0
+
+def test_retry_delay_from_error_body():
+    corpo = json.dumps({"error": {"details": [{"@type": "Help"}, {"retryDelay": "12.5s"}]}})
+    assert interpretar_retry_after("não é data", corpo) == 12.5
+
+@pytest.mark.parametrize("corpo", [None, "", "não é json", "[]", json.dumps({"error": {"details": [{"retryDelay": "5m"}]}})])
+def test_retry_after_unknown_is_none(corpo):
+    assert interpretar_retry_after(None, corpo) is None
+
+def test_starts_with_full_bucket():
+    limitador = LimitadorAdaptativo(requisicoes_por_minuto=60, rajada=3)
+    assert [limitador.adquirir() < 0.05 for _ in range(3)] == [True] * 3
+    assert limitador.orcamento()["tokens_disponiveis"] < 1
+
+def test_burst_defaults_to_a_quarter_of_the_rate():
+    assert LimitadorAdaptativo(requisicoes_por_minuto=20).capacidade == 5
+    assert LimitadorAdaptativo(requisicoes_por_minuto=2).capacidade == 1
+
+def test_waits_for_refill_when_empty():
+    limitador = LimitadorAdaptativo(requisicoes_por_minuto=600, rajada=1)  # um token a cada 0,1 s
+    limitador.adquirir()
+    assert 0.05 <= limitador.adquirir() < 0.5
+
+def test_429_halves_rate_and_pauses_bucket():
+    limitador = LimitadorAdaptativo(requisicoes_por_minuto=600, rajada=4)
+    assert limitador.registrar_429(retry_after=0.2) == 0.2
+    orcamento = limitador.orcamento()
+    assert orcamento["rpm_atual"] == 300
+    assert orcamento["tokens_disponiveis"] == 0
+    # a pausa não acumula cota: depois dela ainda falta um token inteiro (0,2 s a 300 rpm)
+    assert limitador.adquirir() >= 0.35
+
+def test_429_without_retry_after_backs_off_exponentially():
+    limitador = LimitadorAdaptativo(requisicoes_por_minuto=40)
+    assert [limitador.registrar_429() for _ in range(3)] == [2.0, 4.0, 8.0]
+    assert limitador.rpm == 5
+    limitador.registrar_sucesso()
+    assert limitador.registrar_429() == 2.0
+
+def test_rate_never_drops_below_one_per_minute():
+    limitador = LimitadorAdaptativo(requisicoes_por_minuto=4)
+    for _ in range(5):
+        limitador.registrar_429(retry_after=0)
+    assert limitador.rpm == 1.0
+
+def test_success_increases_rate_additively_up_to_maximum():
+    limitador = LimitadorAdaptativo(requisicoes_por_minuto=100)
+    limitador.registrar_429(retry_after=0)
+    limitador.registrar_sucesso()
+    assert limitador.rpm == pytest.approx(55)
+    for _ in range(20):
+        limitador.registrar_sucesso()
+    assert limitador.rpm == 100
+
+def test_shared_limiter_per_provider():
+    assert limitador_para("gemini") is limitador_para("gemini")
+    assert limitador_para("gemini").rpm_maximo == 15
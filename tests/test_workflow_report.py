@@ -0,0 +1,38 @@
+import pytest
+from workflow_report import main, tokens
+from workflow_store import ArmazemResultados
+
+@pytest.fixture
+def db(tmp_path):
+    caminho = str(tmp_path / "runs.sqlite")
+    armazem = ArmazemResultados(caminho)
+    for duracao in (10.0, 30.0):
+        execucao = armazem.iniciar_execucao({"workflow": "Segurança"})
+        armazem.gravar_fase(execucao, {"fase": 1, "nome": "Auth", "agente": "auditor"}, "completed", "ok",
+                            {"duracao_s": duracao, "tokens_entrada": 100, "tokens_saida": 50, "respostas_429": 2})
+        armazem.gravar_fase(execucao, {"fase": 2, "nome": "Banco", "agente": "dba"}, "completed", "ok",
+                            {"duracao_s": 1.0, "cache": True})
+    return caminho
+
+def test_tokens_sums_input_and_output():
+    assert tokens({"tokens_entrada": 3, "tokens_saida": 4}) == 7
+    assert tokens({}) == 0
+
+def test_report_ranks_and_compares_runs(db, capsys):
+    main(["--db", db, "--top", "1"])
+    saida = capsys.readouterr().out
+
+    lentas = saida.split("Fases mais lentas:")[1].split("\n\n")[0]
+    assert "30.0s  execução 2" in lentas and "execução 1" not in lentas
+    assert "auditor" in saida and "dba" in saida
+    assert "Comparação entre execuções" in saida
+    assert "#1: 10.0/150  #2: 30.0/150" in saida
+
+def test_report_filters_runs(db, capsys):
+    main(["--db", db, "--execucoes", "1"])
+    saida = capsys.readouterr().out
+    assert "Comparação entre execuções" not in saida
+
+def test_report_without_metrics(tmp_path, capsys):
+    main(["--db", str(tmp_path / "vazio.sqlite")])
+    assert capsys.readouterr().out == "Nenhuma fase com métricas registradas.\n"
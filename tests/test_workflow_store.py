@@ -0,0 +1,100 @@
+import json
+import pytest
+from workflow_store import ArmazemResultados, trecho
+
+PLANO = {"workflow": "Segurança", "objetivo": "Auditar o app"}
+
+def fase(numero, nome, agente="auditor"):
+    return {"fase": numero, "nome": nome, "agente": agente}
+
+@pytest.fixture
+def armazem(tmp_path):
+    return ArmazemResultados(str(tmp_path / "runs.sqlite"))
+
+def test_phases_round_trip_compressed(armazem):
+    execucao = armazem.iniciar_execucao(PLANO, "plano.yaml")
+    texto = "Políticas RLS ausentes na tabela tasks.\n" * 50
+    armazem.gravar_fase(execucao, fase(2, "Banco"), "completed", texto, {"duracao_s": 3.0})
+    armazem.gravar_fase(execucao, fase(1, "Auth"), "failed", "[ERRO] Fase 1: x")
+
+    assert armazem.resultado_fase(execucao, 2) == texto
+    assert armazem.resultado_fase(execucao, 9) is None
+    assert [linha[:4] for linha in armazem.fases_da_execucao(execucao)] == [
+        (1, "Auth", "auditor", "failed"), (2, "Banco", "auditor", "completed"),
+    ]
+    tamanho_gravado = armazem._db.execute("SELECT length(resultado) FROM fases WHERE fase = 2").fetchone()[0]
+    assert tamanho_gravado < len(texto) / 10
+
+def test_listar_counts_completed_phases(armazem):
+    primeira = armazem.iniciar_execucao(PLANO)
+    armazem.gravar_fase(primeira, fase(1, "Auth"), "completed", "ok")
+    armazem.gravar_fase(primeira, fase(2, "Banco"), "failed", "[ERRO]")
+    armazem.concluir_execucao(primeira, {"duracao_s": 5})
+    segunda = armazem.iniciar_execucao(PLANO)
+
+    linhas = armazem.listar_execucoes()
+    assert [(l[0], l[4], l[5]) for l in linhas] == [(segunda, 0, None), (primeira, 2, 1)]
+    assert linhas[0][3] is None and linhas[1][3] is not None
+
+def test_search_matches_without_accents(armazem):
+    execucao = armazem.iniciar_execucao(PLANO)
+    armazem.gravar_fase(execucao, fase(1, "Autenticação"), "completed", "Tokens JWT expiram em uma hora.")
+    armazem.gravar_fase(execucao, fase(2, "Banco"), "completed", "Faltam políticas RLS. " + "texto " * 100 + "RLS")
+    armazem.gravar_fase(execucao, fase(3, "UI"), "completed", "Botões sem rótulo acessível.")
+
+    assert [(e, f) for e, f, _, _ in armazem.buscar("politicas")] == [(execucao, 2)]
+    assert sorted(f for _, f, _, _ in armazem.buscar("autenticacao OR rotulo")) == [1, 3]
+    assert armazem.buscar('"RLS policies"') == []
+    assert armazem.buscar("JWT", limite=0) == []
+
+def test_search_accepts_text_that_is_not_fts5_syntax(armazem):
+    execucao = armazem.iniciar_execucao(PLANO)
+    armazem.gravar_fase(execucao, fase(1, "Banco"), "completed", "Faltam RLS policies na tabela tasks.")
+
+    assert [(e, f) for e, f, _, _ in armazem.buscar("RLS-policies")] == [(execucao, 1)]
+    assert [f for _, f, _, _ in armazem.buscar('tasks: "tabela')] == [1]
+
+def test_search_returns_snippet_around_match(armazem):
+    execucao = armazem.iniciar_execucao(PLANO)
+    texto = "introdução " * 100 + "a chave service_role vazou\nno bundle"
+    armazem.gravar_fase(execucao, fase(1, "Segredos"), "completed", texto)
+
+    (_, _, nome, achado), = armazem.buscar("vazou")
+    assert nome == "Segredos"
+    assert "service_role vazou no bundle" in achado
+    assert len(achado) <= 160
+
+def test_trecho_falls_back_to_start():
+    assert trecho("abc def", "xyz") == "abc def"
+
+def test_metricas_das_fases_filters_runs(armazem):
+    a = armazem.iniciar_execucao(PLANO)
+    b = armazem.iniciar_execucao(PLANO)
+    armazem.gravar_fase(a, fase(1, "Auth"), "completed", "ok", {"duracao_s": 1})
+    armazem.gravar_fase(b, fase(1, "Auth"), "completed", "ok", {"duracao_s": 2})
+    armazem.gravar_fase(b, fase(2, "Banco"), "completed", "ok")
+
+    assert armazem.metricas_das_fases() == [
+        (a, "Segurança", 1, "Auth", "auditor", "completed", {"duracao_s": 1}),
+        (b, "Segurança", 1, "Auth", "auditor", "completed", {"duracao_s": 2}),
+    ]
+    assert [linha[0] for linha in armazem.metricas_das_fases([b])] == [b]
+
+def test_importar_json(armazem, tmp_path):
+    caminho = tmp_path / "antigo.json"
+    caminho.write_text(json.dumps({
+        "workflow": "Segurança",
+        "timestamp": "2025-10-01T16:50:24",
+        "fases": {
+            "fase_1": {"nome": "Auth", "agente": "auditor", "resultado": "ok", "metricas": {"duracao_s": 1}},
+            "fase_2": {"nome": "Banco", "agente": "dba", "resultado": "[ERRO] Fase 2: 429"},
+        },
+        "metricas": {"duracao_s": 1},
+    }), encoding="utf-8")
+
+    execucao = armazem.importar_json(caminho)
+
+    assert [linha[:4] for linha in armazem.fases_da_execucao(execucao)] == [
+        (1, "Auth", "auditor", "completed"), (2, "Banco", "dba", "failed"),
+    ]
+    assert armazem.listar_execucoes()[0][2] == "2025-10-01T16:50:24"
@@ -0,0 +1,57 @@
+import io
+import json
+import pytest
+from workflow_gemini import ExecutorGemini
+from workflow_rate_limit import LimitadorAdaptativo
+from workflow_stream import SaidaStreaming
+
+FASE = {"fase": 4, "nome": "Dashboard", "agente": "frontend", "tarefa": "Revisar"}
+
+def evento(texto, uso=None):
+    dados = {"candidates": [{"content": {"parts": [{"text": texto}]}}]}
+    if uso:
+        dados["usageMetadata"] = uso
+    return b"data: " + json.dumps(dados).encode("utf-8") + b"\n"
+
+class ExecutorStream(ExecutorGemini):
+    def __init__(self, linhas, **kwargs):
+        super().__init__("Solicitação", api_key="chave", limitador=LimitadorAdaptativo(requisicoes_por_minuto=600), **kwargs)
+        self.linhas = linhas
+
+    def _abrir_stream(self, prompt):
+        return io.BytesIO(b"".join(self.linhas))
+
+def test_writer_appends_chunks_and_prints_complete_lines(tmp_path, capsys):
+    escritor = SaidaStreaming(tmp_path / "saida" / "run").abrir(FASE)
+    escritor.escrever("primeira li")
+    assert capsys.readouterr().out == ""
+    escritor.escrever("nha\nsegunda")
+    assert capsys.readouterr().out == "[FASE 4] primeira linha\n"
+    escritor.fechar()
+    assert capsys.readouterr().out == "[FASE 4] segunda\n"
+
+    conteudo = (tmp_path / "saida" / "run_fase_4.txt").read_text(encoding="utf-8")
+    assert conteudo.startswith("Fase: Dashboard\nAgente: frontend\n")
+    assert conteudo.endswith("primeira linha\nsegunda")
+
+def test_partial_text_stays_on_disk_before_close(tmp_path):
+    escritor = SaidaStreaming(tmp_path / "run", console=False).abrir(FASE)
+    escritor.escrever("parcial")
+    assert (tmp_path / "run_fase_4.txt").read_text(encoding="utf-8").endswith("parcial")
+    escritor.fechar(erro=KeyboardInterrupt())
+    assert (tmp_path / "run_fase_4.txt").read_text(encoding="utf-8").endswith("parcial\n\n[INTERROMPIDO] KeyboardInterrupt: \n")
+
+def test_executor_streams_chunks_and_records_tokens(tmp_path, capsys):
+    linhas = [b": keep-alive\n", evento("Olá, "), evento("mundo\n", {"promptTokenCount": 12, "candidatesTokenCount": 3})]
+    executor = ExecutorStream(linhas, saida=SaidaStreaming(tmp_path / "run"))
+
+    assert executor(FASE, {}) == "Olá, mundo\n"
+    assert capsys.readouterr().out == "[FASE 4] Olá, mundo\n"
+    assert (tmp_path / "run_fase_4.txt").read_text(encoding="utf-8").endswith("Olá, mundo\n")
+    assert executor.metricas[4]["tokens_entrada"] == 12 and executor.metricas[4]["tokens_saida"] == 3
+
+def test_executor_marks_file_when_response_is_empty(tmp_path):
+    executor = ExecutorStream([evento("")], saida=SaidaStreaming(tmp_path / "run", console=False))
+    with pytest.raises(RuntimeError, match="resposta vazia"):
+        executor(FASE, {})
+    assert "[INTERROMPIDO] RuntimeError: resposta vazia" in (tmp_path / "run_fase_4.txt").read_text(encoding="utf-8")
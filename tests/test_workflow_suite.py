@@ -0,0 +1,63 @@
+import argparse
+import pytest
+from workflow_dag import executar_planos
+from workflow_suite import interpretar_par
+
+def plano(nome, *fases):
+    return {"workflow": nome, "fases": [
+        {"fase": n, "nome": f"{nome} {n}", "agente": "agente", "dependencias": deps} for n, deps in fases
+    ]}
+
+def test_interpretar_par():
+    assert interpretar_par("workflow_2_codigo=plano.yaml") == ("workflow_2_codigo", "plano.yaml")
+
+@pytest.mark.parametrize("texto", ["workflow_2_codigo", "workflow_2_codigo=", "outro=plano.yaml"])
+def test_interpretar_par_rejects_invalid(texto):
+    with pytest.raises(argparse.ArgumentTypeError):
+        interpretar_par(texto)
+
+def test_slots_alternate_between_plans():
+    ordem = []
+
+    def executor(nome):
+        def executar(fase, entradas):
+            ordem.append((nome, fase["fase"]))
+            return "ok"
+        return executar
+
+    execucoes = [
+        {"nome": "a", "plano": plano("a", (1, []), (2, []), (3, [])), "executar_fase": executor("a")},
+        {"nome": "b", "plano": plano("b", (1, []), (2, [])), "executar_fase": executor("b")},
+    ]
+    executar_planos(execucoes, max_workers=1)
+
+    assert ordem == [("a", 1), ("b", 1), ("a", 2), ("b", 2), ("a", 3)]
+
+def test_failure_stays_within_its_plan():
+    def falha(fase, entradas):
+        raise RuntimeError("429")
+
+    execucoes = [
+        {"plano": plano("a", (1, []), (2, [1])), "executar_fase": falha},
+        {"plano": plano("b", (1, []), (2, [1])), "executar_fase": lambda fase, entradas: f"b{fase['fase']}"},
+    ]
+    a, b = executar_planos(execucoes, max_workers=2)
+
+    assert a["fases"]["fase_2"]["resultado"].startswith("[ERRO] Fase 2: dependências com erro")
+    assert b["fases"]["fase_2"]["resultado"] == "b2"
+    assert a["metricas"]["tempo_total_s"] == b["metricas"]["tempo_total_s"]
+
+def test_each_plan_reuses_its_own_completed_phases():
+    executadas = []
+
+    def executar(fase, entradas):
+        executadas.append(fase["nome"])
+        return "novo"
+
+    execucoes = [
+        {"plano": plano("a", (1, []), (2, [1])), "executar_fase": executar, "concluidas": {1: "antigo"}},
+        {"plano": plano("b", (1, []), (2, [1])), "executar_fase": executar},
+    ]
+    executar_planos(execucoes)
+
+    assert sorted(executadas) == ["a 2", "b 1", "b 2"]
@@ -6,15 +6,7 @@ Goal Task Manager - Security Audit
 import sys
 sys.path.append('G:/claude')
 
-from workflow_autogen_with_retry import SimpleWorkflow
-
-def main():
-    workflow = SimpleWorkflow(
-        retry_attempts=3,
-        delay_between_phases=15
-    )
-
-    user_request = """
+USER_REQUEST = """
     ANÁLISE DE SEGURANÇA - GOAL TASK MANAGER
 
     CONTEXTO:
@@ -133,12 +125,20 @@ def main():
     Segurança é fundamental para proteger dados dos usuários.
     """
 
+def main():
+    from workflow_autogen_with_retry import SimpleWorkflow
+
+    workflow = SimpleWorkflow(
+        retry_attempts=3,
+        delay_between_phases=15
+    )
+
     print("\n" + "="*80)
     print("WORKFLOW 1: ANÁLISE E AUDITORIA DE SEGURANÇA")
     print("Goal Task Manager - Security Audit")
     print("="*80 + "\n")
 
-    results = workflow.run(user_request, save_plan=True)
+    results = workflow.run(USER_REQUEST, save_plan=True)
 
     if results:
         workflow.save_results(results)
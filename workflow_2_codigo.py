@@ -6,15 +6,7 @@ Goal Task Manager - Code Quality & Architecture
 import sys
 sys.path.append('G:/claude')
 
-from workflow_autogen_with_retry import SimpleWorkflow
-
-def main():
-    workflow = SimpleWorkflow(
-        retry_attempts=3,
-        delay_between_phases=15
-    )
-
-    user_request = """
+USER_REQUEST = """
     ANÁLISE DE CÓDIGO E ARQUITETURA - GOAL TASK MANAGER
 
     CONTEXTO:
@@ -149,12 +141,20 @@ def main():
     Código limpo facilita evolução e reduz bugs.
     """
 
+def main():
+    from workflow_autogen_with_retry import SimpleWorkflow
+
+    workflow = SimpleWorkflow(
+        retry_attempts=3,
+        delay_between_phases=15
+    )
+
     print("\n" + "="*80)
     print("WORKFLOW 2: QUALIDADE DE CÓDIGO E ARQUITETURA")
     print("Goal Task Manager - Code Quality & Architecture")
     print("="*80 + "\n")
 
-    results = workflow.run(user_request, save_plan=True)
+    results = workflow.run(USER_REQUEST, save_plan=True)
 
     if results:
         workflow.save_results(results)
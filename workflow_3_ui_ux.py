@@ -6,15 +6,7 @@ Goal Task Manager - UI/UX & Accessibility
 import sys
 sys.path.append('G:/claude')
 
-from workflow_autogen_with_retry import SimpleWorkflow
-
-def main():
-    workflow = SimpleWorkflow(
-        retry_attempts=3,
-        delay_between_phases=15
-    )
-
-    user_request = """
+USER_REQUEST = """
     ANÁLISE DE UI/UX E ACESSIBILIDADE - GOAL TASK MANAGER
 
     CONTEXTO:
@@ -142,12 +134,20 @@ def main():
     Aplicativo deve ser utilizável por todos, em qualquer dispositivo.
     """
 
+def main():
+    from workflow_autogen_with_retry import SimpleWorkflow
+
+    workflow = SimpleWorkflow(
+        retry_attempts=3,
+        delay_between_phases=15
+    )
+
     print("\n" + "="*80)
     print("WORKFLOW 3: UI/UX E ACESSIBILIDADE")
     print("Goal Task Manager - UI/UX & Accessibility")
     print("="*80 + "\n")
 
-    results = workflow.run(user_request, save_plan=True)
+    results = workflow.run(USER_REQUEST, save_plan=True)
 
     if results:
         workflow.save_results(results)
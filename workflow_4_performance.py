@@ -6,15 +6,7 @@ Goal Task Manager - Performance Optimization
 import sys
 sys.path.append('G:/claude')
 
-from workflow_autogen_with_retry import SimpleWorkflow
-
-def main():
-    workflow = SimpleWorkflow(
-        retry_attempts=3,
-        delay_between_phases=15
-    )
-
-    user_request = """
+USER_REQUEST = """
     ANÁLISE DE PERFORMANCE - GOAL TASK MANAGER
 
     CONTEXTO:
@@ -160,12 +152,20 @@ def main():
     Performance é feature. Usuários esperam apps rápidos.
     """
 
+def main():
+    from workflow_autogen_with_retry import SimpleWorkflow
+
+    workflow = SimpleWorkflow(
+        retry_attempts=3,
+        delay_between_phases=15
+    )
+
     print("\n" + "="*80)
     print("WORKFLOW 4: PERFORMANCE E OTIMIZAÇÃO")
     print("Goal Task Manager - Performance Optimization")
     print("="*80 + "\n")
 
-    results = workflow.run(user_request, save_plan=True)
+    results = workflow.run(USER_REQUEST, save_plan=True)
 
     if results:
         workflow.save_results(results)
@@ -0,0 +1,106 @@
+"""
+Cache de resultados de fases compartilhado entre execuções e workflows
+A chave é o hash do modelo e do prompt final da fase (agente, tarefa, solicitação e
+resultados das dependências já cortados pelo orçamento de contexto): uma fase idêntica
+em qualquer workflow volta na hora, e mudar o orçamento ou o corte gera outra chave.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+CAMINHO_PADRAO = ".workflow_cache.sqlite"
+TAMANHO_MAXIMO_PADRAO = 200 * 1024 * 1024  # bytes
+
+def chave_fase(prompt, modelo):
+    conteudo = {"modelo": modelo, "prompt": prompt}
+    return hashlib.sha256(json.dumps(conteudo, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+class CacheFases:
+    """Armazena resultados em SQLite e remove os menos usados quando passa de `tamanho_maximo` bytes."""
+
+    def __init__(self, caminho=CAMINHO_PADRAO, tamanho_maximo=TAMANHO_MAXIMO_PADRAO):
+        self.tamanho_maximo = tamanho_maximo
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(caminho, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS resultados ("
+            " chave TEXT PRIMARY KEY, agente TEXT, resultado TEXT NOT NULL,"
+            " tamanho INTEGER NOT NULL, criado_em REAL NOT NULL, acessado_em REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_resultados_acesso ON resultados (acessado_em)")
+        self._db.commit()
+
+    def obter(self, chave):
+        with self._lock:
+            linha = self._db.execute("SELECT resultado FROM resultados WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                self.falhas += 1
+                return None
+            self.acertos += 1
+            self._db.execute("UPDATE resultados SET acessado_em = ? WHERE chave = ?", (time.time(), chave))
+            self._db.commit()
+            return linha[0]
+
+    def gravar(self, chave, agente, resultado):
+        agora = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?, ?)",
+                (chave, agente, resultado, len(resultado.encode("utf-8")), agora, agora),
+            )
+            self._despejar()
+            self._db.commit()
+
+    def _despejar(self):
+        total = self._db.execute("SELECT COALESCE(SUM(tamanho), 0) FROM resultados").fetchone()[0]
+        if total <= self.tamanho_maximo:
+            return
+        removidas = []
+        for chave, tamanho in self._db.execute("SELECT chave, tamanho FROM resultados ORDER BY acessado_em"):
+            if total <= self.tamanho_maximo:
+                break
+            removidas.append((chave,))
+            total -= tamanho
+        self._db.executemany("DELETE FROM resultados WHERE chave = ?", removidas)
+
+    def estatisticas(self):
+        with self._lock:
+            entradas, tamanho = self._db.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM resultados").fetchone()
+        consultas = self.acertos + self.falhas
+        return {
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": round(self.acertos / consultas, 3) if consultas else 0.0,
+            "entradas": entradas,
+            "tamanho_bytes": tamanho,
+        }
+
+class ExecutorComCache:
+    """Envolve um ExecutorGemini: monta o prompt uma vez, consulta o cache e só então chama o LLM."""
+
+    def __init__(self, executor, cache, forcar_atualizacao=False):
+        self.executor = executor
+        self.cache = cache
+        self.forcar_atualizacao = forcar_atualizacao
+        self.metricas = {}
+
+    def __call__(self, fase, entradas):
+        prompt = self.executor.montar(fase, entradas)
+        chave = chave_fase(prompt, self.executor.modelo)
+        if not self.forcar_atualizacao:
+            resultado = self.cache.obter(chave)
+            if resultado is not None:
+                print(f"[CACHE] fase {fase['fase']} reaproveitada")
+                self.metricas[fase["fase"]] = {"cache": True}
+                return resultado
+        try:
+            resultado = self.executor.executar(fase, prompt)
+        finally:
+            self.metricas[fase["fase"]] = {**getattr(self.executor, "metricas", {}).get(fase["fase"], {}), "cache": False}
+        self.cache.gravar(chave, fase["agente"], resultado)
+        return resultado
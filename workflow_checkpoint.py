@@ -0,0 +1,75 @@
+"""
+Checkpoints por fase para retomar workflows interrompidos
+O status e as métricas de cada fase são gravados no próprio workflow_plan_*.yaml (`status`, `metricas`)
+e o resultado vai para um arquivo ao lado (<plano>.checkpoint.json) assim que a fase termina.
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+class Checkpoint:
+    def __init__(self, caminho_plano):
+        self.caminho_plano = Path(caminho_plano)
+        self.caminho = self.caminho_plano.with_suffix(".checkpoint.json")
+        self.fases = {}
+        if self.caminho.exists():
+            with open(self.caminho, encoding="utf-8") as f:
+                self.fases = {int(n): dados for n, dados in json.load(f)["fases"].items()}
+
+    def concluidas(self):
+        """{fase: resultado} das fases já concluídas com sucesso."""
+        return {n: d["resultado"] for n, d in self.fases.items() if d["status"] == "completed"}
+
+    def registrar(self, numero, status, resultado, metricas=None):
+        self.fases[numero] = {
+            "status": status,
+            "resultado": resultado,
+            "metricas": metricas or {},
+            "atualizado_em": datetime.now().isoformat(),
+        }
+        self._gravar_json()
+        self._gravar_status_no_plano()
+
+    def limpar(self):
+        """Descarta checkpoints anteriores e volta todas as fases do plano para `pending`."""
+        self.fases = {}
+        if self.caminho.exists():
+            self.caminho.unlink()
+        self._gravar_status_no_plano()
+
+    def _gravar_json(self):
+        temporario = self.caminho.with_suffix(".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"plano": self.caminho_plano.name, "fases": self.fases}, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho)
+
+    def _gravar_status_no_plano(self):
+        with open(self.caminho_plano, encoding="utf-8") as f:
+            plano = yaml.safe_load(f)
+        for fase in plano["fases"]:
+            registro = self.fases.get(fase["fase"], {})
+            fase["status"] = registro.get("status", "pending")
+            if registro.get("metricas"):
+                fase["metricas"] = registro["metricas"]
+            else:
+                fase.pop("metricas", None)
+        temporario = self.caminho_plano.with_suffix(".yaml.tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            yaml.safe_dump(plano, f, allow_unicode=True)
+        os.replace(temporario, self.caminho_plano)
+
+def fases_para_retomar(dag, concluidas):
+    """Fases não concluídas e todas as que dependem delas, direta ou indiretamente."""
+    refazer = {n for n in dag if n not in concluidas}
+    mudou = True
+    while mudou:
+        mudou = False
+        for numero, deps in dag.items():
+            if numero not in refazer and deps & refazer:
+                refazer.add(numero)
+                mudou = True
+    return refazer
@@ -0,0 +1,109 @@
+"""
+Montagem do contexto de cada fase dentro de um orçamento de tokens
+Em vez da solicitação inteira mais a saída bruta de todas as fases anteriores,
+cada fase recebe o preâmbulo da solicitação, só as seções que tratam da sua tarefa,
+e as saídas das fases de que depende, resumidas até caber no orçamento.
+"""
+
+import re
+import threading
+
+from workflow_gemini import montar_prompt
+
+ORCAMENTO_PADRAO = 6000  # tokens de entrada por fase
+CARACTERES_POR_TOKEN = 4
+MARCADOR_CORTE = "[... trecho omitido para caber no orçamento de contexto ...]"
+
+# seções numeradas da solicitação: "1. AUTENTICAÇÃO E AUTORIZAÇÃO (security_auditor):"
+_SECAO = re.compile(r"^\s{0,8}\d+\.\s+\S", re.MULTILINE)
+_PALAVRA = re.compile(r"\w{4,}")
+
+def estimar_tokens(texto):
+    """Estimativa rápida (~4 caracteres por token), suficiente para orçamento."""
+    return (len(texto) + CARACTERES_POR_TOKEN - 1) // CARACTERES_POR_TOKEN
+
+def _palavras(texto):
+    return {p.lower() for p in _PALAVRA.findall(texto)}
+
+def dividir_solicitacao(user_request):
+    """Separa o preâmbulo (contexto/objetivo) das seções numeradas da solicitação."""
+    inicios = [m.start() for m in _SECAO.finditer(user_request)]
+    if not inicios:
+        return user_request, []
+    secoes = [user_request[a:b] for a, b in zip(inicios, inicios[1:] + [len(user_request)])]
+    return user_request[:inicios[0]], secoes
+
+def solicitacao_para_fase(fase, user_request):
+    """Preâmbulo mais as seções que compartilham vocabulário com a tarefa da fase."""
+    preambulo, secoes = dividir_solicitacao(user_request)
+    if not secoes:
+        return user_request
+    alvo = _palavras(f"{fase['nome']} {fase['tarefa']} {fase['agente']}")
+    pontuadas = [(len(alvo & _palavras(s)) / (len(_palavras(s)) or 1), i) for i, s in enumerate(secoes)]
+    melhor = max(p for p, _ in pontuadas)
+    escolhidas = sorted(i for p, i in pontuadas if melhor and p >= melhor / 2)
+    return preambulo + "".join(secoes[i] for i in escolhidas)
+
+def resumir(texto, tokens):
+    """Corta o texto para ~`tokens`, preservando títulos e tópicos antes do corpo corrido."""
+    if estimar_tokens(texto) <= tokens:
+        return texto
+    limite = tokens * CARACTERES_POR_TOKEN
+    linhas = texto.splitlines()
+    prioridade = [
+        i for i, linha in enumerate(linhas)
+        if linha.lstrip().startswith(("#", "-", "*", "|")) or re.match(r"\s*\d+[.)]\s", linha)
+    ]
+    mantidas, usados = set(), 0
+    for i in prioridade + [i for i in range(len(linhas)) if i not in set(prioridade)]:
+        custo = len(linhas[i]) + 1
+        if usados + custo > limite - len(MARCADOR_CORTE):
+            continue
+        mantidas.add(i)
+        usados += custo
+    saida, anterior = [], -1
+    for i in sorted(mantidas):
+        if i != anterior + 1:
+            saida.append(MARCADOR_CORTE)
+        saida.append(linhas[i])
+        anterior = i
+    if anterior != len(linhas) - 1:
+        saida.append(MARCADOR_CORTE)
+    resumo = "\n".join(saida)
+    # cada lacuna acrescenta um marcador; garante o teto mesmo com muitos cortes
+    if len(resumo) > limite:
+        resumo = resumo[:max(0, limite - len(MARCADOR_CORTE) - 1)] + "\n" + MARCADOR_CORTE
+    return resumo
+
+class MontadorContexto:
+    """Monta prompts dentro do orçamento e contabiliza os tokens economizados na execução."""
+
+    def __init__(self, orcamento_tokens=ORCAMENTO_PADRAO):
+        self.orcamento_tokens = orcamento_tokens
+        self.tokens_originais = 0
+        self.tokens_enviados = 0
+        self._lock = threading.Lock()
+
+    def montar(self, fase, user_request, entradas):
+        orcamento = fase.get("orcamento_tokens", self.orcamento_tokens)
+        solicitacao = resumir(solicitacao_para_fase(fase, user_request), orcamento // 2)
+        restante = max(0, orcamento - estimar_tokens(montar_prompt(fase, solicitacao, {})))
+        por_entrada = restante // len(entradas) if entradas else 0
+        resumidas = {n: resumir(r, por_entrada) for n, r in entradas.items()}
+        prompt = montar_prompt(fase, solicitacao, resumidas)
+
+        original = estimar_tokens(montar_prompt(fase, user_request, entradas))
+        with self._lock:
+            self.tokens_originais += original
+            self.tokens_enviados += estimar_tokens(prompt)
+        return prompt
+
+    def relatorio(self):
+        with self._lock:
+            economizados = self.tokens_originais - self.tokens_enviados
+            return {
+                "tokens_originais": self.tokens_originais,
+                "tokens_enviados": self.tokens_enviados,
+                "tokens_economizados": economizados,
+                "economia": round(economizados / self.tokens_originais, 3) if self.tokens_originais else 0.0,
+            }
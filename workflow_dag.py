@@ -0,0 +1,345 @@
+"""
+Execução paralela de planos de workflow (workflow_plan_*.yaml)
+Monta o DAG a partir das `dependencias` de cada fase e executa em paralelo
+as fases independentes, repassando o resultado de cada fase às dependentes.
+
+Uso:
+    python workflow_dag.py workflow_plan_20251001_165024.yaml --script workflow_1_seguranca --workers 4
+    python workflow_dag.py workflow_plan_20251001_165024.yaml --script workflow_1_seguranca --resume
+"""
+
+import argparse
+import importlib
+import json
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+import yaml
+
+def carregar_plano(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+def construir_dag(fases):
+    """Retorna {fase: conjunto de dependências}, validando referências e ciclos."""
+    dag = {f["fase"]: set(f.get("dependencias") or []) for f in fases}
+    for numero, deps in dag.items():
+        desconhecidas = deps - dag.keys()
+        if desconhecidas:
+            raise ValueError(f"Fase {numero} depende de fases inexistentes: {sorted(desconhecidas)}")
+
+    visitadas, em_pilha = set(), set()
+
+    def visitar(numero):
+        if numero in em_pilha:
+            raise ValueError(f"Ciclo de dependências envolvendo a fase {numero}")
+        if numero in visitadas:
+            return
+        em_pilha.add(numero)
+        for dep in dag[numero]:
+            visitar(dep)
+        em_pilha.discard(numero)
+        visitadas.add(numero)
+
+    for numero in dag:
+        visitar(numero)
+    return dag
+
+def totalizar_metricas(metricas):
+    """Soma as métricas numéricas das fases (tempos, tentativas, 429s, tokens)."""
+    total = {}
+    for m in metricas:
+        for chave, valor in m.items():
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                total[chave] = round(total.get(chave, 0) + valor, 3)
+    return total
+
+def caminho_critico(dag):
+    """Maior número de fases encadeadas (profundidade do DAG)."""
+    profundidade = {}
+
+    def medir(numero):
+        if numero not in profundidade:
+            profundidade[numero] = 1 + max((medir(d) for d in dag[numero]), default=0)
+        return profundidade[numero]
+
+    return max((medir(n) for n in dag), default=0)
+
+def _preparar(execucao, rotular):
+    plano = execucao["plano"]
+    dag = construir_dag(plano["fases"])
+    resultados = dict(execucao.get("concluidas") or {})
+    return {
+        "nome": execucao.get("nome") or plano.get("workflow", ""),
+        "rotulo": f"[{execucao.get('nome') or plano.get('workflow', '')}] " if rotular else "",
+        "plano": plano,
+        "fases": {f["fase"]: f for f in plano["fases"]},
+        "dag": dag,
+        "executar_fase": execucao["executar_fase"],
+        "ao_concluir": execucao.get("ao_concluir"),
+        "resultados": resultados,
+        "falhas": set(),
+        "aguardando": set(dag) - resultados.keys(),
+        "metricas": {},
+    }
+
+def _prontas(estado):
+    return sorted(n for n in estado["aguardando"] if estado["dag"][n] <= estado["resultados"].keys())
+
+def _pular_bloqueadas(estado):
+    """Marca como erro as fases prontas cujas dependências falharam; retorna quantas marcou."""
+    puladas = 0
+    while True:
+        bloqueadas = [n for n in _prontas(estado) if estado["dag"][n] & estado["falhas"]]
+        if not bloqueadas:
+            return puladas
+        for numero in bloqueadas:
+            falhas_deps = sorted(estado["dag"][numero] & estado["falhas"])
+            estado["aguardando"].discard(numero)
+            estado["falhas"].add(numero)
+            estado["resultados"][numero] = f"[ERRO] Fase {numero}: dependências com erro {falhas_deps}"
+            print(f"{estado['rotulo']}[FASE {numero}] pulada (dependências com erro: {falhas_deps})")
+            puladas += 1
+
+def _executar_cronometrado(executar_fase, fase, entradas, submetida_em):
+    """Executa a fase medindo tempo na fila do pool e tempo de execução; não propaga exceções."""
+    inicio = time.monotonic()
+    metricas = {"fila_s": round(inicio - submetida_em, 3)}
+    try:
+        return executar_fase(fase, entradas), None, metricas
+    except Exception as exc:
+        return None, exc, metricas
+    finally:
+        metricas["duracao_s"] = round(time.monotonic() - inicio, 3)
+
+def _montar_results(estado):
+    plano, fases = estado["plano"], estado["fases"]
+    return {
+        "workflow": plano.get("workflow", ""),
+        "objetivo": plano.get("objetivo", ""),
+        "fases": {
+            f"fase_{numero}": {
+                "nome": fases[numero]["nome"],
+                "agente": fases[numero]["agente"],
+                "resultado": estado["resultados"][numero],
+                **({"metricas": estado["metricas"][numero]} if numero in estado["metricas"] else {}),
+            }
+            for numero in sorted(fases)
+        },
+        "metricas": totalizar_metricas(estado["metricas"].values()),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+def executar_planos(execucoes, max_workers=4):
+    """
+    Executa vários planos ao mesmo tempo num único pool de `max_workers`.
+
+    Cada execução é um dict com `plano`, `executar_fase` e, opcionalmente, `nome`,
+    `concluidas` e `ao_concluir` (ver executar_plano). As vagas do pool são
+    distribuídas em rodízio entre os planos que têm fases prontas.
+    """
+    estados = [_preparar(e, rotular=len(execucoes) > 1) for e in execucoes]
+    total = sum(len(e["aguardando"]) for e in estados)
+    feitas, vez = 0, 0
+    em_execucao = {}
+    inicio = time.monotonic()
+
+    for estado in estados:
+        print(f"{estado['rotulo']}[DAG] {len(estado['aguardando'])} de {len(estado['dag'])} fases a executar, "
+              f"caminho crítico de {caminho_critico(estado['dag'])}")
+    print(f"[DAG] até {max_workers} fases em paralelo")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while any(e["aguardando"] for e in estados) or em_execucao:
+            feitas += sum(_pular_bloqueadas(e) for e in estados)
+
+            while len(em_execucao) < max_workers:
+                candidatos = [estados[(vez + k) % len(estados)] for k in range(len(estados))]
+                estado = next((e for e in candidatos if _prontas(e)), None)
+                if estado is None:
+                    break
+                vez = (estados.index(estado) + 1) % len(estados)
+                numero = _prontas(estado)[0]
+                fase = estado["fases"][numero]
+                estado["aguardando"].discard(numero)
+                entradas = {d: estado["resultados"][d] for d in sorted(estado["dag"][numero])}
+                print(f"{estado['rotulo']}[FASE {numero}] iniciada: {fase['nome']} ({fase['agente']})")
+                futuro = pool.submit(_executar_cronometrado, estado["executar_fase"], fase, entradas, time.monotonic())
+                em_execucao[futuro] = (estado, numero)
+
+            if not em_execucao:
+                continue
+
+            terminadas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                estado, numero = em_execucao.pop(futuro)
+                resultado, exc, metricas = futuro.result()
+                metricas.update(getattr(estado["executar_fase"], "metricas", {}).get(numero, {}))
+                estado["metricas"][numero] = metricas
+                if exc is None:
+                    estado["resultados"][numero] = resultado
+                    status = "completed"
+                    print(f"{estado['rotulo']}[FASE {numero}] concluída em {metricas['duracao_s']:.1f}s")
+                else:
+                    estado["falhas"].add(numero)
+                    estado["resultados"][numero] = f"[ERRO] Fase {numero}: {exc}"
+                    status = "failed"
+                    print(f"{estado['rotulo']}[FASE {numero}] erro: {exc}")
+                if estado["ao_concluir"]:
+                    estado["ao_concluir"](numero, status, estado["resultados"][numero], metricas)
+                feitas += 1
+            if len(estados) > 1:
+                print(f"[PROGRESSO] {feitas}/{total} fases, {len(em_execucao)} em execução, "
+                      f"{time.monotonic() - inicio:.0f}s")
+
+    erros = sum(len(e["falhas"]) for e in estados)
+    decorrido = time.monotonic() - inicio
+    print(f"[DAG] concluído em {decorrido:.1f}s ({erros} fases com erro)")
+    resultados = [_montar_results(e) for e in estados]
+    for results in resultados:
+        results["metricas"]["tempo_total_s"] = round(decorrido, 3)
+    return resultados
+
+def executar_plano(plano, executar_fase, max_workers=4, concluidas=None, ao_concluir=None):
+    """
+    Executa as fases do plano respeitando as dependências.
+
+    executar_fase(fase, entradas) recebe o dict da fase e {fase_dependencia: resultado}
+    e retorna o texto do resultado. Fases cujas dependências falharam não são executadas.
+    `concluidas` ({fase: resultado}) são reaproveitadas sem nova execução e
+    ao_concluir(fase, status, resultado, metricas) é chamado assim que cada fase termina.
+    As métricas juntam fila_s/duracao_s medidos aqui com o dict `metricas` do executor, se houver.
+    """
+    execucao = {"plano": plano, "executar_fase": executar_fase, "concluidas": concluidas, "ao_concluir": ao_concluir}
+    return executar_planos([execucao], max_workers=max_workers)[0]
+
+def prefixo_saida(results, pasta="outputs"):
+    """Prefixo dos arquivos de saída no mesmo formato de SimpleWorkflow.save_results."""
+    carimbo = datetime.fromisoformat(results["timestamp"]).strftime("%Y%m%dT%H%M%S")
+    nome = re.sub(r"\W", "_", results["workflow"].lower())[:50]
+    return Path(pasta) / f"{carimbo}_{nome}"
+
+def salvar_resultados(results, pasta="outputs"):
+    """Grava o JSON consolidado e um .txt por fase em `pasta`."""
+    Path(pasta).mkdir(parents=True, exist_ok=True)
+    prefixo = prefixo_saida(results, pasta)
+    with open(f"{prefixo}.json", "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    for chave, fase in results["fases"].items():
+        with open(f"{prefixo}_{chave}.txt", "w", encoding="utf-8") as f:
+            f.write(f"Fase: {fase['nome']}\nAgente: {fase['agente']}\n{'=' * 80}\n\n{fase['resultado']}")
+    return Path(f"{prefixo}.json")
+
+def adicionar_argumentos(parser):
+    """Opções de execução comuns a workflow_dag.py e workflow_suite.py."""
+    parser.add_argument("--workers", type=int, default=4, help="máximo de fases em paralelo")
+    parser.add_argument("--modelo", default="gemini-1.5-flash")
+    parser.add_argument("--rpm", type=float, help="requisições por minuto iniciais do provedor (padrão: LIMITES_RPM)")
+    parser.add_argument("--max-tentativas", type=int, default=8,
+                        help="chamadas por fase com 429/503 antes de marcar a fase como erro")
+    parser.add_argument("--orcamento-tokens", type=int, default=6000,
+                        help="tokens de entrada por fase (0 envia a solicitação e as entradas completas)")
+    parser.add_argument("--saida", default="outputs")
+    parser.add_argument("--db", default="outputs/workflow_runs.sqlite", help="armazém indexado de resultados")
+    parser.add_argument("--exportar-txt", action="store_true", help="também grava o JSON e os .txt por fase em --saida")
+    parser.add_argument("--cache", default=".workflow_cache.sqlite", help="arquivo do cache de resultados de fases")
+    parser.add_argument("--no-cache", action="store_true", help="não consulta nem grava o cache")
+    parser.add_argument("--force-refresh", action="store_true", help="ignora o cache, mas grava os novos resultados")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="não grava os .txt das fases durante a geração nem ecoa os trechos no console")
+    parser.add_argument("--quiet", action="store_true", help="grava os trechos nos .txt sem ecoar no console")
+    parser.add_argument("--resume", action="store_true",
+                        help="reexecuta só as fases pendentes/com erro (e dependentes), usando os checkpoints")
+
+def criar_recursos(args):
+    """Limitador, cache, armazém e montador de contexto compartilhados pelas execuções."""
+    from workflow_cache import CacheFases
+    from workflow_context import MontadorContexto
+    from workflow_rate_limit import LimitadorAdaptativo
+    from workflow_store import ArmazemResultados
+
+    Path(args.db).parent.mkdir(parents=True, exist_ok=True)
+    return {
+        "limitador": LimitadorAdaptativo("gemini", requisicoes_por_minuto=args.rpm),
+        "cache": None if args.no_cache else CacheFases(args.cache),
+        "armazem": ArmazemResultados(args.db),
+        "montador": MontadorContexto(args.orcamento_tokens) if args.orcamento_tokens else None,
+    }
+
+def preparar_execucao(caminho_plano, user_request, recursos, args, nome=None):
+    """Monta a execução de um plano (executor, checkpoints e gravação no armazém) para executar_planos."""
+    from workflow_cache import ExecutorComCache
+    from workflow_checkpoint import Checkpoint, fases_para_retomar
+    from workflow_gemini import ExecutorGemini
+    from workflow_stream import SaidaStreaming
+
+    plano = carregar_plano(caminho_plano)
+    checkpoint = Checkpoint(caminho_plano)
+    if args.resume:
+        concluidas = checkpoint.concluidas()
+        refazer = fases_para_retomar(construir_dag(plano["fases"]), concluidas)
+        concluidas = {n: r for n, r in concluidas.items() if n not in refazer}
+        print(f"[RESUME] {caminho_plano}: reaproveitando fases {sorted(concluidas)}; reexecutando {sorted(refazer)}")
+    else:
+        checkpoint.limpar()
+        concluidas = {}
+
+    saida = None
+    if not args.no_stream:
+        prefixo = prefixo_saida({"timestamp": datetime.now().isoformat(), "workflow": plano.get("workflow", "")}, args.saida)
+        saida = SaidaStreaming(prefixo, console=not args.quiet)
+    executor = ExecutorGemini(user_request, modelo=args.modelo, limitador=recursos["limitador"],
+                              montador=recursos["montador"], saida=saida, max_tentativas=args.max_tentativas)
+    if recursos["cache"]:
+        executor = ExecutorComCache(executor, recursos["cache"], forcar_atualizacao=args.force_refresh)
+
+    armazem = recursos["armazem"]
+    execucao_id = armazem.iniciar_execucao(plano, caminho_plano)
+    fases = {f["fase"]: f for f in plano["fases"]}
+
+    def ao_concluir(numero, status, resultado, metricas):
+        checkpoint.registrar(numero, status, resultado, metricas)
+        armazem.gravar_fase(execucao_id, fases[numero], status, resultado, metricas)
+
+    return {
+        "nome": nome,
+        "plano": plano,
+        "executar_fase": executor,
+        "concluidas": concluidas,
+        "ao_concluir": ao_concluir,
+        "execucao_id": execucao_id,
+    }
+
+def finalizar(execucoes, resultados, recursos, args):
+    """Fecha as execuções no armazém e imprime o resumo de cota, cache e contexto."""
+    for execucao, results in zip(execucoes, resultados):
+        recursos["armazem"].concluir_execucao(execucao["execucao_id"], results["metricas"])
+        print(f"[METRICAS] {results['metricas']}")
+        print(f"Resultados salvos em: {args.db} (execução {execucao['execucao_id']})")
+        if args.exportar_txt:
+            print(f"Exportados para: {salvar_resultados(results, args.saida)}")
+    print(f"[RATE LIMIT] orçamento final: {recursos['limitador'].orcamento()}")
+    if recursos["cache"]:
+        print(f"[CACHE] {recursos['cache'].estatisticas()}")
+    if recursos["montador"]:
+        print(f"[CONTEXTO] {recursos['montador'].relatorio()}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Executa um workflow_plan_*.yaml com fases em paralelo")
+    parser.add_argument("plano", help="arquivo workflow_plan_*.yaml")
+    parser.add_argument("--script", help="script do workflow com USER_REQUEST (ex.: workflow_1_seguranca)")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+
+    recursos = criar_recursos(args)
+    plano = carregar_plano(args.plano)
+    user_request = importlib.import_module(args.script).USER_REQUEST if args.script else plano.get("objetivo", "")
+    execucao = preparar_execucao(args.plano, user_request, recursos, args)
+    resultados = executar_planos([execucao], max_workers=args.workers)
+    finalizar([execucao], resultados, recursos, args)
+
+if __name__ == "__main__":
+    main()
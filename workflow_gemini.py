@@ -0,0 +1,136 @@
+"""
+Executor de fases de workflow usando a API Gemini
+Cada fase do plano vira uma chamada streamGenerateContent com o papel do agente,
+a solicitação original e os resultados das fases de que ela depende.
+"""
+
+import json
+import os
+import urllib.error
+import urllib.request
+
+from workflow_rate_limit import interpretar_retry_after, limitador_para
+
+GEMINI_STREAM_URL = "https://generativelanguage.googleapis.com/v1/models/{modelo}:streamGenerateContent"
+MAX_TENTATIVAS = 8  # chamadas por fase antes de desistir de 429/503 seguidos
+
+def montar_prompt(fase, user_request, entradas):
+    """Monta o prompt de uma fase com os resultados das dependências."""
+    partes = [
+        f'Você é o agente "{fase["agente"]}" de um workflow multiagente.',
+        "",
+        "SOLICITAÇÃO ORIGINAL:",
+        user_request.strip(),
+        "",
+        f"FASE {fase['fase']}: {fase['nome']}",
+        f"TAREFA: {fase['tarefa']}",
+        f"RESULTADO ESPERADO: {fase.get('output_esperado', '')}",
+    ]
+    if entradas:
+        partes += ["", "RESULTADOS DAS FASES ANTERIORES:"]
+        for numero, resultado in sorted(entradas.items()):
+            partes += [f"### Fase {numero}", resultado.strip(), ""]
+    return "\n".join(partes)
+
+class ExecutorGemini:
+    """Executa uma fase do plano: executor(fase, entradas) -> texto do resultado."""
+
+    def __init__(self, user_request, modelo="gemini-1.5-flash", api_key=None, timeout=120, limitador=None,
+                 montador=None, saida=None, max_tentativas=MAX_TENTATIVAS):
+        self.user_request = user_request
+        self.modelo = modelo
+        self.api_key = api_key or os.environ["GEMINI_API_KEY"]
+        self.timeout = timeout
+        self.max_tentativas = max_tentativas
+        self.limitador = limitador or limitador_para("gemini")
+        self.montador = montador
+        self.saida = saida
+        # {fase: métricas da última execução} (espera por cota, tentativas, 429s, tokens)
+        self.metricas = {}
+
+    def _abrir_stream(self, prompt):
+        corpo = json.dumps({
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"temperature": 0.7, "maxOutputTokens": 8192},
+        }).encode("utf-8")
+        req = urllib.request.Request(
+            GEMINI_STREAM_URL.format(modelo=self.modelo) + f"?alt=sse&key={self.api_key}",
+            data=corpo,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        return urllib.request.urlopen(req, timeout=self.timeout)
+
+    def _chamar(self, prompt, ao_receber=None, metricas=None):
+        """
+        Chama a API em modo streaming respeitando o limitador e repassa cada trecho a ao_receber.
+        429/503 chegam antes do primeiro trecho: a fase espera a cota e tenta de novo, até
+        `max_tentativas` chamadas; depois falha (e pode ser refeita com --resume).
+        Espera por cota, tentativas, 429s e tokens são acumulados em `metricas`.
+        """
+        metricas = metricas if metricas is not None else {}
+        for chave in ("espera_cota_s", "tentativas", "respostas_429", "tokens_entrada", "tokens_saida"):
+            metricas.setdefault(chave, 0)
+        while True:
+            metricas["espera_cota_s"] = round(metricas["espera_cota_s"] + self.limitador.adquirir(), 3)
+            metricas["tentativas"] += 1
+            try:
+                resp = self._abrir_stream(prompt)
+            except urllib.error.HTTPError as exc:
+                if exc.code not in (429, 503):
+                    raise
+                if exc.code == 429:
+                    metricas["respostas_429"] += 1
+                corpo = exc.read().decode("utf-8", errors="replace")
+                espera = self.limitador.registrar_429(interpretar_retry_after(exc.headers.get("Retry-After"), corpo))
+                if metricas["tentativas"] >= self.max_tentativas:
+                    raise RuntimeError(
+                        f"{exc.code} em {self.modelo}: sem cota após {metricas['tentativas']} tentativas"
+                    ) from exc
+                print(f"[RATE LIMIT] {exc.code} em {self.modelo}, aguardando {espera:.0f}s - {self.limitador.orcamento()}")
+                continue
+            self.limitador.registrar_sucesso()
+            break
+
+        trechos = []
+        with resp:
+            for linha in resp:
+                if not linha.startswith(b"data:"):
+                    continue
+                evento = json.loads(linha[5:])
+                uso = evento.get("usageMetadata")
+                if uso:
+                    metricas["tokens_entrada"] = uso.get("promptTokenCount", 0)
+                    metricas["tokens_saida"] = uso.get("candidatesTokenCount", 0)
+                partes = evento.get("candidates", [{}])[0].get("content", {}).get("parts", [])
+                texto = "".join(p.get("text", "") for p in partes)
+                if texto:
+                    trechos.append(texto)
+                    if ao_receber:
+                        ao_receber(texto)
+        if not trechos:
+            raise RuntimeError(f"resposta vazia de {self.modelo}")
+        return "".join(trechos)
+
+    def montar(self, fase, entradas):
+        """Prompt final da fase, já dentro do orçamento de contexto quando há montador."""
+        if self.montador:
+            return self.montador.montar(fase, self.user_request, entradas)
+        return montar_prompt(fase, self.user_request, entradas)
+
+    def __call__(self, fase, entradas):
+        return self.executar(fase, self.montar(fase, entradas))
+
+    def executar(self, fase, prompt):
+        metricas = self.metricas[fase["fase"]] = {}
+        if not self.saida:
+            return self._chamar(prompt, metricas=metricas)
+
+        escritor = self.saida.abrir(fase)
+        try:
+            resultado = self._chamar(prompt, escritor.escrever, metricas)
+        except BaseException as exc:
+            escritor.fechar(erro=exc)
+            raise
+        escritor.fechar()
+        return resultado
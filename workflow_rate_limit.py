@@ -0,0 +1,110 @@
+"""
+Limitador de taxa adaptativo por provedor (token bucket)
+Substitui o delay fixo entre fases: as chamadas saem assim que há cota,
+e respostas 429 / Retry-After reduzem a taxa e pausam o balde até a cota voltar.
+"""
+
+import email.utils
+import json
+import re
+import threading
+import time
+
+# requisições por minuto de partida para cada provedor (ajustadas em tempo de execução)
+LIMITES_RPM = {
+    "gemini": 15,
+}
+
+def interpretar_retry_after(cabecalho=None, corpo=None):
+    """Segundos de espera indicados pelo provedor, via Retry-After ou retryDelay do corpo."""
+    if cabecalho:
+        cabecalho = cabecalho.strip()
+        if cabecalho.isdigit():
+            return float(cabecalho)
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(cabecalho).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    if corpo:
+        try:
+            detalhes = json.loads(corpo).get("error", {}).get("details", [])
+        except (ValueError, AttributeError):
+            detalhes = []
+        for detalhe in detalhes:
+            atraso = re.fullmatch(r"([\d.]+)s", str(detalhe.get("retryDelay", "")))
+            if atraso:
+                return float(atraso.group(1))
+    return None
+
+class LimitadorAdaptativo:
+    """Token bucket com aumento aditivo em sucesso e redução multiplicativa em 429."""
+
+    def __init__(self, provedor="gemini", requisicoes_por_minuto=None, rajada=None):
+        self.provedor = provedor
+        self.rpm_maximo = float(requisicoes_por_minuto or LIMITES_RPM.get(provedor, 10))
+        self.rpm = self.rpm_maximo
+        self.capacidade = float(rajada or max(1, self.rpm_maximo // 4))
+        self._tokens = self.capacidade
+        self._atualizado = time.monotonic()
+        self._pausado_ate = 0.0
+        self._falhas_seguidas = 0
+        self._cond = threading.Condition()
+
+    def _reabastecer(self, agora):
+        # durante uma pausa por 429 o balde não acumula cota
+        if agora > self._atualizado:
+            self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado) * self.rpm / 60)
+            self._atualizado = agora
+
+    def adquirir(self):
+        """Bloqueia até haver cota; retorna quantos segundos esperou."""
+        inicio = time.monotonic()
+        with self._cond:
+            while True:
+                agora = time.monotonic()
+                self._reabastecer(agora)
+                if agora >= self._pausado_ate and self._tokens >= 1:
+                    self._tokens -= 1
+                    return agora - inicio
+                espera = max(self._pausado_ate - agora, (1 - self._tokens) * 60 / self.rpm)
+                self._cond.wait(timeout=espera)
+
+    def registrar_sucesso(self):
+        with self._cond:
+            self._falhas_seguidas = 0
+            self.rpm = min(self.rpm_maximo, self.rpm + self.rpm_maximo * 0.05)
+
+    def registrar_429(self, retry_after=None):
+        """Reduz a taxa pela metade e pausa o balde pelo tempo indicado (ou backoff exponencial)."""
+        with self._cond:
+            self._falhas_seguidas += 1
+            self.rpm = max(1.0, self.rpm / 2)
+            self._tokens = 0.0
+            espera = retry_after if retry_after is not None else min(60.0, 2.0 ** self._falhas_seguidas)
+            self._pausado_ate = max(self._pausado_ate, time.monotonic() + espera)
+            self._atualizado = self._pausado_ate
+            self._cond.notify_all()
+            return espera
+
+    def orcamento(self):
+        """Estimativa atual da cota disponível."""
+        with self._cond:
+            agora = time.monotonic()
+            self._reabastecer(agora)
+            return {
+                "provedor": self.provedor,
+                "rpm_atual": round(self.rpm, 2),
+                "rpm_maximo": self.rpm_maximo,
+                "tokens_disponiveis": round(self._tokens, 2),
+                "pausado_por_s": round(max(0.0, self._pausado_ate - agora), 1),
+            }
+
+_limitadores = {}
+_limitadores_lock = threading.Lock()
+
+def limitador_para(provedor):
+    """Limitador compartilhado por todas as fases que usam o mesmo provedor."""
+    with _limitadores_lock:
+        if provedor not in _limitadores:
+            _limitadores[provedor] = LimitadorAdaptativo(provedor)
+        return _limitadores[provedor]
@@ -0,0 +1,73 @@
+"""
+Relatório de custo e latência das fases de workflow
+Lê as métricas gravadas no armazém (workflow_store.py) e aponta as fases e
+agentes mais lentos ou mais caros, comparando execuções do mesmo workflow.
+
+Uso:
+    python workflow_report.py
+    python workflow_report.py --execucoes 10 12 --top 5
+"""
+
+import argparse
+from collections import defaultdict
+
+from workflow_store import CAMINHO_PADRAO, ArmazemResultados
+
+def tokens(metricas):
+    return metricas.get("tokens_entrada", 0) + metricas.get("tokens_saida", 0)
+
+def imprimir_ranking(titulo, linhas, chave, formato, top):
+    ordenadas = sorted((l for l in linhas if chave(l[6])), key=lambda l: chave(l[6]), reverse=True)[:top]
+    if not ordenadas:
+        return
+    print(f"\n{titulo}")
+    for execucao, _, fase, nome, agente, _, metricas in ordenadas:
+        print(f"  {formato(chave(metricas)):>10}  execução {execucao:<4} fase {fase:<3} {agente:<18} {nome}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara custo e latência das fases entre execuções")
+    parser.add_argument("--db", default=CAMINHO_PADRAO)
+    parser.add_argument("--execucoes", type=int, nargs="*", help="ids das execuções (padrão: todas)")
+    parser.add_argument("--top", type=int, default=5, help="quantas fases listar em cada ranking")
+    args = parser.parse_args(argv)
+
+    linhas = ArmazemResultados(args.db).metricas_das_fases(args.execucoes)
+    if not linhas:
+        print("Nenhuma fase com métricas registradas.")
+        return
+
+    por_execucao = defaultdict(list)
+    for linha in linhas:
+        por_execucao[(linha[0], linha[1])].append(linha[6])
+    print(f"{'execução':>8}  {'fases':>5}  {'tempo s':>9}  {'fila s':>7}  {'cota s':>7}  {'429':>4}  {'tokens':>9}  workflow")
+    for (execucao, workflow), metricas in sorted(por_execucao.items()):
+        print(f"{execucao:>8}  {len(metricas):>5}  {sum(m.get('duracao_s', 0) for m in metricas):>9.1f}"
+              f"  {sum(m.get('fila_s', 0) for m in metricas):>7.1f}  {sum(m.get('espera_cota_s', 0) for m in metricas):>7.1f}"
+              f"  {sum(m.get('respostas_429', 0) for m in metricas):>4}  {sum(tokens(m) for m in metricas):>9}  {workflow}")
+
+    por_agente = defaultdict(list)
+    for linha in linhas:
+        por_agente[linha[4]].append(linha[6])
+    print(f"\n{'agente':<18}  {'fases':>5}  {'média s':>8}  {'tokens/fase':>11}  {'cache':>5}")
+    for agente, metricas in sorted(por_agente.items(), key=lambda item: -sum(m.get("duracao_s", 0) for m in item[1])):
+        n = len(metricas)
+        print(f"{agente:<18}  {n:>5}  {sum(m.get('duracao_s', 0) for m in metricas) / n:>8.1f}"
+              f"  {sum(tokens(m) for m in metricas) // n:>11}  {sum(bool(m.get('cache')) for m in metricas):>5}")
+
+    imprimir_ranking("Fases mais lentas:", linhas, lambda m: m.get("duracao_s", 0), lambda v: f"{v:.1f}s", args.top)
+    imprimir_ranking("Fases mais caras (tokens):", linhas, tokens, str, args.top)
+    imprimir_ranking("Fases com mais 429:", linhas, lambda m: m.get("respostas_429", 0), str, args.top)
+
+    # mesma fase do mesmo workflow em execuções diferentes
+    comparaveis = defaultdict(dict)
+    for execucao, workflow, fase, nome, _, _, metricas in linhas:
+        comparaveis[(workflow, fase, nome)][execucao] = metricas
+    multiplas = {k: v for k, v in comparaveis.items() if len(v) > 1}
+    if multiplas:
+        print("\nComparação entre execuções (duração s / tokens):")
+        for (workflow, fase, nome), por_id in sorted(multiplas.items()):
+            valores = "  ".join(f"#{i}: {m.get('duracao_s', 0):.1f}/{tokens(m)}" for i, m in sorted(por_id.items()))
+            print(f"  {workflow[:30]:<30} fase {fase:<3} {valores}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Armazém indexado dos resultados de workflows (SQLite + FTS5)
+Cada execução e cada fase ficam em um único arquivo, com o texto das fases
+comprimido (zlib) e indexado para busca. As fases são gravadas assim que terminam.
+
+Uso:
+    python workflow_store.py runs
+    python workflow_store.py show 12
+    python workflow_store.py diff 8 10 12          # fase 8 nas execuções 10 e 12
+    python workflow_store.py search "RLS policies"
+    python workflow_store.py import outputs/*.json
+"""
+
+import argparse
+import difflib
+import json
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+
+CAMINHO_PADRAO = "outputs/workflow_runs.sqlite"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workflow TEXT NOT NULL,
+    objetivo TEXT,
+    plano TEXT,
+    iniciado_em TEXT NOT NULL,
+    concluido_em TEXT,
+    metricas TEXT
+);
+CREATE TABLE IF NOT EXISTS fases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    execucao_id INTEGER NOT NULL REFERENCES execucoes (id),
+    fase INTEGER NOT NULL,
+    nome TEXT,
+    agente TEXT,
+    status TEXT NOT NULL,
+    resultado BLOB NOT NULL,
+    tamanho INTEGER NOT NULL,
+    gravado_em TEXT NOT NULL,
+    metricas TEXT,
+    UNIQUE (execucao_id, fase)
+);
+CREATE INDEX IF NOT EXISTS idx_fases_fase ON fases (fase, execucao_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS fases_fts USING fts5 (nome, resultado, content='', tokenize='unicode61 remove_diacritics 2');
+"""
+
+class ArmazemResultados:
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(caminho, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(ESQUEMA)
+        # bancos criados antes das métricas por fase
+        for tabela in ("execucoes", "fases"):
+            colunas = {linha[1] for linha in self._db.execute(f"PRAGMA table_info({tabela})")}
+            if "metricas" not in colunas:
+                self._db.execute(f"ALTER TABLE {tabela} ADD COLUMN metricas TEXT")
+
+    def iniciar_execucao(self, plano, caminho_plano=None, iniciado_em=None):
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO execucoes (workflow, objetivo, plano, iniciado_em) VALUES (?, ?, ?, ?)",
+                (plano.get("workflow", ""), plano.get("objetivo", ""), str(caminho_plano or ""), iniciado_em or datetime.now().isoformat()),
+            )
+            return cursor.lastrowid
+
+    def gravar_fase(self, execucao_id, fase, status, resultado, metricas=None):
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO fases (execucao_id, fase, nome, agente, status, resultado, tamanho, gravado_em, metricas)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (execucao_id, fase["fase"], fase["nome"], fase["agente"], status,
+                 zlib.compress(resultado.encode("utf-8"), 6), len(resultado), datetime.now().isoformat(),
+                 json.dumps(metricas) if metricas else None),
+            )
+            self._db.execute(
+                "INSERT INTO fases_fts (rowid, nome, resultado) VALUES (?, ?, ?)",
+                (cursor.lastrowid, fase["nome"], resultado),
+            )
+
+    def concluir_execucao(self, execucao_id, metricas=None):
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE execucoes SET concluido_em = ?, metricas = ? WHERE id = ?",
+                (datetime.now().isoformat(), json.dumps(metricas) if metricas else None, execucao_id),
+            )
+
+    def listar_execucoes(self, limite=50):
+        return self._db.execute(
+            "SELECT e.id, e.workflow, e.iniciado_em, e.concluido_em,"
+            " COUNT(f.id), SUM(f.status = 'completed')"
+            " FROM execucoes e LEFT JOIN fases f ON f.execucao_id = e.id"
+            " GROUP BY e.id ORDER BY e.id DESC LIMIT ?",
+            (limite,),
+        ).fetchall()
+
+    def fases_da_execucao(self, execucao_id):
+        return [
+            (fase, nome, agente, status, zlib.decompress(resultado).decode("utf-8"))
+            for fase, nome, agente, status, resultado in self._db.execute(
+                "SELECT fase, nome, agente, status, resultado FROM fases WHERE execucao_id = ? ORDER BY fase",
+                (execucao_id,),
+            )
+        ]
+
+    def resultado_fase(self, execucao_id, fase):
+        linha = self._db.execute(
+            "SELECT resultado FROM fases WHERE execucao_id = ? AND fase = ?", (execucao_id, fase)
+        ).fetchone()
+        return zlib.decompress(linha[0]).decode("utf-8") if linha else None
+
+    def metricas_das_fases(self, execucoes=None):
+        """(execucao_id, workflow, fase, nome, agente, status, metricas) das fases com métricas."""
+        sql = (
+            "SELECT f.execucao_id, e.workflow, f.fase, f.nome, f.agente, f.status, f.metricas"
+            " FROM fases f JOIN execucoes e ON e.id = f.execucao_id WHERE f.metricas IS NOT NULL"
+        )
+        parametros = ()
+        if execucoes:
+            sql += f" AND f.execucao_id IN ({', '.join('?' * len(execucoes))})"
+            parametros = tuple(execucoes)
+        return [linha[:6] + (json.loads(linha[6]),) for linha in self._db.execute(sql + " ORDER BY f.execucao_id, f.fase", parametros)]
+
+    def buscar(self, consulta, limite=20):
+        """
+        Fases cujo nome/resultado casa com a consulta FTS5, mais relevantes primeiro.
+        Texto que não é FTS5 válido (ex.: "RLS-policies") vira uma busca pelos termos literais.
+        """
+        sql = (
+            "SELECT f.execucao_id, f.fase, f.nome, f.resultado FROM fases_fts"
+            " JOIN fases f ON f.id = fases_fts.rowid"
+            " WHERE fases_fts MATCH ? ORDER BY rank LIMIT ?"
+        )
+        try:
+            linhas = self._db.execute(sql, (consulta, limite)).fetchall()
+        except sqlite3.OperationalError:
+            linhas = self._db.execute(sql, (termos_literais(consulta), limite)).fetchall()
+        return [(execucao, fase, nome, trecho(zlib.decompress(resultado).decode("utf-8"), consulta))
+                for execucao, fase, nome, resultado in linhas]
+
+    def importar_json(self, caminho):
+        """Importa um JSON gerado por save_results/salvar_resultados como uma execução."""
+        with open(caminho, encoding="utf-8") as f:
+            results = json.load(f)
+        execucao_id = self.iniciar_execucao(results, caminho, results.get("timestamp"))
+        for chave, dados in results["fases"].items():
+            resultado = dados["resultado"]
+            status = "failed" if resultado.startswith("[ERRO]") else "completed"
+            fase = {"fase": int(chave.removeprefix("fase_")), "nome": dados["nome"], "agente": dados["agente"]}
+            self.gravar_fase(execucao_id, fase, status, resultado, dados.get("metricas"))
+        self.concluir_execucao(execucao_id, results.get("metricas"))
+        return execucao_id
+
+def termos_literais(consulta):
+    """Cada termo como string FTS5 entre aspas: hífens, dois-pontos e afins deixam de ser operadores."""
+    return " ".join('"' + t.replace('"', '""') + '"' for t in consulta.split())
+
+def trecho(texto, consulta, largura=160):
+    termos = [t.strip('"*').lower() for t in consulta.split() if t.strip('"*')]
+    minusculo = texto.lower()
+    posicao = min((p for p in (minusculo.find(t) for t in termos) if p >= 0), default=0)
+    inicio = max(0, posicao - largura // 4)
+    return texto[inicio:inicio + largura].replace("\n", " ")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta o armazém de resultados de workflows")
+    parser.add_argument("--db", default=CAMINHO_PADRAO)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("runs", help="lista as execuções")
+    mostrar = sub.add_parser("show", help="mostra as fases de uma execução")
+    mostrar.add_argument("execucao", type=int)
+    comparar = sub.add_parser("diff", help="compara uma fase entre duas execuções")
+    comparar.add_argument("fase", type=int)
+    comparar.add_argument("execucao_a", type=int)
+    comparar.add_argument("execucao_b", type=int)
+    busca = sub.add_parser("search", help="busca texto nos resultados (sintaxe FTS5)")
+    busca.add_argument("consulta")
+    busca.add_argument("--limite", type=int, default=20)
+    importar = sub.add_parser("import", help="importa JSONs antigos de outputs/")
+    importar.add_argument("arquivos", nargs="+")
+    args = parser.parse_args(argv)
+
+    armazem = ArmazemResultados(args.db)
+    if args.comando == "runs":
+        for execucao, workflow, inicio, fim, total, ok in armazem.listar_execucoes():
+            print(f"{execucao:>5}  {inicio[:19]}  {ok or 0:>3}/{total:<3} {'' if fim else '(em andamento) '}{workflow}")
+    elif args.comando == "show":
+        for fase, nome, agente, status, resultado in armazem.fases_da_execucao(args.execucao):
+            print(f"[{status}] Fase {fase}: {nome} ({agente}) - {len(resultado)} caracteres")
+    elif args.comando == "diff":
+        a = armazem.resultado_fase(args.execucao_a, args.fase) or ""
+        b = armazem.resultado_fase(args.execucao_b, args.fase) or ""
+        print("".join(difflib.unified_diff(
+            a.splitlines(keepends=True), b.splitlines(keepends=True),
+            fromfile=f"execucao_{args.execucao_a}/fase_{args.fase}",
+            tofile=f"execucao_{args.execucao_b}/fase_{args.fase}",
+        )))
+    elif args.comando == "search":
+        for execucao, fase, nome, texto in armazem.buscar(args.consulta, args.limite):
+            print(f"{execucao:>5}  fase {fase:<3} {nome}\n       ...{texto}...")
+    elif args.comando == "import":
+        for arquivo in args.arquivos:
+            print(f"{arquivo} -> execução {armazem.importar_json(arquivo)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Saída em streaming das fases de workflow
+Cada trecho da resposta vai para o console e é anexado ao .txt da fase assim
+que chega; se a fase falhar ou for interrompida, o texto parcial fica no arquivo.
+"""
+
+import threading
+from pathlib import Path
+
+class EscritorFase:
+    def __init__(self, caminho, fase, console, lock_console):
+        self.fase = fase
+        self._console = console
+        self._lock_console = lock_console
+        self._pendente = ""
+        self._arquivo = open(caminho, "w", encoding="utf-8", buffering=1)
+        self._arquivo.write(f"Fase: {fase['nome']}\nAgente: {fase['agente']}\n{'=' * 80}\n\n")
+
+    def escrever(self, trecho):
+        self._arquivo.write(trecho)
+        self._arquivo.flush()
+        if self._console:
+            # imprime só linhas completas, com prefixo, para não embaralhar fases paralelas
+            self._pendente += trecho
+            *linhas, self._pendente = self._pendente.split("\n")
+            if linhas:
+                with self._lock_console:
+                    for linha in linhas:
+                        print(f"[FASE {self.fase['fase']}] {linha}")
+
+    def fechar(self, erro=None):
+        if self._console and self._pendente:
+            with self._lock_console:
+                print(f"[FASE {self.fase['fase']}] {self._pendente}")
+            self._pendente = ""
+        if erro is not None:
+            self._arquivo.write(f"\n\n[INTERROMPIDO] {type(erro).__name__}: {erro}\n")
+        self._arquivo.close()
+
+class SaidaStreaming:
+    """Cria um EscritorFase por fase em `<prefixo>_fase_N.txt`."""
+
+    def __init__(self, prefixo, console=True):
+        self.prefixo = Path(prefixo)
+        self.console = console
+        self._lock_console = threading.Lock()
+        self.prefixo.parent.mkdir(parents=True, exist_ok=True)
+
+    def abrir(self, fase):
+        caminho = f"{self.prefixo}_fase_{fase['fase']}.txt"
+        return EscritorFase(caminho, fase, self.console, self._lock_console)
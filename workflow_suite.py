@@ -0,0 +1,53 @@
+"""
+Execução conjunta dos workflows (segurança, código, UI/UX, performance)
+Roda qualquer subconjunto dos scripts ao mesmo tempo, com um único limitador
+de cota, cache de fases e armazém de resultados, intercalando as fases dos
+workflows em rodízio e mostrando o progresso combinado.
+
+Uso:
+    python workflow_suite.py workflow_1_seguranca=workflow_plan_20251001_165024.yaml \\
+                             workflow_4_performance=workflow_plan_20251001_182125.yaml --workers 6
+"""
+
+import argparse
+import importlib
+
+from workflow_dag import adicionar_argumentos, criar_recursos, executar_planos, finalizar, preparar_execucao
+
+WORKFLOWS = (
+    "workflow_1_seguranca",
+    "workflow_2_codigo",
+    "workflow_3_ui_ux",
+    "workflow_4_performance",
+    "optimize_goal_task_app_v2",
+)
+
+def interpretar_par(texto):
+    script, separador, plano = texto.partition("=")
+    if not separador or not plano:
+        raise argparse.ArgumentTypeError(f"use script=plano.yaml (recebido: {texto})")
+    if script not in WORKFLOWS:
+        raise argparse.ArgumentTypeError(f"workflow desconhecido: {script} (opções: {', '.join(WORKFLOWS)})")
+    return script, plano
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Executa vários workflows em paralelo sob uma cota compartilhada")
+    parser.add_argument("workflows", nargs="+", type=interpretar_par, metavar="script=plano.yaml")
+    adicionar_argumentos(parser)
+    args = parser.parse_args(argv)
+
+    recursos = criar_recursos(args)
+    execucoes = [
+        preparar_execucao(plano, importlib.import_module(script).USER_REQUEST, recursos, args, nome=script)
+        for script, plano in args.workflows
+    ]
+
+    print("\n" + "="*80)
+    print(f"EXECUTANDO {len(execucoes)} WORKFLOWS EM PARALELO")
+    print("="*80 + "\n")
+
+    resultados = executar_planos(execucoes, max_workers=args.workers)
+    finalizar(execucoes, resultados, recursos, args)
+
+if __name__ == "__main__":
+    main()